@@ -0,0 +1,259 @@
+# backend/asgi.py
+"""
+Async (ASGI) serving mode.
+
+Serve with an ASGI server instead of the Flask development server or a WSGI
+server, for example:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+/chat and /chat/stream run natively on the event loop. Everything that needs
+the Flask request (session, authentication, commands, context gathering,
+after_request hooks) still runs through the Flask app, on a thread pool of
+ASGI_THREADS threads. Gemini is awaited through the LLM gateway's async API, so a request
+waiting on the model holds no thread, and one process can keep hundreds of
+chats in flight.
+
+Every other route is passed to the unchanged Flask app on the same thread
+pool. The Gmail and Calendar client library has no non-blocking transport,
+so those routes gain a thread pool sized independently of the server's
+workers, not true async I/O. app.py remains the WSGI entry point.
+"""
+import io
+import sys
+import json
+import asyncio
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request, session, jsonify
+
+from config import ASGI_THREADS
+from app import app as flask_app
+from routes.chat_routes import prepare_chat, sse_event
+from utils.auth import require_auth
+from utils.llm_gateway import llm_gateway
+
+# Runs the Flask app and any other blocking work for the event loop
+_executor = ThreadPoolExecutor(max_workers=max(1, ASGI_THREADS), thread_name_prefix='asgi')
+
+
+class PendingAnswer:
+    """Returned by a Flask-side view when the answer still has to be generated."""
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+
+
+def build_environ(scope, body):
+    """Build a WSGI environ for an ASGI HTTP scope and its request body."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': str(client[0]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+def run_wsgi(environ):
+    """Run the Flask app to completion; returns (status code, headers, body)."""
+    result = {}
+
+    def start_response(status, headers, exc_info=None):
+        result['status'] = int(status.split(' ', 1)[0])
+        result['headers'] = headers
+
+    iterable = flask_app(environ, start_response)
+    try:
+        body = b''.join(iterable)
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    return result['status'], result['headers'], body
+
+async def send_response(send, status, headers, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin1'), str(value).encode('latin1')) for name, value in headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+def run_flask_view(environ, view):
+    """
+    Run a view inside a full Flask request: session, require_auth and the
+    app's before/after request hooks.
+
+    Returns:
+        Tuple (response, pending): pending is the PendingAnswer the view
+        returned, in which case response carries only the status and headers
+        (including any session cookie) for the answer that is still to come
+    """
+    with flask_app.request_context(environ):
+        pending = None
+        try:
+            rv = flask_app.preprocess_request()
+            if rv is None:
+                rv = require_auth(view)()
+        except Exception as e:
+            try:
+                rv = flask_app.handle_user_exception(e)
+            except Exception as unhandled:
+                rv = flask_app.handle_exception(unhandled)
+        if isinstance(rv, PendingAnswer):
+            pending, rv = rv, ('', 200)
+        response = flask_app.process_response(flask_app.make_response(rv))
+        return response, pending
+
+def prepare_chat_view():
+    """Flask-side half of /chat: commands are answered, free-form messages get a prompt."""
+    try:
+        reply, prompt = prepare_chat(session.get('user_id'), request.get_json(silent=True) or {})
+    except Exception as e:
+        flask_app.logger.error(f"Chat error: {str(e)}")
+        flask_app.logger.error(traceback.format_exc())
+        return jsonify({"error": "Internal server error"}), 500
+    return reply if reply is not None else PendingAnswer(prompt)
+
+def answer_headers(response, content_type):
+    headers = [(name, value) for name, value in response.headers.items()
+               if name.lower() not in ('content-type', 'content-length')]
+    return headers + [('Content-Type', content_type)]
+
+async def chat(scope, receive, send, body):
+    loop = asyncio.get_running_loop()
+    response, pending = await loop.run_in_executor(_executor, run_flask_view, build_environ(scope, body), prepare_chat_view)
+    if pending is None:
+        await send_response(send, response.status_code, response.headers.items(), response.get_data())
+        return
+
+    try:
+        answer = await llm_gateway.generate_async(pending.prompt)
+        text = answer.text.strip() if answer else ''
+    except Exception as e:
+        flask_app.logger.error(f"Chat error: {str(e)}")
+        flask_app.logger.error(traceback.format_exc())
+        text = None
+    if text:
+        status, payload = 200, {"response": text, "command_detected": False}
+    elif text is None:
+        status, payload = 500, {"error": "Internal server error"}
+    else:
+        status, payload = 500, {"error": "Empty response from AI model"}
+    await send_response(send, status, answer_headers(response, 'application/json'), json.dumps(payload).encode('utf8'))
+
+async def chat_stream(scope, receive, send, body):
+    loop = asyncio.get_running_loop()
+    response, pending = await loop.run_in_executor(_executor, run_flask_view, build_environ(scope, body), prepare_chat_view)
+    if pending is None:
+        if response.status_code != 200:
+            # Errors such as a missing session keep their status, as on /chat
+            await send_response(send, response.status_code, response.headers.items(), response.get_data())
+            return
+        events = sse_event('reply', response.get_json()) + sse_event('done', {"command_detected": True})
+        await send_response(send, 200, answer_headers(response, 'text/event-stream'), events.encode('utf8'))
+        return
+
+    headers = answer_headers(response, 'text/event-stream') + [('Cache-Control', 'no-cache'), ('X-Accel-Buffering', 'no')]
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(name.lower().encode('latin1'), str(value).encode('latin1')) for name, value in headers],
+    })
+
+    async def stream_answer():
+        sent_text = False
+        try:
+            async for chunk in llm_gateway.stream_async(pending.prompt):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata) carry nothing to show
+                    continue
+                if text:
+                    sent_text = True
+                    await send({'type': 'http.response.body', 'body': sse_event('token', {"text": text}).encode('utf8'), 'more_body': True})
+            final = sse_event('done', {"command_detected": False}) if sent_text else sse_event('error', {"error": "Empty response from AI model"})
+        except Exception as e:
+            flask_app.logger.error(f"Chat stream error: {str(e)}")
+            flask_app.logger.error(traceback.format_exc())
+            final = sse_event('error', {"error": "Internal server error"})
+        await send({'type': 'http.response.body', 'body': final.encode('utf8')})
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    # Cancelling the streaming task also cancels the Gemini call when the client goes away
+    streaming = asyncio.ensure_future(stream_answer())
+    disconnect = asyncio.ensure_future(wait_for_disconnect())
+    done, _ = await asyncio.wait({streaming, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    if disconnect in done:
+        flask_app.logger.info("Chat stream cancelled by client disconnect")
+    for task in (streaming, disconnect):
+        task.cancel()
+    await asyncio.gather(streaming, disconnect, return_exceptions=True)
+
+# Routes served natively; everything else goes to the Flask app
+ASYNC_ROUTES = {
+    ('POST', '/chat'): chat,
+    ('POST', '/chat/stream'): chat_stream,
+}
+
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                _executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    body = await read_body(receive)
+    if body is None:
+        return
+    handler = ASYNC_ROUTES.get((scope['method'], scope['path']))
+    if handler is not None:
+        await handler(scope, receive, send, body)
+        return
+    loop = asyncio.get_running_loop()
+    status, headers, response_body = await loop.run_in_executor(_executor, run_wsgi, build_environ(scope, body))
+    await send_response(send, status, headers, response_body)
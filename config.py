@@ -29,3 +29,104 @@ SCOPES = [
 
 # Google API key for generative AI (make sure to set it in your .env file)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# Gemini model used for chat and extraction
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Gemini model used for background email event extraction (defaults to GEMINI_MODEL)
+EVENT_EXTRACTION_MODEL = os.getenv("EVENT_EXTRACTION_MODEL", GEMINI_MODEL)
+
+# Background email sweep: number of users processed concurrently
+EMAIL_SWEEP_WORKERS = int(os.getenv("EMAIL_SWEEP_WORKERS", "8"))
+
+# Minimum seconds between two sweeps of the same user (the scheduler runs every 50 minutes)
+EMAIL_PROCESS_INTERVAL = int(os.getenv("EMAIL_PROCESS_INTERVAL", str(45 * 60)))
+
+# Maximum number of messages handled per user on each sweep, and Gmail page size
+EMAIL_PROCESS_BUDGET = int(os.getenv("EMAIL_PROCESS_BUDGET", "200"))
+GMAIL_PAGE_SIZE = int(os.getenv("GMAIL_PAGE_SIZE", "50"))
+
+# Number of sweeps a message that cannot be fetched is retried on before it is skipped
+EMAIL_FETCH_MAX_ATTEMPTS = int(os.getenv("EMAIL_FETCH_MAX_ATTEMPTS", "5"))
+
+# Filter on the user's interests in the Gmail search query. Gmail matches whole words only
+# ("hack" does not find "hackathon"), so by default mail is listed without the interests and
+# the local substring matcher does the filtering
+GMAIL_INTEREST_SEARCH = os.getenv("GMAIL_INTEREST_SEARCH", "false").lower() in ("1", "true", "yes")
+
+# Queue-based email processing: when enabled the scheduler only enqueues one job
+# per message and separate worker processes (worker.py) do the extraction
+EMAIL_JOB_QUEUE = os.getenv("EMAIL_JOB_QUEUE", "false").lower() in ("1", "true", "yes")
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(TOKENS_DIR, "jobs.db"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+JOB_RETRY_BASE_DELAY = int(os.getenv("JOB_RETRY_BASE_DELAY", "60"))
+EMAIL_WORKER_PROCESSES = int(os.getenv("EMAIL_WORKER_PROCESSES", "2"))
+
+# Cache of parsed Gemini extraction results (in-memory LRU + on-disk SQLite with TTL)
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", os.path.join(TOKENS_DIR, "extraction_cache.db"))
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", str(7 * 24 * 3600)))
+EXTRACTION_CACHE_MEMORY_SIZE = int(os.getenv("EXTRACTION_CACHE_MEMORY_SIZE", "1024"))
+
+# Batched LLM extraction: estimated prompt tokens and maximum emails per Gemini call
+EXTRACTION_BATCH_TOKEN_BUDGET = int(os.getenv("EXTRACTION_BATCH_TOKEN_BUDGET", "8000"))
+EXTRACTION_BATCH_MAX_EMAILS = int(os.getenv("EXTRACTION_BATCH_MAX_EMAILS", "10"))
+
+# Minimum confidence of the local date parser before the LLM is skipped
+LOCAL_DATE_CONFIDENCE = float(os.getenv("LOCAL_DATE_CONFIDENCE", "0.8"))
+
+# Pooled Google API clients: maximum idle clients kept and seconds before an idle client is dropped
+SERVICE_POOL_MAX_SIZE = int(os.getenv("SERVICE_POOL_MAX_SIZE", "64"))
+SERVICE_POOL_IDLE_TTL = int(os.getenv("SERVICE_POOL_IDLE_TTL", "600"))
+
+# Seconds decrypted OAuth credentials are kept in memory before they are read from the store again
+CREDENTIALS_CACHE_TTL = int(os.getenv("CREDENTIALS_CACHE_TTL", "300"))
+
+# Background token refresher: run interval, seconds before expiry a token is refreshed, random
+# spread added to that margin, refresh rate limit and how long a user counts as active after a request
+TOKEN_REFRESH_INTERVAL = int(os.getenv("TOKEN_REFRESH_INTERVAL", "60"))
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+TOKEN_REFRESH_JITTER = int(os.getenv("TOKEN_REFRESH_JITTER", "120"))
+TOKEN_REFRESH_MAX_PER_MINUTE = int(os.getenv("TOKEN_REFRESH_MAX_PER_MINUTE", "30"))
+TOKEN_REFRESH_ACTIVE_WINDOW = int(os.getenv("TOKEN_REFRESH_ACTIVE_WINDOW", str(24 * 3600)))
+
+# SQLite database holding users, encrypted tokens, preferences and Gmail sync state
+STORE_PATH = os.getenv("STORE_PATH", os.path.join(TOKENS_DIR, "rundown.db"))
+
+# In-memory calendar mirror: seconds before a read triggers an incremental sync, days of past
+# events loaded by the initial full sync and maximum number of users kept in memory
+CALENDAR_MIRROR_MAX_STALENESS = int(os.getenv("CALENDAR_MIRROR_MAX_STALENESS", "60"))
+CALENDAR_MIRROR_LOOKBACK_DAYS = int(os.getenv("CALENDAR_MIRROR_LOOKBACK_DAYS", "30"))
+CALENDAR_MIRROR_MAX_USERS = int(os.getenv("CALENDAR_MIRROR_MAX_USERS", "1000"))
+
+# @suggest: days searched from the requested date, options offered and free minutes kept around events
+SUGGEST_SEARCH_DAYS = int(os.getenv("SUGGEST_SEARCH_DAYS", "14"))
+SUGGEST_SLOT_COUNT = int(os.getenv("SUGGEST_SLOT_COUNT", "3"))
+SCHEDULING_BUFFER_MINUTES = int(os.getenv("SCHEDULING_BUFFER_MINUTES", "0"))
+
+# Maximum number of tasks accepted by one /addtasks request
+BULK_TASK_MAX_ITEMS = int(os.getenv("BULK_TASK_MAX_ITEMS", "50"))
+
+# /chat context gathering: threads shared by all requests and seconds each source may take
+CHAT_CONTEXT_WORKERS = int(os.getenv("CHAT_CONTEXT_WORKERS", "16"))
+CHAT_CALENDAR_TIMEOUT = float(os.getenv("CHAT_CALENDAR_TIMEOUT", "3"))
+CHAT_EMAIL_TIMEOUT = float(os.getenv("CHAT_EMAIL_TIMEOUT", "5"))
+
+# Async (ASGI) serving mode: threads running the Flask app and other blocking work
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", "64"))
+
+# LLM gateway: requests per minute and burst size per API key, calls in flight per process,
+# retries with jittered exponential backoff (base and maximum delay in seconds), consecutive
+# failures that open the circuit breaker and seconds before it lets a trial call through,
+# and the default deadline in seconds of a call including its retries
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "60"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+LLM_CIRCUIT_RESET = float(os.getenv("LLM_CIRCUIT_RESET", "30"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "30"))
+
+# Structured (schema-constrained JSON) extraction: follow-up calls asking again for fields
+# whose value was missing or invalid
+STRUCTURED_OUTPUT_REPAIRS = int(os.getenv("STRUCTURED_OUTPUT_REPAIRS", "1"))
@@ -1,8 +1,7 @@
 from flask import Blueprint, jsonify, session, redirect, request, current_app
-from google.auth.transport.requests import Request
 from googleapiclient.errors import HttpError
-from utils.calendar import fetch_calendar_events, delete_calendar_event
-from utils.auth import load_credentials, save_credentials, require_auth
+from utils.calendar import fetch_calendar_events, delete_calendar_event, delete_calendar_events
+from utils.auth import load_credentials, refresh_credentials, require_auth
 import traceback
 
 calendar_bp = Blueprint('calendar', __name__)
@@ -27,8 +26,7 @@ def calendar_events_route():
             
         if creds.expired and creds.refresh_token:
             try:
-                creds.refresh(Request())
-                save_credentials(user_id, creds)
+                creds = refresh_credentials(user_id, creds)
             except Exception as refresh_error:
                 print(f"Refresh failed: {str(refresh_error)}")
                 return jsonify({"error": "Failed to refresh credentials", "redirect": "/login"}), 401
@@ -46,7 +44,7 @@ def calendar_events_route():
 @calendar_bp.route('/calendar/delete', methods=['POST', 'OPTIONS'])
 @require_auth
 def delete_calendar_event_route():
-    """Delete a calendar event by ID."""
+    """Delete a calendar event by ID, or several with {"event_ids": [...]} in one batch request."""
     # Handle CORS preflight requests
     if request.method == 'OPTIONS':
         return '', 200
@@ -63,11 +61,14 @@ def delete_calendar_event_route():
             return jsonify({"error": "Authentication required", "redirect": "/login"}), 401
             
         event_id = request.json.get('event_id')
-        if not event_id:
+        event_ids = request.json.get('event_ids')
+        if not event_id and not event_ids:
             print("No event_id provided")
             return jsonify({"error": "Event ID is required"}), 400
+        if event_ids is not None and (not isinstance(event_ids, list) or not all(isinstance(i, str) for i in event_ids)):
+            return jsonify({"error": "event_ids must be a list of event IDs"}), 400
             
-        print(f"Attempting to delete calendar event {event_id} for user {user_id}")
+        print(f"Attempting to delete calendar event(s) {event_id or event_ids} for user {user_id}")
         
         creds = load_credentials(user_id)
         if not creds:
@@ -77,12 +78,24 @@ def delete_calendar_event_route():
         if creds.expired and creds.refresh_token:
             try:
                 print("Refreshing expired credentials")
-                creds.refresh(Request())
-                save_credentials(user_id, creds)
+                creds = refresh_credentials(user_id, creds)
             except Exception as refresh_error:
                 print(f"Credential refresh failed: {str(refresh_error)}")
                 return jsonify({"error": "Failed to refresh credentials", "redirect": "/login"}), 401
                 
+        if event_ids:
+            results = delete_calendar_events(creds, event_ids)
+            failed = {
+                failed_id: str(result) for failed_id, result in results.items()
+                if not isinstance(result, dict)
+            }
+            print(f"Bulk delete: {len(results) - len(failed)} deleted, {len(failed)} failed")
+            return jsonify({
+                "success": not failed,
+                "deleted": [deleted_id for deleted_id in results if deleted_id not in failed],
+                "failed": failed
+            })
+        
         print("Calling delete_calendar_event function")
         result = delete_calendar_event(creds, event_id)
         print(f"Delete result: {result}")
@@ -94,7 +107,7 @@ def delete_calendar_event_route():
         }
         print(f"Google API Error: {error_details}")
         
-        if error.resp.status == 404:
+        if error.resp.status in (404, 410):
             # If the event doesn't exist, consider it a success (already deleted)
             return jsonify({"success": True, "message": "Event already deleted"})
         return jsonify({"error": f"Calendar API Error: {error._get_reason()}"}), error.resp.status
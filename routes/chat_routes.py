@@ -1,18 +1,25 @@
 from flask import current_app
-from flask import Blueprint, request, jsonify, session
-import google.generativeai as genai
-from config import GOOGLE_API_KEY
-from utils.calendar import fetch_calendar_events, create_calendar_event, delete_calendar_event
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
+from config import SUGGEST_SEARCH_DAYS, SUGGEST_SLOT_COUNT, SCHEDULING_BUFFER_MINUTES, BULK_TASK_MAX_ITEMS
+from utils.calendar import fetch_calendar_events, create_calendar_event, create_calendar_events, build_event_body, delete_calendar_event
 from utils.gmail import fetch_emails
 from utils.auth import load_credentials, require_auth
 from utils.models import UserPreferences
+from utils.extraction_cache import extraction_cache, make_cache_key
+from utils.extraction import extract_batch
+from utils.structured_output import Schema, Field, StructuredOutputError, generate_structured, generate_structured_items
+from utils.dateparse import parse_date_text, is_confident, strip_date_phrases
+from utils.interest_matcher import get_user_matcher
+from utils.availability import get_availability, query_busy_intervals
+from utils.scheduling import IntervalIndex, find_slots, normalize_preference
+from utils.calendar_mirror import calendar_mirror, event_time
+from utils.chat_context import select_sources, gather_context, CALENDAR, EMAIL
+from utils.llm_gateway import llm_gateway as llm
 import json
 from datetime import datetime, timedelta, time
 import traceback
 import re
-import os
 import pytz
-from google.generativeai import GenerativeModel
 from functools import wraps
 
 # AI Chatbot Feature - Version 1.0
@@ -26,147 +33,217 @@ from functools import wraps
 CHATBOT_VERSION = "1.0.0"
 MAX_CONVERSATION_HISTORY = 10
 
-chat_bp = Blueprint('chat', __name__)
+# Time zone in which working hours apply for @check and @suggest
+SCHEDULING_TIMEZONE = "America/New_York"
+
+# Prompt template versions used in extraction cache keys; bump when a prompt changes
+SUGGESTION_PROMPT_VERSION = "suggestion-v3"
+TASK_PROMPT_VERSION = "task-v3"
+
+# Batched task suggestion prompt used by /addsuggestion
+SUGGESTION_INSTRUCTIONS = """
+Extract the following information from each email:
+1. A task description (what needs to be done or attended)
+2. When this task/event is happening (date and time in YYYY-MM-DD HH:MM format)
+3. Where it's happening (location)
+4. Is this time-sensitive? (yes/no)
+
+If there is no clear task or this is just an informational email, use
+"task": "FYI: brief summary of what this email is about", "event_date": null,
+"location": null and "is_time_sensitive": false for that email.
+"""
+SUGGESTION_SCHEMA = Schema([
+    Field('task', description="task description, or 'FYI: ...' for informational emails"),
+    Field('event_date', format='datetime', nullable=True,
+          description="date and time in YYYY-MM-DD HH:MM format, null if not found"),
+    Field('location', nullable=True, description="location if mentioned, otherwise null"),
+    Field('is_time_sensitive', bool, description="whether the task is time-sensitive"),
+])
+
+# Fields extracted for each task by /addtask and /addtasks, and for @add events
+TASK_SCHEMA = Schema([
+    Field('title', description="concise title"),
+    Field('date', format='datetime', nullable=True,
+          description="date and time in YYYY-MM-DD HH:MM format, null if not specified"),
+    Field('location', nullable=True, description="location, null if not mentioned"),
+    Field('details', nullable=True, description="other important details, or null"),
+])
+# Field identifying each task in a /addtasks answer
+TASK_INDEX_FIELD = Field('task_index', int, description="the task number")
 
-# Configure the Generative AI model with enhanced settings
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+# Fields extracted from a @suggest request
+SUGGEST_TIME_SCHEMA = Schema([
+    Field('title', description="concise description of the activity"),
+    Field('target_date', nullable=True,
+          description="specific date or day reference like 'tomorrow' or 'next Friday', null if not mentioned"),
+    Field('duration', int, nullable=True, minimum=5, maximum=24 * 60,
+          description="estimated duration in minutes, null if not specified"),
+    Field('preference', nullable=True,
+          description="time preference (morning, afternoon, evening, etc), or null"),
+])
+
+chat_bp = Blueprint('chat', __name__)
 
 # In-memory conversation history for context-aware responses
 conversation_history = {}
 
+def prepare_chat(user_id, data):
+    """
+    Handle everything in a chat request that comes before the free-form answer.
+    
+    Follow-ups and @commands are answered right away; other messages get the
+    context they need and are turned into a prompt.
+    
+    Returns:
+        Tuple (reply, prompt): reply is a JSON response when the message was
+        handled here, otherwise prompt is the prompt to answer it with
+    """
+    user_message = (data.get('message') or '').strip()
+    
+    # Handle follow-up requests
+    if data.get('follow_up') and data.get('action') == 'add_event':
+        # Create an event from the stored suggestion
+        suggested_event = session.get('suggested_event')
+        if suggested_event:
+            # Clear session data
+            session.pop('suggested_event', None)
+            
+            # Get credentials
+            creds = load_credentials(user_id)
+            
+            # Create event
+            title = suggested_event.get('title')
+            start_time = suggested_event.get('start')
+            end_time = suggested_event.get('end')
+            
+            if not all([title, start_time, end_time]):
+                return jsonify({
+                    "response": "I couldn't find the details of the event you want to add. Could you please provide the event details again?",
+                    "command_detected": True
+                }), None
+            
+            # Convert to datetime objects
+            start_dt = datetime.fromisoformat(start_time)
+            end_dt = datetime.fromisoformat(end_time)
+            
+            # Format dates for calendar API
+            iso_start = start_dt.isoformat()
+            iso_end = end_dt.isoformat()
+            
+            # Create the calendar event
+            description = f"Created via RunDown Chatbot\n\nScheduled on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            
+            try:
+                event = create_calendar_event(
+                    creds,
+                    title,
+                    "RunDown Chatbot",
+                    start_dt.strftime("%Y-%m-%d %H:%M:%S"),
+                    iso_start,
+                    end_date=iso_end,
+                    description=description,
+                    set_reminder=True
+                )
+                
+                # Format response
+                formatted_datetime = start_dt.strftime("%A, %B %d, %Y at %I:%M %p")
+                response_message = f"✅ Added to calendar: **{title}**\n📅 {formatted_datetime}\n🔗 [View in Calendar]({event.get('htmlLink')})"
+                
+                return jsonify({
+                    "response": response_message,
+                    "command_detected": True,
+                    "markdown": True,
+                    "event_data": {
+                        "title": title,
+                        "datetime": formatted_datetime,
+                        "event_id": event.get("id"),
+                        "link": event.get("htmlLink")
+                    }
+                }), None
+            except Exception as e:
+                current_app.logger.error(f"Error creating event from suggestion: {str(e)}")
+                return jsonify({
+                    "response": f"I encountered an error adding the event to your calendar: {str(e)}",
+                    "command_detected": True
+                }), None
+    
+    # Get credentials for API access
+    creds = load_credentials(user_id)
+    
+    # Check for commands
+    is_command = False
+    command_type = None
+    command_content = user_message
+    
+    # Define command prefixes and their handlers
+    commands = {
+        "@add": "add_event",
+        "@remove": "remove_event",
+        "@list": "list_events",
+        "@help": "show_help",
+        "@check": "check_availability",
+        "@when": "check_availability",
+        "@suggest": "suggest_time"
+    }
+    
+    # Check if message starts with any command prefix
+    for prefix, command in commands.items():
+        if user_message.lower().startswith(prefix.lower()):
+            is_command = True
+            command_type = command
+            command_content = user_message[len(prefix):].strip()
+            current_app.logger.info(f"Detected command: {command_type}, content: {command_content}")
+            break
+    
+    # Process commands
+    if is_command:
+        return process_command(command_type, command_content, creds, user_id), None
+    
+    # Handle normal chat (not a command): fetch only the data the question needs, concurrently
+    sources = select_sources(user_message)
+    context, unavailable = gather_context(user_id, creds, sources)
+    if sources:
+        current_app.logger.info(f"Chat context sources: {sources}, unavailable: {unavailable}")
+    context_text = ""
+    if context.get(CALENDAR) is not None:
+        context_text += f"**Upcoming Calendar Events:**{context[CALENDAR]}\n"
+    if context.get(EMAIL) is not None:
+        context_text += f"**Recent Emails:**{context[EMAIL]}\n"
+    if unavailable:
+        context_text += f"(The user's {' and '.join(unavailable)} data could not be loaded right now; say so if the question depends on it.)\n"
+
+    prompt = f"""
+    You are an AI assistant for RunDown, a task management application. You have access to the following information:
+    
+    {context_text}
+    
+    The user can use the following commands:
+    - @add [event details] - Add an event to calendar (e.g., "@add Meeting with John tomorrow at 3pm")
+    - @remove [event ID or description] - Remove an event from calendar
+    - @list - List upcoming events
+    - @help - Show available commands
+    
+    Refer to the above details and answer the upcoming questions. Prefer a concise answer.
+    If the user is asking about adding or removing events, suggest using the appropriate command.
+    
+    User Query: {user_message}
+    """
+
+    return None, prompt
+
+
 @chat_bp.route('/chat', methods=['POST'])
 @require_auth
 def chat():
     """Process chat messages and commands"""
     user_id = session.get('user_id')
     try:
-        data = request.get_json()
-        user_message = data.get('message', '').strip()
-        
-        # Handle follow-up requests
-        if data.get('follow_up') and data.get('action') == 'add_event':
-            # Create an event from the stored suggestion
-            suggested_event = session.get('suggested_event')
-            if suggested_event:
-                # Clear session data
-                session.pop('suggested_event', None)
-                
-                # Get credentials
-                creds = load_credentials(user_id)
-                
-                # Create event
-                title = suggested_event.get('title')
-                start_time = suggested_event.get('start')
-                end_time = suggested_event.get('end')
-                
-                if not all([title, start_time, end_time]):
-                    return jsonify({
-                        "response": "I couldn't find the details of the event you want to add. Could you please provide the event details again?",
-                        "command_detected": True
-                    })
-                
-                # Convert to datetime objects
-                start_dt = datetime.fromisoformat(start_time)
-                end_dt = datetime.fromisoformat(end_time)
-                
-                # Format dates for calendar API
-                iso_start = start_dt.isoformat()
-                iso_end = end_dt.isoformat()
-                
-                # Create the calendar event
-                description = f"Created via RunDown Chatbot\n\nScheduled on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                
-                try:
-                    event = create_calendar_event(
-                        creds,
-                        title,
-                        "RunDown Chatbot",
-                        start_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                        iso_start,
-                        end_date=iso_end,
-                        description=description,
-                        set_reminder=True
-                    )
-                    
-                    # Format response
-                    formatted_datetime = start_dt.strftime("%A, %B %d, %Y at %I:%M %p")
-                    response_message = f"✅ Added to calendar: **{title}**\n📅 {formatted_datetime}\n🔗 [View in Calendar]({event.get('htmlLink')})"
-                    
-                    return jsonify({
-                        "response": response_message,
-                        "command_detected": True,
-                        "markdown": True,
-                        "event_data": {
-                            "title": title,
-                            "datetime": formatted_datetime,
-                            "event_id": event.get("id"),
-                            "link": event.get("htmlLink")
-                        }
-                    })
-                except Exception as e:
-                    current_app.logger.error(f"Error creating event from suggestion: {str(e)}")
-                    return jsonify({
-                        "response": f"I encountered an error adding the event to your calendar: {str(e)}",
-                        "command_detected": True
-                    })
-        
-        # Get credentials for API access
-        creds = load_credentials(user_id)
-        model = GenerativeModel(os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash'))
-        
-        # Check for commands
-        is_command = False
-        command_type = None
-        command_content = user_message
-        
-        # Define command prefixes and their handlers
-        commands = {
-            "@add": "add_event",
-            "@remove": "remove_event",
-            "@list": "list_events",
-            "@help": "show_help",
-            "@check": "check_availability",
-            "@when": "check_availability",
-            "@suggest": "suggest_time"
-        }
-        
-        # Check if message starts with any command prefix
-        for prefix, command in commands.items():
-            if user_message.lower().startswith(prefix.lower()):
-                is_command = True
-                command_type = command
-                command_content = user_message[len(prefix):].strip()
-                current_app.logger.info(f"Detected command: {command_type}, content: {command_content}")
-                break
-        
-        # Process commands
-        if is_command:
-            return process_command(command_type, command_content, creds, user_id)
-        
-        # Handle normal chat (not a command)
-        calendar_events = fetch_calendar_events(creds)
-        emails = fetch_emails(user_id)
-        relevant_data = emails if "@email" in user_message.lower() else calendar_events
-
-        prompt = f"""
-        You are an AI assistant for RunDown, a task management application. You have access to the following information:
-        
-        {f'**Relevant Data:**{relevant_data}' if relevant_data else ''}
-        
-        The user can use the following commands:
-        - @add [event details] - Add an event to calendar (e.g., "@add Meeting with John tomorrow at 3pm")
-        - @remove [event ID or description] - Remove an event from calendar
-        - @list - List upcoming events
-        - @help - Show available commands
-        
-        Refer to the above details and answer the upcoming questions. Prefer a concise answer.
-        If the user is asking about adding or removing events, suggest using the appropriate command.
+        data = request.get_json() or {}
+        reply, prompt = prepare_chat(user_id, data)
+        if reply is not None:
+            return reply
         
-        User Query: {user_message}
-        """
-
-        response = model.generate_content(prompt)
+        response = llm.generate(prompt)
         if not response or not response.text.strip():
             return jsonify({"error": "Empty response from AI model"}), 500
         return jsonify({"response": response.text.strip(), "command_detected": False})
@@ -175,6 +252,72 @@ def chat():
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": "Internal server error"}), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Wrap an iterable of formatted events in an unbuffered text/event-stream response."""
+    return Response(
+        events,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@chat_bp.route('/chat/stream', methods=['POST'])
+@require_auth
+def chat_stream():
+    """Answer a chat message as Server-Sent Events.
+    
+    Free-form answers are streamed as 'token' events while Gemini generates
+    them. Command and follow-up replies, which are not generated token by
+    token, arrive as a single 'reply' event with the payload /chat would
+    return. Every stream ends with a 'done' or an 'error' event.
+    """
+    user_id = session.get('user_id')
+    try:
+        # Commands run before the stream starts so their session changes are
+        # saved with the response headers
+        reply, prompt = prepare_chat(user_id, request.get_json() or {})
+    except Exception as e:
+        current_app.logger.error(f"Chat stream error: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return sse_response([sse_event('error', {"error": "Internal server error"})])
+    if reply is not None:
+        response = reply[0] if isinstance(reply, tuple) else reply
+        return sse_response([
+            sse_event('reply', response.get_json()),
+            sse_event('done', {"command_detected": True})
+        ])
+    
+    def generate():
+        try:
+            sent_text = False
+            # Closing this generator (client disconnect) closes the gateway stream, which cancels the request
+            for chunk in llm.stream(prompt):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata) carry nothing to show
+                    continue
+                if text:
+                    sent_text = True
+                    yield sse_event('token', {"text": text})
+            if sent_text:
+                yield sse_event('done', {"command_detected": False})
+            else:
+                yield sse_event('error', {"error": "Empty response from AI model"})
+        except GeneratorExit:
+            # The server closes the generator when the client disconnects
+            current_app.logger.info("Chat stream cancelled by client disconnect")
+            raise
+        except Exception as e:
+            current_app.logger.error(f"Chat stream error: {str(e)}")
+            current_app.logger.error(traceback.format_exc())
+            yield sse_event('error', {"error": "Internal server error"})
+    
+    return sse_response(stream_with_context(generate()))
+
 def process_command(command_type, command_content, creds, user_id):
     """Process a command from the chatbot"""
     try:
@@ -215,20 +358,12 @@ def add_event_command(command_content, creds):
     prompt = f"""
     Extract event details from the following text: "{command_content}"
     
-    Provide a JSON response with:
+    Provide:
     1. A concise event title
     2. The date and time of the event (YYYY-MM-DD HH:MM format)
     3. Location (if mentioned)
     4. Any other important details
     
-    Format:
-    {{
-        "title": "Event title",
-        "date": "YYYY-MM-DD HH:MM",
-        "location": "Location or null",
-        "details": "Additional details or null"
-    }}
-    
     For dates:
     - If no date is specified, use tomorrow at 9am
     - If a date is specified without a year, use the current year {datetime.now().year}
@@ -238,19 +373,23 @@ def add_event_command(command_content, creds):
     """
     
     try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        current_app.logger.info(f"AI response for date extraction: {response_text}")
-        
-        # Extract JSON from response if needed
-        if "```json" in response_text:
-            json_str = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            json_str = response_text.split("```")[1].strip()
+        # Simple commands like "Meeting with John tomorrow at 3pm" are handled without the AI
+        local_result = parse_date_text(command_content)
+        local_title = strip_date_phrases(command_content, local_result)
+        if is_confident(local_result) and local_result['start_time'] and local_title \
+                and 'https://mail.google.com/mail/' not in command_content:
+            event_data = {
+                "title": local_title,
+                "date": datetime.combine(local_result['date'], local_result['start_time']).strftime("%Y-%m-%d %H:%M"),
+                "location": None,
+                "details": None
+            }
+            current_app.logger.info(f"Parsed event locally: {event_data}")
         else:
-            json_str = response_text
-            
-        event_data = json.loads(json_str)
+            event_data, errors = generate_structured(llm, prompt, TASK_SCHEMA)
+            current_app.logger.info(f"AI extraction for event: {event_data}")
+            if event_data is None:
+                raise StructuredOutputError(f"Could not extract an event title: {errors}")
         
         title = event_data.get("title", "New Event")
         date_str = event_data.get("date")
@@ -352,6 +491,19 @@ def add_event_command(command_content, creds):
             "command_detected": True
         })
 
+# Calendar event IDs use base32hex characters; instances of recurring events add _<date>[T<time>Z]
+EVENT_ID_PATTERN = re.compile(r'^[a-v0-9]{5,1024}(_\d{8}(T\d{6}Z)?)?$')
+
+def looks_like_event_id(text):
+    """Return True if text has the shape of a Calendar event ID rather than a title.
+    
+    Short lowercase words ("lunch") are valid base32hex too, so IDs must also be
+    long or contain a digit, as generated IDs and instance IDs do.
+    """
+    if not EVENT_ID_PATTERN.match(text):
+        return False
+    return len(text) >= 20 or any(char.isdigit() for char in text)
+
 def remove_event_command(command_content, creds):
     """Process the @remove command to remove an event from calendar"""
     if not command_content:
@@ -361,29 +513,21 @@ def remove_event_command(command_content, creds):
         })
     
     try:
-        # First check if it's an event ID
-        try:
-            from utils.calendar import delete_calendar_event
-            result = delete_calendar_event(creds, command_content)
+        # Upcoming events come from the calendar mirror, so matching them costs no API call
+        events = fetch_calendar_events(creds)
+        event_id = command_content.strip().strip('`')
+        
+        # Only call the API directly when the input is a known or ID-shaped event ID
+        if any(event.get("id") == event_id for event in events) or looks_like_event_id(event_id):
+            result = delete_calendar_event(creds, event_id)
             if result.get("status") == "deleted":
                 return jsonify({
                     "response": "✅ Event has been deleted from your calendar.",
                     "command_detected": True
                 })
-            elif result.get("status") == "not_found":
-                # Not an ID, so let's search by title
-                pass
-            else:
-                return jsonify({
-                    "response": f"Something went wrong: {result.get('message')}",
-                    "command_detected": True
-                })
-        except:
-            # Not an ID, so search by title
-            pass
+            # No event with that ID, so search by title
         
         # Search for events by title
-        events = fetch_calendar_events(creds)
         matching_events = []
         
         for event in events:
@@ -400,7 +544,6 @@ def remove_event_command(command_content, creds):
             # Only one match, delete it
             event = matching_events[0]
             event_id = event.get("id")
-            from utils.calendar import delete_calendar_event
             delete_calendar_event(creds, event_id)
             
             return jsonify({
@@ -534,8 +677,11 @@ def add_suggestion():
         time_period = int(data.get('time_period', 7))
         
         creds = load_credentials(user_id)
-        # Pass the time period to fetch_emails
-        emails = fetch_emails(user_id, days=time_period)
+        
+        # Get user preferences for filtering
+        user_preferences = UserPreferences.load_preferences(user_id)
+        user_interests = user_preferences.get('interests', [])
+        filtering_enabled = user_preferences.get('enabled', True)
         
         # Fetch existing calendar events to check for duplicates
         calendar_events = fetch_calendar_events(creds)
@@ -560,25 +706,46 @@ def add_suggestion():
                     subject = subject_line[0].replace('Subject:', '').strip()
                     existing_subjects[subject.lower()] = True
         
-        # Get user preferences for filtering
-        user_preferences = UserPreferences.load_preferences(user_id)
-        user_interests = user_preferences.get('interests', [])
-        filtering_enabled = user_preferences.get('enabled', True)
+        def is_new_email(headers):
+            """Skip emails whose subject is already in calendar events or already processed."""
+            email_subject = headers.get('subject', 'No Subject').lower()
+            if email_subject in existing_subjects:
+                current_app.logger.info(f"Skipping already processed email: {headers.get('subject')}")
+                return False
+            if any(email_subject == title for title in existing_event_titles):
+                current_app.logger.info(f"Skipping email with title already in calendar: {headers.get('subject')}")
+                return False
+            return True
+        
+        # Pass the time period to fetch_emails; Gmail pre-filters on the user's interests and
+        # only the headers of emails that are already in the calendar are downloaded
+        emails = fetch_emails(
+            user_id,
+            days=time_period,
+            interests=user_interests if filtering_enabled else None,
+            keep=is_new_email
+        )
+        if emails is None:
+            return jsonify({"error": "No credentials found", "redirect": "/login"}), 401
+        if isinstance(emails, dict):
+            current_app.logger.error(f"Failed to fetch emails for suggestions: {emails.get('error')}")
+            return jsonify({"error": "Failed to fetch emails"}), 502
         
         filtered_emails = []
+        matched_interests = {}
         suggestions = []
         
         # Only apply filtering if user has preferences and filtering is enabled
         if filtering_enabled and user_interests:
             current_app.logger.info(f"Filtering emails based on user interests: {user_interests}")
             
-            # Filter emails based on user interests
+            # Filter emails based on user interests with a single scan per email
+            interest_matcher = get_user_matcher(user_id, user_interests)
             for email in emails:
-                email_content = f"{email.get('subject', '')} {email.get('content', '')}".lower()
-                for interest in user_interests:
-                    if interest.lower() in email_content:
-                        filtered_emails.append(email)
-                        break
+                matched = interest_matcher.matched_interests(f"{email.get('subject', '')} {email.get('content', '')}")
+                if matched:
+                    matched_interests[email.get('id')] = matched
+                    filtered_emails.append(email)
             
             current_app.logger.info(f"Filtered {len(filtered_emails)} emails from {len(emails)} total")
         else:
@@ -586,119 +753,92 @@ def add_suggestion():
             filtered_emails = emails
         
         # Process emails (filtered or all)
+        candidate_emails = []
         for email in filtered_emails:
+            # Skip emails that could not be fetched
+            if 'error' in email:
+                continue
+            
+            candidate_emails.append(email)
+        
+        # Extract all candidate emails together in as few AI calls as possible
+        extracted = extract_batch(
+            llm,
+            candidate_emails,
+            SUGGESTION_INSTRUCTIONS,
+            SUGGESTION_SCHEMA,
+            SUGGESTION_PROMPT_VERSION
+        )
+        
+        for email in candidate_emails:
             email_id = email.get('id', '')
             email_subject = email.get('subject', 'No Subject')
-            email_content = email.get('content', '')
-            
-            # Skip if the email subject is already in calendar events or already processed
-            if email_subject.lower() in existing_subjects:
-                current_app.logger.info(f"Skipping already processed email: {email_subject}")
+            suggestion_data = extracted.get(email_id)
+            if suggestion_data is None:
+                current_app.logger.error(f"No AI extraction available for email: {email_subject}")
                 continue
-                
-            # Skip if the email title exactly matches an existing event
-            if any(email_subject.lower() == title for title in existing_event_titles):
-                current_app.logger.info(f"Skipping email with title already in calendar: {email_subject}")
-                continue
-            
-            prompt = f"""
-            **Email Subject:** {email_subject}
-            **Email Content:** {email_content}
-            
-            Extract the following information from this email:
-            1. A task description (what needs to be done or attended)
-            2. When this task/event is happening (date and time in YYYY-MM-DD HH:MM format)
-            3. Where it's happening (location)
-            4. Is this time-sensitive? (yes/no)
             
-            Format your response as JSON:
-            {{
-                "task": "task description",
-                "event_date": "YYYY-MM-DD HH:MM or none if not found",
-                "location": "location if mentioned or none",
-                "is_time_sensitive": true/false
-            }}
-            
-            If there is no clear task or this is just an informational email, respond with:
-            {{
-                "task": "FYI: brief summary of what this email is about",
-                "event_date": "none",
-                "location": "none",
-                "is_time_sensitive": false
-            }}
-            """
-            
-            response = model.generate_content(prompt)
-            
-            if response and response.text.strip():
-                try:
-                    # Extract JSON from response
-                    response_text = response.text.strip()
-                    if "```json" in response_text:
-                        json_str = response_text.split("```json")[1].split("```")[0].strip()
-                    elif "```" in response_text:
-                        json_str = response_text.split("```")[1].strip()
-                    else:
-                        json_str = response_text
-                    
-                    suggestion_data = json.loads(json_str)
-                    
-                    # Prepare formatted response
-                    task_text = suggestion_data.get('task', '')
-                    
-                    # Skip if the task is "FYI" or doesn't seem like an actionable task
-                    if task_text.startswith("FYI:") or not task_text:
-                        current_app.logger.info(f"Skipping non-actionable task: {task_text}")
-                        continue
-                        
-                    # Skip if the task exactly matches an existing event title
-                    if any(task_text.lower() == title for title in existing_event_titles):
-                        current_app.logger.info(f"Skipping task already in calendar: {task_text}")
-                        continue
-                    
-                    # Get the event date - look for event_date first (new format) then deadline (old format)
-                    event_date = suggestion_data.get('event_date', suggestion_data.get('deadline', 'none'))
-                    location = suggestion_data.get('location', 'none')
+            try:
+                # Prepare formatted response
+                task_text = suggestion_data.get('task', '')
+                
+                # Skip if the task is "FYI" or doesn't seem like an actionable task
+                if task_text.startswith("FYI:") or not task_text:
+                    current_app.logger.info(f"Skipping non-actionable task: {task_text}")
+                    continue
                     
-                    formatted_deadline = None
-                    if event_date and event_date.lower() != 'none':
+                # Skip if the task exactly matches an existing event title
+                if any(task_text.lower() == title for title in existing_event_titles):
+                    current_app.logger.info(f"Skipping task already in calendar: {task_text}")
+                    continue
+                
+                # Get the event date - look for event_date first (new format) then deadline (old format)
+                event_date = suggestion_data.get('event_date', suggestion_data.get('deadline', 'none'))
+                location = suggestion_data.get('location', 'none')
+                
+                formatted_deadline = None
+                if event_date and event_date.lower() != 'none':
+                    try:
+                        # First try strict format
+                        dt = datetime.strptime(event_date, "%Y-%m-%d %H:%M")
+                        formatted_deadline = dt.strftime("%b %d, %Y at %I:%M %p")
+                    except ValueError:
                         try:
-                            # First try strict format
-                            dt = datetime.strptime(event_date, "%Y-%m-%d %H:%M")
+                            # Try with dateutil parser as fallback
+                            from dateutil import parser
+                            dt = parser.parse(event_date)
                             formatted_deadline = dt.strftime("%b %d, %Y at %I:%M %p")
-                        except ValueError:
-                            try:
-                                # Try with dateutil parser as fallback
-                                from dateutil import parser
-                                dt = parser.parse(event_date)
-                                formatted_deadline = dt.strftime("%b %d, %Y at %I:%M %p")
-                            except:
-                                # Just use as is if parsing fails
-                                formatted_deadline = event_date
-                    
-                    # Add to suggestions
-                    suggestions.append({
-                        "text": task_text,
-                        "deadline": formatted_deadline,
-                        "email_id": email_id,
-                        "email_subject": email_subject,
-                        "location": location if location and location.lower() != 'none' else None,
-                        "event_date": event_date if event_date and event_date.lower() != 'none' else None,
-                        "is_time_sensitive": suggestion_data.get('is_time_sensitive', False)
-                    })
-                    
-                except Exception as json_error:
-                    # Fallback if JSON parsing fails
-                    current_app.logger.error(f"Error parsing AI response: {json_error}")
-                    current_app.logger.error(traceback.format_exc())
-                    suggestions.append({
-                        "text": response.text.strip(),
-                        "email_id": email_id,
-                        "email_subject": email_subject
-                    })
+                        except:
+                            # Just use as is if parsing fails
+                            formatted_deadline = event_date
+                
+                # Add to suggestions
+                suggestions.append({
+                    "text": task_text,
+                    "deadline": formatted_deadline,
+                    "email_id": email_id,
+                    "email_subject": email_subject,
+                    "location": location if location and location.lower() != 'none' else None,
+                    "event_date": event_date if event_date and event_date.lower() != 'none' else None,
+                    "is_time_sensitive": suggestion_data.get('is_time_sensitive', False),
+                    "matched_interests": matched_interests.get(email_id, [])
+                })
+                
+            except Exception as json_error:
+                # Fallback if the extracted data is malformed
+                current_app.logger.error(f"Error parsing AI response: {json_error}")
+                current_app.logger.error(traceback.format_exc())
+                suggestions.append({
+                    "text": str(suggestion_data.get('task', '')),
+                    "email_id": email_id,
+                    "email_subject": email_subject
+                })
         
-        # Sort suggestions by time sensitivity
-        suggestions.sort(key=lambda x: x.get('is_time_sensitive', False), reverse=True)
+        # Sort suggestions by time sensitivity, then by how many interests they match
+        suggestions.sort(
+            key=lambda x: (x.get('is_time_sensitive', False), len(x.get('matched_interests', []))),
+            reverse=True
+        )
         
         current_app.logger.info(f"Generated {len(suggestions)} suggestions")
         return jsonify({"suggestions": suggestions})
@@ -707,6 +847,199 @@ def add_suggestion():
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": "Internal server error"}), 500
 
+def task_instructions():
+    """Extraction instructions shared by the single and bulk task prompts."""
+    return f"""
+        Extract the following information:
+        1. Task title (a concise version of the task, 5-10 words)
+        2. Date and time when this task is due or scheduled to happen (EXACT DATE AND TIME)
+        3. Location of the task/event (if mentioned)
+        4. Any other important details
+        
+        For dates:
+        - If no date is specifically mentioned, use tomorrow at 9am
+        - If a date is specified without a year, use the current year {datetime.now().year}
+        - If a date mentions a month after the current month with no year, assume the current year
+        - If a date mentions a month before the current month with no year, assume next year
+        - Always provide the full date in YYYY-MM-DD HH:MM format
+        """
+
+def task_cache_key(task_desc):
+    # Relative dates like "tomorrow" depend on the current day, so it is part of the cache key
+    return make_cache_key(TASK_PROMPT_VERSION, llm.model_name, f"{datetime.now().date().isoformat()}\n{task_desc}")
+
+def parse_task_date(date_str):
+    """Parse a task date, moving dates given without a year to the current or next year."""
+    from dateutil import parser
+    dt = parser.parse(date_str)
+    
+    # Check if the year wasn't explicitly specified
+    current_year = datetime.now().year
+    if dt.year != current_year and str(dt.year) not in date_str:
+        dt = dt.replace(year=current_year)
+        # If this makes the date in the past (and it's not today), use next year
+        now = datetime.now()
+        if dt < now and dt.date() != now.date():
+            dt = dt.replace(year=current_year + 1)
+            print(f"Adjusted to next year: {dt}")
+        else:
+            print(f"Adjusted to current year: {dt}")
+    return dt
+
+def default_task_date():
+    """Tomorrow at 9am, used when a task has no usable date."""
+    dt = datetime.now() + timedelta(days=1)
+    return dt.replace(hour=9, minute=0, second=0, microsecond=0)
+
+def task_description(task_desc, details=None, location=None):
+    """Build a rich event description for a task."""
+    description = f"Task: {task_desc}"
+    if details:
+        description += f"\n\nDetails: {details}"
+    if location:
+        description += f"\n\nLocation: {location}"
+    return description
+
+def extract_tasks(task_descs):
+    """
+    Parse several tasks with a single AI call, reusing cached extractions.
+    
+    Args:
+        task_descs: List of natural language task descriptions
+    
+    Returns:
+        Dict mapping the index of each task to its extracted dict ('title',
+        'date', 'location', 'details'). Tasks that could not be parsed are missing.
+    """
+    results = {}
+    pending = []
+    for index, task_desc in enumerate(task_descs):
+        cached = extraction_cache.get(task_cache_key(task_desc))
+        if cached is not None:
+            results[index] = cached
+        else:
+            pending.append(index)
+    if not pending:
+        return results
+    
+    def build_prompt(indexes):
+        task_lines = "\n".join(f'Task {index}: "{task_descs[index]}"' for index in indexes)
+        return f"""
+        User wants to add the following {len(indexes)} tasks:
+        {task_lines}
+        
+        Process each task independently and answer with one object per task, identified by its task number.
+        {task_instructions()}
+        """
+    try:
+        extracted = generate_structured_items(llm, build_prompt, TASK_SCHEMA, TASK_INDEX_FIELD, pending)
+    except Exception as e:
+        print(f"Bulk task extraction failed for {len(pending)} tasks: {e}")
+        return results
+    
+    for index, (task_data, errors) in extracted.items():
+        if task_data is None:
+            print(f"Could not extract task {index}: {errors}")
+            continue
+        if not errors:
+            extraction_cache.set(task_cache_key(task_descs[index]), task_data)
+        results[index] = task_data
+    return results
+
+@chat_bp.route('/addtasks', methods=['POST'])
+@require_auth
+def add_tasks():
+    """Add several tasks to the calendar in one round trip.
+    
+    Expects {"tasks": [{"task_text", "event_date", "email_id"}, ...]}. Tasks
+    without a usable event_date are parsed together with one AI call, and all
+    events are created with Calendar batch requests. Returns one result per
+    task, in order, so the caller can tell which ones were added.
+    """
+    user_id = session.get('user_id')
+    try:
+        data = request.get_json() or {}
+        tasks = data.get('tasks') or []
+        if not isinstance(tasks, list) or not tasks:
+            return jsonify({"error": "A non-empty tasks list is required"}), 400
+        if len(tasks) > BULK_TASK_MAX_ITEMS:
+            return jsonify({"error": f"At most {BULK_TASK_MAX_ITEMS} tasks can be added at once"}), 400
+        tasks = [task if isinstance(task, dict) else {} for task in tasks]
+        
+        creds = load_credentials(user_id)
+        
+        # title, datetime, location, details per task; None when the task could not be parsed
+        plans = [None] * len(tasks)
+        needs_ai = []
+        for index, task in enumerate(tasks):
+            task_desc = str(task.get('task_text', '')).strip()
+            if not task_desc:
+                continue
+            event_date = task.get('event_date')
+            if event_date and str(event_date).lower() != 'none':
+                try:
+                    plans[index] = (task_desc, parse_task_date(str(event_date)), None, None)
+                    continue
+                except Exception as e:
+                    print(f"Error parsing event date {event_date!r}: {e}, falling back to AI extraction")
+            needs_ai.append(index)
+        
+        extracted = extract_tasks([str(tasks[index].get('task_text', '')).strip() for index in needs_ai])
+        for position, index in enumerate(needs_ai):
+            task_data = extracted.get(position)
+            if not isinstance(task_data, dict):
+                continue
+            task_desc = str(tasks[index].get('task_text', '')).strip()
+            try:
+                dt = parse_task_date(task_data['date']) if task_data.get('date') else default_task_date()
+            except Exception as e:
+                print(f"Error parsing date from AI: {e}")
+                dt = default_task_date()
+            plans[index] = (task_data.get('title') or task_desc, dt, task_data.get('location'), task_data.get('details'))
+        
+        planned = [index for index, plan in enumerate(plans) if plan is not None]
+        event_bodies = []
+        for index in planned:
+            title, dt, location, details = plans[index]
+            event_bodies.append(build_event_body(
+                title,
+                "Added from RunDown",
+                dt.strftime("%Y-%m-%d %H:%M:%S"),
+                dt.isoformat(),
+                description=task_description(str(tasks[index].get('task_text', '')).strip(), details, location),
+                set_reminder=True
+            ))
+        created = dict(zip(planned, create_calendar_events(creds, event_bodies))) if event_bodies else {}
+        
+        results = []
+        for index, task in enumerate(tasks):
+            result = {"index": index, "email_id": task.get('email_id')}
+            event = created.get(index)
+            if plans[index] is None:
+                result.update({"success": False, "error": "Could not understand the task"})
+            elif not isinstance(event, dict):
+                current_app.logger.error(f"Could not create event for task {index}: {event}")
+                result.update({"success": False, "error": "Could not create the calendar event"})
+            else:
+                title, dt, location, _ = plans[index]
+                result.update({
+                    "success": True,
+                    "response": title,
+                    "event": event.get("htmlLink"),
+                    "event_id": event.get("id"),
+                    "deadline": dt.strftime("%b %d, %Y at %I:%M %p"),
+                    "location": location
+                })
+            results.append(result)
+        
+        added = sum(1 for result in results if result["success"])
+        current_app.logger.info(f"Bulk add created {added} of {len(tasks)} tasks")
+        return jsonify({"results": results, "added": added})
+    except Exception as e:
+        current_app.logger.error(f"Bulk add task error: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": "Internal server error"}), 500
+
 @chat_bp.route('/addtask', methods=['POST'])
 @require_auth
 def add_task():
@@ -738,22 +1071,9 @@ def add_task():
             print(f"Using original event date from suggestion: {original_event_date}")
             # Parse the original date
             try:
-                from dateutil import parser
-                dt = parser.parse(original_event_date)
+                dt = parse_task_date(original_event_date)
                 print(f"Successfully parsed original event date: {original_event_date} -> {dt}")
                 
-                # Check if the year wasn't explicitly specified
-                current_year = datetime.now().year
-                if dt.year != current_year and str(dt.year) not in original_event_date:
-                    dt = dt.replace(year=current_year)
-                    # If this makes the date in the past (and it's not today), use next year
-                    now = datetime.now()
-                    if dt < now and dt.date() != now.date():
-                        dt = dt.replace(year=current_year + 1)
-                        print(f"Adjusted to next year: {dt}")
-                    else:
-                        print(f"Adjusted to current year: {dt}")
-                
                 # Build a title and description
                 title = task_desc
                 description = f"Task: {task_desc}"
@@ -791,45 +1111,23 @@ def add_task():
         # Use AI to parse the task and get information
         prompt = f"""
         User wants to add a task: "{task_desc}"
-        
-        Extract the following information:
-        1. Task title (a concise version of the task, 5-10 words)
-        2. Date and time when this task is due or scheduled to happen (EXACT DATE AND TIME)
-        3. Location of the task/event (if mentioned)
-        4. Any other important details
-        
-        Format your response as JSON with:
-        {{
-            "title": "concise task title",
-            "date": "YYYY-MM-DD HH:MM" or null if not specified,
-            "location": "location string or null if not mentioned",
-            "details": "other important details or null"
-        }}
-        
-        For dates:
-        - If no date is specifically mentioned, use tomorrow at 9am
-        - If a date is specified without a year, use the current year {datetime.now().year}
-        - If a date mentions a month after the current month with no year, assume the current year
-        - If a date mentions a month before the current month with no year, assume next year
-        - Always provide the full date in YYYY-MM-DD HH:MM format
+        {task_instructions()}
         """
         
-        response = model.generate_content(prompt)
+        cache_key = task_cache_key(task_desc)
+        task_data = extraction_cache.get(cache_key)
+        if task_data is None:
+            task_data, errors = generate_structured(llm, prompt, TASK_SCHEMA)
+            print(f"AI task extraction: {task_data}")
+            if task_data is not None and not errors:
+                extraction_cache.set(cache_key, task_data)
+        else:
+            print(f"Using cached task extraction for: {task_desc}")
         
-        # Parse the response
+        # Use the validated extraction
         try:
-            response_text = response.text.strip()
-            print(f"AI response: {response_text}")
-            
-            # Extract JSON from response if needed
-            if "```json" in response_text:
-                json_str = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                json_str = response_text.split("```")[1].strip()
-            else:
-                json_str = response_text
-                
-            task_data = json.loads(json_str)
+            if task_data is None:
+                raise StructuredOutputError(f"Could not extract a title for task: {task_desc}")
             title = task_data.get("title", task_desc)
             location = task_data.get("location")
             details = task_data.get("details")
@@ -838,41 +1136,17 @@ def add_task():
             try:
                 date_str = task_data.get("date")
                 if date_str:
-                    # Try to parse the date
-                    from dateutil import parser
-                    dt = parser.parse(date_str)
-                    
-                    # Check if the year wasn't explicitly specified
-                    current_year = datetime.now().year
-                    if dt.year != current_year and str(dt.year) not in date_str:
-                        dt = dt.replace(year=current_year)
-                        # If this makes the date in the past (and it's not today), use next year
-                        now = datetime.now()
-                        if dt < now and dt.date() != now.date():
-                            dt = dt.replace(year=current_year + 1)
-                            print(f"Adjusted to next year: {dt}")
-                        else:
-                            print(f"Adjusted to current year: {dt}")
-                    
+                    dt = parse_task_date(date_str)
                     print(f"Parsed date from AI: {date_str} -> {dt}")
                 else:
-                    # Use tomorrow at 9am
-                    dt = datetime.now() + timedelta(days=1)
-                    dt = dt.replace(hour=9, minute=0, second=0, microsecond=0)
+                    dt = default_task_date()
                     print(f"Using default tomorrow at 9am: {dt}")
             except Exception as e:
                 print(f"Error parsing date from AI: {e}")
-                # Fallback to tomorrow at 9am
-                dt = datetime.now() + timedelta(days=1)
-                dt = dt.replace(hour=9, minute=0, second=0, microsecond=0)
+                dt = default_task_date()
                 print(f"Using fallback tomorrow at 9am: {dt}")
             
-            # Build a rich description
-            description = f"Task: {task_desc}"
-            if details:
-                description += f"\n\nDetails: {details}"
-            if location:
-                description += f"\n\nLocation: {location}"
+            description = task_description(task_desc, details, location)
                 
             # Create the calendar event - note: no Z suffix to avoid UTC designation
             iso_date = dt.isoformat()
@@ -906,17 +1180,18 @@ def add_task():
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": "Internal server error"}), 500
 
-def find_free_slots(events, date_to_check, timezone="America/New_York"):
+def find_free_slots(creds, date_to_check, timezone=SCHEDULING_TIMEZONE):
     """
     Find free time slots on a given day
     
     Args:
-        events: List of calendar events
+        creds: Google API credentials
         date_to_check: Date to check for free time slots (datetime.date object)
         timezone: Timezone to use for calculations
     
     Returns:
-        List of free time slots as (start, end) tuples
+        Tuple of (free time slots as (start, end) tuples, booked periods as
+        (start, end, summary) tuples)
     """
     # Set up the time zone
     tz = pytz.timezone(timezone)
@@ -931,58 +1206,27 @@ def find_free_slots(events, date_to_check, timezone="America/New_York"):
     day_end = datetime.combine(date_to_check, work_end_time)
     day_end = tz.localize(day_end)
     
-    # Filter events that fall on the specified date
-    day_events = []
-    for event in events:
-        # Parse event start and end times
-        event_start = event.get('start', {}).get('dateTime')
-        event_end = event.get('end', {}).get('dateTime')
-        
-        if not event_start or not event_end:
-            continue
-            
-        # Convert to datetime objects
-        try:
-            event_start_dt = datetime.fromisoformat(event_start.replace('Z', '+00:00'))
-            event_end_dt = datetime.fromisoformat(event_end.replace('Z', '+00:00'))
-            
-            # Convert to target timezone
-            event_start_dt = event_start_dt.astimezone(tz)
-            event_end_dt = event_end_dt.astimezone(tz)
-            
-            # Check if the event falls on the target date
-            if event_start_dt.date() == date_to_check or event_end_dt.date() == date_to_check:
-                # Clip events to the working day if needed
-                if event_start_dt.date() < date_to_check:
-                    event_start_dt = day_start
-                if event_end_dt.date() > date_to_check:
-                    event_end_dt = day_end
-                    
-                day_events.append((event_start_dt, event_end_dt, event.get('summary', 'No Title')))
-        except Exception as e:
-            current_app.logger.error(f"Error parsing event date: {e}")
-            continue
-    
-    # Sort events by start time
-    day_events.sort(key=lambda x: x[0])
-    
-    # Find free time slots
-    free_slots = []
-    current_time = day_start
+    # Busy periods merged across all of the user's calendars
+    availability = get_availability(creds, day_start, day_end)
     
-    for start, end, _ in day_events:
-        # If there's a gap between current_time and the next event's start
-        if current_time < start:
-            # Only add slots that are at least 30 minutes
-            if (start - current_time).total_seconds() >= 30 * 60:
-                free_slots.append((current_time, start))
-                
-        # Update current time to the end of this event
-        current_time = max(current_time, end)
+    # Name each busy period after the primary calendar events overlapping it
+    events = calendar_mirror.get_events(creds, time_min=day_start, time_max=day_end)
+    day_events = []
+    for start, end in availability['busy']:
+        summaries = []
+        for event in events:
+            event_start = event_time(event.get('start'))
+            event_end = event_time(event.get('end'))
+            if event_start and event_end and event_start < end and event_end > start:
+                summaries.append(event.get('summary', 'No Title'))
+        day_events.append((start.astimezone(tz), end.astimezone(tz), ', '.join(summaries) or 'Busy'))
     
-    # Check for free time after the last event until end of day
-    if current_time < day_end:
-        free_slots.append((current_time, day_end))
+    # Only keep gaps of at least 30 minutes, except the one running until the end of the day
+    free_slots = [
+        (start.astimezone(tz), end.astimezone(tz))
+        for start, end in availability['free']
+        if end == day_end or (end - start).total_seconds() >= 30 * 60
+    ]
     
     return free_slots, day_events
 
@@ -992,8 +1236,14 @@ def format_time_slot(slot):
     # Format as "10:00 AM - 11:30 AM"
     return f"{start.strftime('%I:%M %p')} - {end.strftime('%I:%M %p')}"
 
-def parse_date_with_ai(date_text, model):
-    """Use AI to parse a date string into a datetime object"""
+def parse_date_with_ai(date_text):
+    """Parse a date string into a date, only asking the AI when the local parser is unsure"""
+    local_result = parse_date_text(date_text)
+    if is_confident(local_result):
+        current_app.logger.info(f"Parsed date locally: {date_text} -> {local_result['date']} "
+                                f"(confidence {local_result['confidence']})")
+        return local_result['date']
+    
     prompt = f"""
     Parse the following date/time reference into a specific date: "{date_text}"
     
@@ -1005,7 +1255,7 @@ def parse_date_with_ai(date_text, model):
     """
     
     try:
-        response = model.generate_content(prompt)
+        response = llm.generate(prompt)
         date_str = response.text.strip()
         
         # Extract just the date if there's additional text
@@ -1031,17 +1281,11 @@ def check_availability_command(command_content, creds):
         })
     
     try:
-        # Initialize the model for date parsing
-        model = GenerativeModel(os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash'))
-        
         # Parse the date using AI
-        date_to_check = parse_date_with_ai(command_content, model)
+        date_to_check = parse_date_with_ai(command_content)
         
-        # Fetch calendar events
-        events = fetch_calendar_events(creds)
-        
-        # Get free time slots and booked events
-        free_slots, booked_events = find_free_slots(events, date_to_check)
+        # Get free time slots and booked events from the user's free/busy information
+        free_slots, booked_events = find_free_slots(creds, date_to_check)
         
         # Format the response
         formatted_date = date_to_check.strftime("%A, %B %d, %Y")
@@ -1097,117 +1341,83 @@ def suggest_time_command(command_content, creds):
         })
     
     try:
-        # Initialize the model
-        model = GenerativeModel(os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash'))
-        
         # Extract event details and target date
         prompt = f"""
         Extract event information from this request: "{command_content}"
         
-        Provide a JSON response with:
+        Provide:
         1. Event title (a concise description of the activity)
         2. The target date for this event
         3. Estimated duration in minutes
         4. Any mentioned preferences (morning, afternoon, etc)
-        
-        Format:
-        {{
-            "title": "Event title",
-            "target_date": "specific date or day reference like 'tomorrow', 'next Friday'",
-            "duration": duration in minutes (default to 60 if not specified),
-            "preference": "time preference (morning, afternoon, evening, etc) or null"
-        }}
         """
         
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        
-        # Extract JSON from response if needed
-        if "```json" in response_text:
-            json_str = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            json_str = response_text.split("```")[1].strip()
-        else:
-            json_str = response_text
-            
-        event_data = json.loads(json_str)
+        event_data, errors = generate_structured(llm, prompt, SUGGEST_TIME_SCHEMA)
+        if event_data is None:
+            raise StructuredOutputError(f"Could not extract the event to schedule: {errors}")
         
         # Parse the date
-        target_date = parse_date_with_ai(event_data.get("target_date", "today"), model)
+        target_date = parse_date_with_ai(event_data.get("target_date") or "today")
         
         # Get event title and duration
         title = event_data.get("title", "New Event")
-        duration = int(event_data.get("duration", 60))  # in minutes
+        duration = event_data.get("duration") or 60  # in minutes
         preference = event_data.get("preference")
         
-        # Fetch calendar events
-        events = fetch_calendar_events(creds)
-        
-        # Find free slots
-        free_slots, _ = find_free_slots(events, target_date)
-        
-        # Filter slots based on duration and preference
-        suitable_slots = []
-        for start, end in free_slots:
-            slot_duration = (end - start).total_seconds() / 60
-            
-            # Check if the slot is long enough
-            if slot_duration >= duration:
-                # Create potential slots within this free period
-                potential_starts = []
-                current = start
-                while (current + timedelta(minutes=duration)) <= end:
-                    potential_starts.append(current)
-                    current += timedelta(minutes=30)  # 30-minute increments
-                
-                # Add all potential start times to suitable slots
-                for potential_start in potential_starts:
-                    slot_end = potential_start + timedelta(minutes=duration)
-                    suitable_slots.append((potential_start, slot_end))
-        
-        # Apply time preference if specified
-        if preference and suitable_slots:
-            filtered_slots = []
-            
-            if preference.lower() in ["morning", "am", "early"]:
-                # Morning: 9 AM - 12 PM
-                filtered_slots = [s for s in suitable_slots if s[0].hour < 12]
-            elif preference.lower() in ["afternoon", "noon", "lunch"]:
-                # Afternoon: 12 PM - 5 PM
-                filtered_slots = [s for s in suitable_slots if 12 <= s[0].hour < 17]
-            elif preference.lower() in ["evening", "night", "pm", "late"]:
-                # Evening: 5 PM - 8 PM
-                filtered_slots = [s for s in suitable_slots if s[0].hour >= 17]
-                
-            if filtered_slots:
-                suitable_slots = filtered_slots
+        # Search from the target date onwards so a fully booked day does not end the search
+        tz = pytz.timezone(SCHEDULING_TIMEZONE)
+        range_start = max(
+            tz.localize(datetime.combine(target_date, time(0, 0))),
+            datetime.now(tz)
+        )
+        range_end = tz.localize(datetime.combine(target_date + timedelta(days=SUGGEST_SEARCH_DAYS), time(0, 0)))
+        busy = IntervalIndex(query_busy_intervals(creds, range_start, range_end))
+        slot_options = {
+            'duration': timedelta(minutes=duration),
+            'tz': tz,
+            'count': SUGGEST_SLOT_COUNT,
+            'buffer': timedelta(minutes=SCHEDULING_BUFFER_MINUTES)
+        }
+        suitable_slots = find_slots(busy, range_start, range_end, preference=preference, **slot_options)
+        if not suitable_slots and normalize_preference(preference):
+            # Nothing matches the preference, fall back to the whole working day
+            suitable_slots = find_slots(busy, range_start, range_end, **slot_options)
         
         # No suitable slots found
         if not suitable_slots:
             formatted_date = target_date.strftime("%A, %B %d, %Y")
             return jsonify({
-                "response": f"I couldn't find a suitable time for a {duration}-minute '{title}' on {formatted_date}. Would you like to check a different day?",
+                "response": f"I couldn't find a suitable time for a {duration}-minute '{title}' in the {SUGGEST_SEARCH_DAYS} days from {formatted_date}. Would you like to check a different day?",
                 "command_detected": True,
                 "ask_followup": False
             })
             
-        # Select the best slot (first available, or based on preference)
+        # Select the best slot (the first available one, matching the preference if possible)
         best_slot = suitable_slots[0]
+        slot_date = best_slot[0].date()
         
         # Format the suggestion
         start_time = best_slot[0].strftime("%I:%M %p")
         end_time = best_slot[1].strftime("%I:%M %p")
-        formatted_date = target_date.strftime("%A, %B %d, %Y")
+        formatted_date = slot_date.strftime("%A, %B %d, %Y")
         
         # Store event info for follow-up
         session['suggested_event'] = {
             'title': title,
             'start': best_slot[0].isoformat(),
             'end': best_slot[1].isoformat(),
-            'date': target_date.isoformat()
+            'date': slot_date.isoformat()
         }
         
-        response = f"### Time Suggestion\n\nI suggest scheduling **{title}** on **{formatted_date}** from **{start_time}** to **{end_time}**.\n\nWould you like me to add this to your calendar?"
+        response = "### Time Suggestion\n\n"
+        if slot_date != target_date:
+            response += f"There is no suitable free time on {target_date.strftime('%A, %B %d')}. "
+        response += f"I suggest scheduling **{title}** on **{formatted_date}** from **{start_time}** to **{end_time}**."
+        if len(suitable_slots) > 1:
+            response += "\n\n**Other options:**\n"
+            for slot in suitable_slots[1:]:
+                response += f"- {slot[0].strftime('%A, %B %d')}: {format_time_slot(slot)}\n"
+        response = response.rstrip("\n") + "\n\nWould you like me to add this to your calendar?"
         
         return jsonify({
             "response": response,
@@ -320,6 +320,7 @@ function addMessage(message, isUser = true, isMarkdown = false) {
       chatMessages.scrollTop = chatMessages.scrollHeight;
     }, 10);
   }
+  return div;
 }
 
 function showCommandSuggestions() {
@@ -353,6 +354,101 @@ function showCommandSuggestions() {
   }, 15000);
 }
 
+// Read a text/event-stream response, calling onEvent(event, data) for each event
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      const dataLines = [];
+      rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+      });
+      if (dataLines.length) {
+        onEvent(event, JSON.parse(dataLines.join('\n')));
+      }
+    }
+  }
+}
+
+// Show a complete chat reply (commands, follow-ups and non-streamed answers)
+function handleChatReply(data) {
+  // Check if this was a command response (for special formatting)
+  const isCommand = data.command_detected === true;
+  const useMarkdown = isCommand || data.markdown === true;
+  
+  addMessage(data.response, false, useMarkdown);
+  
+  // Handle event suggestions that need follow-up
+  if (data.ask_followup && data.event_suggestion) {
+    // Store that we're awaiting a follow-up
+    localStorage.setItem('awaitingFollowUp', 'true');
+    localStorage.setItem('suggestedEventData', JSON.stringify(data.event_suggestion));
+    
+    // Add quick response buttons for yes/no
+    addFollowUpButtons();
+  }
+  
+  // Special handling for event data from commands
+  if (isCommand && data.event_data) {
+    // If this is an @add command, add the task to the todo list
+    if (data.event_data.title && data.event_data.datetime) {
+      console.log("Adding task to todo list from chatbot command:", data.event_data);
+      
+      // Extract event ID from URL if available
+      let eventId = null;
+      if (data.event_data.event_id) {
+        eventId = data.event_data.event_id;
+      } else if (data.event_data.link) {
+        eventId = extractEventIdFromUrl(data.event_data.link);
+      }
+      
+      // Add to todo list UI
+      const addedTask = addTask(
+        data.event_data.title, 
+        data.event_data.datetime, 
+        data.event_data.link, 
+        eventId,
+        data.event_data.email_id
+      );
+      
+      if (addedTask) {
+        showNotification(`Added "${data.event_data.title}" to your task list`, "success");
+      }
+      
+      // Add to current event IDs for tracking
+      if (eventId) {
+        const currentEventIds = JSON.parse(localStorage.getItem('currentEventIds') || '[]');
+        if (!currentEventIds.includes(eventId)) {
+          currentEventIds.push(eventId);
+          localStorage.setItem('currentEventIds', JSON.stringify(currentEventIds));
+        }
+      }
+      
+      // Add email ID to the list of processed emails
+      if (data.event_data.email_id) {
+        const processedEmailIds = JSON.parse(localStorage.getItem('processedEmailIds') || '[]');
+        if (!processedEmailIds.includes(data.event_data.email_id)) {
+          processedEmailIds.push(data.event_data.email_id);
+          localStorage.setItem('processedEmailIds', JSON.stringify(processedEmailIds));
+        }
+      }
+    }
+  }
+}
+
 async function sendMessage() {
   // Get the message from the input
   const message = userInput.value.trim();
@@ -380,10 +476,10 @@ async function sendMessage() {
     }
   }
 
+  // Show loading indicator
+  const loadingMessage = addMessage("...", false);
+  
   try {
-    // Show loading indicator
-    const loadingMessage = addMessage("...", false);
-    
     const requestData = { message };
     
     // If this is a follow-up, add the necessary data
@@ -392,7 +488,9 @@ async function sendMessage() {
       requestData.action = 'add_event';
     }
     
-    const response = await fetch("/chat", {
+    // Answers are streamed token by token where the browser supports it
+    const canStream = !!(window.ReadableStream && window.TextDecoder);
+    const response = await fetch(canStream ? "/chat/stream" : "/chat", {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -403,73 +501,35 @@ async function sendMessage() {
     });
 
     try {
-      const data = await handleApiResponse(response);
-      
-      // Check if this was a command response (for special formatting)
-      const isCommand = data.command_detected === true;
-      const useMarkdown = isCommand || data.markdown === true;
-      
-      // Remove loading message
-      if (loadingMessage) {
-        loadingMessage.remove();
-      }
-      
-      addMessage(data.response, false, useMarkdown);
-      
-      // Handle event suggestions that need follow-up
-      if (data.ask_followup && data.event_suggestion) {
-        // Store that we're awaiting a follow-up
-        localStorage.setItem('awaitingFollowUp', 'true');
-        localStorage.setItem('suggestedEventData', JSON.stringify(data.event_suggestion));
-        
-        // Add quick response buttons for yes/no
-        addFollowUpButtons();
-      }
-      
-      // Special handling for event data from commands
-      if (isCommand && data.event_data) {
-        // If this is an @add command, add the task to the todo list
-        if (data.event_data.title && data.event_data.datetime) {
-          console.log("Adding task to todo list from chatbot command:", data.event_data);
-          
-          // Extract event ID from URL if available
-          let eventId = null;
-          if (data.event_data.event_id) {
-            eventId = data.event_data.event_id;
-          } else if (data.event_data.link) {
-            eventId = extractEventIdFromUrl(data.event_data.link);
-          }
-          
-          // Add to todo list UI
-          const addedTask = addTask(
-            data.event_data.title, 
-            data.event_data.datetime, 
-            data.event_data.link, 
-            eventId,
-            data.event_data.email_id
-          );
-          
-          if (addedTask) {
-            showNotification(`Added "${data.event_data.title}" to your task list`, "success");
-          }
-          
-          // Add to current event IDs for tracking
-          if (eventId) {
-            const currentEventIds = JSON.parse(localStorage.getItem('currentEventIds') || '[]');
-            if (!currentEventIds.includes(eventId)) {
-              currentEventIds.push(eventId);
-              localStorage.setItem('currentEventIds', JSON.stringify(currentEventIds));
-            }
-          }
-          
-          // Add email ID to the list of processed emails
-          if (data.event_data.email_id) {
-            const processedEmailIds = JSON.parse(localStorage.getItem('processedEmailIds') || '[]');
-            if (!processedEmailIds.includes(data.event_data.email_id)) {
-              processedEmailIds.push(data.event_data.email_id);
-              localStorage.setItem('processedEmailIds', JSON.stringify(processedEmailIds));
+      const isEventStream = (response.headers.get('Content-Type') || '').includes('text/event-stream');
+      if (!response.ok || !isEventStream) {
+        // Plain JSON: the non-streaming endpoint, or an error such as an expired session
+        const data = await handleApiResponse(response);
+        if (loadingMessage) loadingMessage.remove();
+        handleChatReply(data);
+      } else {
+        let streamedMessage = null;
+        let streamedText = '';
+        await readEventStream(response, (event, data) => {
+          if (event === 'token') {
+            if (!streamedMessage) {
+              if (loadingMessage) loadingMessage.remove();
+              streamedMessage = addMessage('', false);
             }
+            streamedText += data.text;
+            streamedMessage.textContent = streamedText;
+            const chatMessages = document.getElementById('chat-messages');
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+          } else if (event === 'reply') {
+            if (loadingMessage) loadingMessage.remove();
+            handleChatReply(data);
+          } else if (event === 'error') {
+            throw new Error(data.error || 'Stream error');
           }
+        });
+        if (streamedMessage) {
+          // Drop the whitespace the model puts around its answer, as /chat does
+          streamedMessage.textContent = streamedText.trim();
         }
       }
       
@@ -491,6 +551,7 @@ async function sendMessage() {
     }
   } catch (error) {
     console.error("Error:", error);
+    if (loadingMessage) loadingMessage.remove();
     addMessage("Sorry, there was an error processing your request.", false);
   }
 }
@@ -667,6 +728,10 @@ function addSuggestion(suggestion) {
     console.log(`Stored deadline in suggestion DOM: ${suggestion.deadline}`);
   }
   
+  if (suggestion.email_id) {
+    suggestedItem.dataset.emailId = suggestion.email_id;
+  }
+  
   suggestionBox.appendChild(div);
 }
 
@@ -764,6 +829,86 @@ async function getSuggestions() {
   }
 }
 
+// Accept every displayed suggestion with a single /addtasks request
+async function addAllSuggestions() {
+  const suggestionItems = Array.from(suggestionBox.querySelectorAll('.suggested-item'))
+    .filter(item => !isDuplicateTask(item.querySelector('.text').textContent));
+  if (!suggestionItems.length) {
+    showNotification('No suggestions to add', 'info');
+    return;
+  }
+  
+  const addAllBtn = document.getElementById('add-all-sug');
+  addAllBtn.disabled = true;
+  try {
+    const response = await fetch("/addtasks", {
+      method: "POST",
+      headers: { 
+        "Content-Type": "application/json",
+        'X-Requested-With': 'XMLHttpRequest'
+      },
+      body: JSON.stringify({
+        tasks: suggestionItems.map(item => ({
+          task_text: item.querySelector('.text').textContent,
+          event_date: item.dataset.eventDate || '',
+          email_id: item.dataset.emailId || null
+        }))
+      }),
+      credentials: "include"
+    });
+
+    try {
+      const data = await handleApiResponse(response);
+      const currentEventIds = JSON.parse(localStorage.getItem('currentEventIds') || '[]');
+      const processedEmails = JSON.parse(localStorage.getItem('processedEmails') || '[]');
+      
+      data.results.forEach(result => {
+        const suggestionItem = suggestionItems[result.index];
+        if (!result.success || !suggestionItem) {
+          console.log(`Could not add suggestion ${result.index}: ${result.error}`);
+          return;
+        }
+        
+        const eventId = result.event_id || (result.event ? extractEventIdFromUrl(result.event) : null);
+        if (eventId && !currentEventIds.includes(eventId)) {
+          currentEventIds.push(eventId);
+        }
+        if (result.email_id && !processedEmails.includes(result.email_id)) {
+          processedEmails.push(result.email_id);
+        }
+        
+        const deadline = suggestionItem.dataset.deadline || '';
+        addTask(result.response || suggestionItem.querySelector('.text').textContent, result.deadline || deadline, result.event, eventId, result.email_id);
+        suggestionItem.remove();
+      });
+      
+      localStorage.setItem('currentEventIds', JSON.stringify(currentEventIds));
+      localStorage.setItem('processedEmails', JSON.stringify(processedEmails));
+      
+      const failed = data.results.length - data.added;
+      if (failed) {
+        showNotification(`Added ${data.added} tasks, ${failed} could not be added`, 'error');
+      } else {
+        showNotification(`Added ${data.added} tasks to calendar!`, 'success');
+      }
+      if (!suggestionBox.querySelector('.suggested-item')) {
+        suggestionBox.innerHTML = '<div class="no-suggestions">No new suggestions found</div>';
+      }
+    } catch (error) {
+      if (error.message === 'Authentication required') {
+        // This will be handled by handleApiResponse
+        return;
+      }
+      throw error;
+    }
+  } catch (error) {
+    console.error("Error adding all suggestions:", error);
+    showNotification(`Error adding tasks: ${error.message}`, 'error');
+  } finally {
+    addAllBtn.disabled = false;
+  }
+}
+
 // Add styles for suggestion enhancements
 function addStyles() {
   const style = document.createElement('style');
@@ -1082,6 +1227,7 @@ document.addEventListener('DOMContentLoaded', async () => {
   
   // Suggestions
   document.getElementById('refresh-sug').addEventListener('click', getSuggestions);
+  document.getElementById('add-all-sug').addEventListener('click', addAllSuggestions);
   getSuggestions(); // Load suggestions on page load
   
   // Suggested items actions
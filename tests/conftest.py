@@ -0,0 +1,20 @@
+# backend/tests/conftest.py
+import os
+import shutil
+import tempfile
+
+_source_dir = None
+_work_dir = None
+
+
+def pytest_configure(config):
+    # Importing utils.auth or the app creates the key file, session and token
+    # directories in the working directory; keep them out of the source tree
+    global _source_dir, _work_dir
+    _source_dir = os.getcwd()
+    _work_dir = tempfile.mkdtemp(prefix='rundown-tests-')
+    os.chdir(_work_dir)
+
+def pytest_unconfigure(config):
+    os.chdir(_source_dir)
+    shutil.rmtree(_work_dir, ignore_errors=True)
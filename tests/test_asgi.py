@@ -0,0 +1,175 @@
+# backend/tests/test_asgi.py
+import os
+import json
+import asyncio
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def asgi(tmp_path_factory):
+    # Importing the app creates the key file, session and token directories in the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('asgi'))
+    try:
+        yield importlib.import_module('asgi')
+    finally:
+        os.chdir(cwd)
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGateway:
+    """Stands in for the LLM gateway; the stream yields `chunks` slowly, or forever if `endless`."""
+
+    def __init__(self, text='', chunks=(), endless=False):
+        self.text = text
+        self.chunks = list(chunks)
+        self.endless = endless
+        self.cancelled = False
+
+    async def generate_async(self, prompt):
+        return Chunk(self.text)
+
+    async def stream_async(self, prompt):
+        try:
+            for chunk in self.chunks:
+                await asyncio.sleep(0.01)
+                yield Chunk(chunk)
+            while self.endless:
+                await asyncio.sleep(0.01)
+                yield Chunk('.')
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def http_scope(method, path, headers=()):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': b'',
+        'headers': [(name.encode('latin1'), value.encode('latin1')) for name, value in headers],
+    }
+
+def run(asgi, scope, body=b'', disconnect_after=None):
+    """
+    Call the ASGI app and collect what it sends.
+
+    The client disconnects after `disconnect_after` seconds, or never if None.
+    """
+    sent = []
+
+    async def call():
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            if disconnect_after is None:
+                await asyncio.Event().wait()
+            await asyncio.sleep(disconnect_after)
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        await asyncio.wait_for(asgi.app(scope, receive, send), timeout=5)
+
+    asyncio.run(call())
+    return sent
+
+def response_of(sent):
+    start = sent[0]
+    assert start['type'] == 'http.response.start'
+    headers = {name.decode('latin1'): value.decode('latin1') for name, value in start['headers']}
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return start['status'], headers, body
+
+def pending_view(asgi, prompt='prompt'):
+    """Replace the Flask side of the chat routes with one that always needs an answer."""
+    def run_flask_view(environ, view):
+        return asgi.flask_app.response_class(), asgi.PendingAnswer(prompt)
+    return run_flask_view
+
+
+def test_lifespan(asgi, monkeypatch):
+    # Shutdown stops the thread pool, so give it one of its own
+    monkeypatch.setattr(asgi, '_executor', ThreadPoolExecutor(max_workers=1))
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app({'type': 'lifespan'}, receive, send))
+    assert sent == [{'type': 'lifespan.startup.complete'}, {'type': 'lifespan.shutdown.complete'}]
+
+def test_other_routes_go_to_flask(asgi):
+    status, headers, body = response_of(run(asgi, http_scope('GET', '/api/session')))
+    assert status == 401
+    assert json.loads(body) == {"authenticated": False, "redirect": "/login"}
+    assert headers['access-control-allow-credentials'] == 'true'
+
+def test_chat_requires_a_session(asgi):
+    scope = http_scope('POST', '/chat', [('content-type', 'application/json')])
+    status, headers, body = response_of(run(asgi, scope, json.dumps({'message': 'hi'}).encode()))
+    assert status == 401
+    assert json.loads(body)['error'] == "Authentication required"
+
+def test_chat_answers_pending_prompt(asgi, monkeypatch):
+    monkeypatch.setattr(asgi, 'run_flask_view', pending_view(asgi))
+    monkeypatch.setattr(asgi, 'llm_gateway', FakeGateway(text=' Hello there '))
+    status, headers, body = response_of(run(asgi, http_scope('POST', '/chat')))
+    assert status == 200
+    assert headers['content-type'] == 'application/json'
+    assert json.loads(body) == {"response": "Hello there", "command_detected": False}
+
+def test_chat_empty_answer(asgi, monkeypatch):
+    monkeypatch.setattr(asgi, 'run_flask_view', pending_view(asgi))
+    monkeypatch.setattr(asgi, 'llm_gateway', FakeGateway(text='  '))
+    status, headers, body = response_of(run(asgi, http_scope('POST', '/chat')))
+    assert status == 500
+    assert json.loads(body) == {"error": "Empty response from AI model"}
+
+def test_chat_stream_sends_tokens_then_done(asgi, monkeypatch):
+    monkeypatch.setattr(asgi, 'run_flask_view', pending_view(asgi))
+    monkeypatch.setattr(asgi, 'llm_gateway', FakeGateway(chunks=['Hel', 'lo']))
+    status, headers, body = response_of(run(asgi, http_scope('POST', '/chat/stream')))
+    assert status == 200
+    assert headers['content-type'] == 'text/event-stream'
+    assert body.decode() == (
+        asgi.sse_event('token', {"text": "Hel"})
+        + asgi.sse_event('token', {"text": "lo"})
+        + asgi.sse_event('done', {"command_detected": False})
+    )
+
+def test_chat_stream_disconnect_cancels_generation(asgi, monkeypatch):
+    gateway = FakeGateway(endless=True)
+    monkeypatch.setattr(asgi, 'run_flask_view', pending_view(asgi))
+    monkeypatch.setattr(asgi, 'llm_gateway', gateway)
+    sent = run(asgi, http_scope('POST', '/chat/stream'), disconnect_after=0.05)
+    assert gateway.cancelled
+    # No final event is written after the client went away
+    assert all(message.get('more_body') for message in sent[1:])
+
+def test_disconnect_before_body_sends_nothing(asgi):
+    sent = []
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(http_scope('POST', '/chat'), receive, send))
+    assert sent == []
@@ -0,0 +1,176 @@
+# backend/tests/test_calendar_mirror.py
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from googleapiclient.errors import HttpError
+
+import utils.calendar as calendar
+from utils.calendar_mirror import CalendarMirror
+from utils.service_pool import service_pool
+
+NOW = datetime.now(timezone.utc)
+
+
+class Creds:
+    def __init__(self, user):
+        self.refresh_token = user
+
+
+class Gone(HttpError):
+    def __init__(self):
+        self.resp = type('Response', (), {'status': 410, 'reason': 'Gone'})()
+        self.content = b''
+        self.uri = None
+        self.error_details = ''
+
+
+class FakeRequest:
+    def __init__(self, run):
+        self.run = run
+
+    def execute(self):
+        return self.run()
+
+
+def make_event(event_id, hours_from_now=1):
+    start = NOW + timedelta(hours=hours_from_now)
+    return {
+        'id': event_id,
+        'summary': event_id,
+        'start': {'dateTime': start.isoformat()},
+        'end': {'dateTime': (start + timedelta(hours=1)).isoformat()},
+    }
+
+
+class FakeCalendar:
+    """A primary calendar whose changes are numbered; sync tokens are change numbers."""
+
+    def __init__(self):
+        self.changes = []
+        self.list_calls = []
+        self.expired_tokens = set()
+        self.insert_error = None
+
+    def add(self, event):
+        self.changes.append(event)
+
+    def cancel(self, event_id):
+        self.changes.append({'id': event_id, 'status': 'cancelled'})
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.list_calls.append(params)
+
+        def run():
+            token = params.get('syncToken')
+            if token in self.expired_tokens:
+                raise Gone()
+            changes = self.changes[int(token):] if token else [
+                event for event in self.changes if event.get('status') != 'cancelled'
+            ]
+            return {'items': changes, 'nextSyncToken': str(len(self.changes))}
+        return FakeRequest(run)
+
+    def insert(self, calendarId, body):
+        def run():
+            event = dict(make_event(body.get('id', f"event-{len(self.changes)}")), **body)
+            self.add(event)
+            if self.insert_error:
+                # The write went through, but the answer never arrived
+                raise self.insert_error
+            return event
+        return FakeRequest(run)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    fake = FakeCalendar()
+
+    @contextmanager
+    def checkout(api, version, creds):
+        yield fake
+
+    monkeypatch.setattr(service_pool, 'checkout', checkout)
+    return fake
+
+@pytest.fixture
+def mirror(monkeypatch):
+    mirror = CalendarMirror(max_staleness=3600)
+    monkeypatch.setattr(calendar, 'calendar_mirror', mirror)
+    return mirror
+
+def ids(events):
+    return [event['id'] for event in events]
+
+
+def test_first_read_is_a_full_sync_and_later_reads_use_the_mirror(service, mirror):
+    service.add(make_event('later', 3))
+    service.add(make_event('sooner', 1))
+    service.add(make_event('past', -5))
+    creds = Creds('alice')
+
+    assert ids(mirror.get_events(creds)) == ['sooner', 'later']
+    assert 'timeMin' in service.list_calls[0] and 'syncToken' not in service.list_calls[0]
+
+    service.add(make_event('new'))
+    assert ids(mirror.get_events(creds)) == ['sooner', 'later']
+    assert len(service.list_calls) == 1
+
+def test_stale_mirror_syncs_incrementally(service, mirror):
+    service.add(make_event('a'))
+    service.add(make_event('b', 2))
+    creds = Creds('alice')
+    mirror.get_events(creds)
+
+    service.cancel('a')
+    service.add(make_event('c', 3))
+    mirror.max_staleness = 0
+    assert ids(mirror.get_events(creds)) == ['b', 'c']
+    assert service.list_calls[-1]['syncToken'] == '2'
+
+def test_expired_sync_token_falls_back_to_full_sync(service, mirror):
+    service.add(make_event('a'))
+    creds = Creds('alice')
+    mirror.get_events(creds)
+
+    service.expired_tokens.add('1')
+    service.add(make_event('b', 2))
+    mirror.max_staleness = 0
+    assert ids(mirror.get_events(creds)) == ['a', 'b']
+    assert 'syncToken' not in service.list_calls[-1]
+
+def test_writes_through_the_app_are_applied_directly(service, mirror):
+    creds = Creds('alice')
+    mirror.get_events(creds)
+    mirror.apply_created(creds, make_event('created'))
+    assert ids(mirror.get_events(creds)) == ['created']
+    mirror.apply_deleted(creds, 'created')
+    assert mirror.get_events(creds) == []
+    assert len(service.list_calls) == 1
+
+def test_invalidate_makes_next_read_sync_incrementally(service, mirror):
+    creds = Creds('alice')
+    mirror.get_events(creds)
+    service.add(make_event('outside'))
+
+    mirror.invalidate(creds)
+    assert ids(mirror.get_events(creds)) == ['outside']
+    assert service.list_calls[-1]['syncToken'] == '0'
+
+def test_invalidate_unknown_user_does_nothing(service, mirror):
+    mirror.invalidate(Creds('nobody'))
+    assert mirror._calendars == {}
+
+def test_failed_create_invalidates_the_mirror(service, mirror):
+    creds = Creds('alice')
+    mirror.get_events(creds)
+    service.insert_error = TimeoutError('timed out')
+
+    iso_date = (NOW + timedelta(hours=1)).replace(tzinfo=None).isoformat()
+    with pytest.raises(TimeoutError):
+        calendar.create_calendar_event(creds, 'Lunch', 'sam@example.com', 'today', iso_date)
+    assert len(mirror.get_events(creds)) == 1
+    assert 'syncToken' in service.list_calls[-1]
@@ -0,0 +1,68 @@
+# backend/tests/test_dateparse.py
+from datetime import date, datetime, time
+
+import pytest
+
+from utils.dateparse import find_date_mentions, is_confident, parse_date_text, strip_date_phrases
+
+# A Friday
+NOW = datetime(2026, 5, 1, 9, 0)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Lunch 2026-06-03 12:30", date(2026, 6, 3)),
+    ("Dinner at Joe's tomorrow 7pm", date(2026, 5, 2)),
+    ("Meeting on May 5 at 3pm", date(2026, 5, 5)),
+    ("Webinar: Thursday, May 7 at 3pm ET", date(2026, 5, 7)),
+    ("Review May 5, 2026", date(2026, 5, 5)),
+])
+def test_confident_dates(text, expected):
+    result = parse_date_text(text, NOW)
+    assert result['date'] == expected
+    assert is_confident(result)
+
+def test_times_and_ranges():
+    assert parse_date_text("Dinner tomorrow 7pm", NOW)['start_time'] == time(19, 0)
+
+    result = parse_date_text("Standup tomorrow 10am-10:30am", NOW)
+    assert (result['start_time'], result['end_time']) == (time(10, 0), time(10, 30))
+
+    # "11-1pm": the start is in the morning
+    result = parse_date_text("Workshop tomorrow 11-1pm", NOW)
+    assert (result['start_time'], result['end_time']) == (time(11, 0), time(13, 0))
+
+@pytest.mark.parametrize('text', [
+    "I may 5 times",
+    "We may 10 of them",
+])
+def test_modal_may_is_not_confident(text):
+    result = parse_date_text(text, NOW)
+    assert not is_confident(result)
+
+def test_may_with_weekday_or_on_stays_confident():
+    assert is_confident(parse_date_text("Thursday, May 7", NOW))
+    assert is_confident(parse_date_text("Party on May 9", NOW))
+
+def test_several_dates_are_left_to_the_llm():
+    result = parse_date_text("Either June 3 or June 4", NOW)
+    assert result['date'] == date(2026, 6, 3)
+    assert not is_confident(result)
+
+def test_no_date():
+    result = parse_date_text("Nothing planned", NOW)
+    assert result['date'] is None
+    assert not is_confident(result)
+
+def test_find_date_mentions_in_text_order():
+    mentions = find_date_mentions("See you June 7, or else May 30", NOW)
+    assert [mention['date'] for mention in mentions] == [date(2026, 6, 7), date(2026, 5, 30)]
+
+@pytest.mark.parametrize('text, title', [
+    ("Meeting on May 5 at 3pm", "Meeting"),
+    ("Webinar: Thursday, May 7 at 3pm ET", "Webinar"),
+    ("Dinner at Joe's tomorrow 7pm", "Dinner at Joe's"),
+    ("Lunch 2026-06-03 12:30", "Lunch"),
+    ("Call with Sam tomorrow at 10am PST", "Call with Sam"),
+])
+def test_strip_date_phrases(text, title):
+    assert strip_date_phrases(text, parse_date_text(text, NOW)) == title
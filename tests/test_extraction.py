@@ -0,0 +1,117 @@
+# backend/tests/test_extraction.py
+import json
+from datetime import datetime
+
+import pytest
+
+import utils.extraction as extraction
+import utils.email_processor as email_processor
+from utils.extraction import extract_batch
+from utils.extraction_cache import ExtractionCache
+from utils.interest_matcher import InterestMatcher
+from utils.llm_gateway import LLMDeadlineExceeded, LLMUnavailableError
+from utils.structured_output import Field, Schema
+
+SCHEMA = Schema([Field('task', nullable=True)])
+
+
+class Answer:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGateway:
+    """Stands in for an LLMGateway; `answers` (lists of items, or exceptions) are used in order."""
+
+    model_name = 'models/fake'
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.prompts = []
+
+    def generate(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return Answer(json.dumps(answer))
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(extraction, 'extraction_cache', cache)
+    return cache
+
+def emails(*ids):
+    return [{'id': email_id, 'subject': f"Subject {email_id}", 'content': f"Content {email_id}"} for email_id in ids]
+
+
+def test_extracts_items_by_id():
+    llm = FakeGateway([[{'email_id': 'b', 'task': 'Reply'}, {'email_id': 'a', 'task': None}]])
+    assert extract_batch(llm, emails('a', 'b'), 'Extract', SCHEMA, 'v1') == {'a': {'task': None}, 'b': {'task': 'Reply'}}
+
+def test_cached_results_skip_the_model():
+    extract_batch(FakeGateway([[{'email_id': 'a', 'task': 'Reply'}]]), emails('a'), 'Extract', SCHEMA, 'v1')
+    llm = FakeGateway([])
+    assert extract_batch(llm, emails('a'), 'Extract', SCHEMA, 'v1') == {'a': {'task': 'Reply'}}
+    assert llm.prompts == []
+
+def test_malformed_batch_is_split():
+    llm = FakeGateway([
+        {'unexpected': True},
+        [{'email_id': 'a', 'task': 'One'}],
+        [{'email_id': 'b', 'task': 'Two'}],
+    ])
+    assert extract_batch(llm, emails('a', 'b'), 'Extract', SCHEMA, 'v1') == {'a': {'task': 'One'}, 'b': {'task': 'Two'}}
+
+@pytest.mark.parametrize('error', [LLMUnavailableError('open'), LLMDeadlineExceeded('slow')])
+def test_unavailable_gateway_leaves_emails_out_by_default(error):
+    llm = FakeGateway([[{'email_id': 'a', 'task': 'One'}], error])
+    assert extract_batch(llm, emails('a', 'b'), 'Extract', SCHEMA, 'v1', max_emails=1) == {'a': {'task': 'One'}}
+    # Not split and retried: the model was never asked
+    assert len(llm.prompts) == 2
+
+@pytest.mark.parametrize('error', [LLMUnavailableError('open'), LLMDeadlineExceeded('slow')])
+def test_unavailable_gateway_raises_for_background_callers(error, cache):
+    llm = FakeGateway([[{'email_id': 'a', 'task': 'One'}], error])
+    with pytest.raises(type(error)):
+        extract_batch(llm, emails('a', 'b'), 'Extract', SCHEMA, 'v1', max_emails=1, raise_unavailable=True)
+    # What was extracted before the error is kept for the retry
+    assert extract_batch(FakeGateway([]), emails('a'), 'Extract', SCHEMA, 'v1') == {'a': {'task': 'One'}}
+
+
+def email_with_date(email_id):
+    return {
+        'id': email_id,
+        'subject': "Team lunch tomorrow at 12pm",
+        'sender': 'sam@example.com',
+        'date_str': 'Fri, 1 May 2026 09:00:00',
+        'content': "See you there",
+        'timestamp': datetime(2026, 5, 1, 9, 0)
+    }
+
+def gmail_message(email_id):
+    email = email_with_date(email_id)
+    return {
+        'id': email_id,
+        'internalDate': str(int(email['timestamp'].timestamp() * 1000)),
+        'payload': {'headers': [{'name': 'Subject', 'value': email['subject']}], 'body': {}}
+    }
+
+def test_event_extraction_falls_back_to_local_parse_on_model_errors(monkeypatch):
+    monkeypatch.setattr(email_processor, 'LLMGateway', lambda model_name: FakeGateway([RuntimeError('bad request')]))
+    results = email_processor.extract_event_details([email_with_date('a')])
+    assert results['a']['event_date'] == '2026-05-02 12:00'
+
+@pytest.mark.parametrize('error', [LLMUnavailableError('open'), LLMDeadlineExceeded('slow')])
+def test_sweep_leaves_messages_unprocessed_when_gateway_is_unavailable(error, monkeypatch):
+    monkeypatch.setattr(email_processor, 'LLMGateway', lambda model_name: FakeGateway([error]))
+    created = []
+    monkeypatch.setattr(email_processor, 'create_event_from_email', lambda creds, email, data: created.append(email['id']))
+
+    processed_ids = []
+    with pytest.raises(type(error)):
+        email_processor.process_messages(None, [gmail_message('a')], InterestMatcher([]), processed_ids)
+    assert created == []
+    assert processed_ids == []
@@ -0,0 +1,177 @@
+# backend/tests/test_gmail_checkpoints.py
+import pytest
+
+import utils.gmail as gmail
+from utils.gmail import iter_unprocessed_message_pages, requeue_message_ids
+
+USER = 'alice'
+LABEL = 'AddedToCalendar'
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeResource:
+    def __init__(self, list_method):
+        self.list = lambda **params: FakeRequest(list_method(params))
+
+
+class FakeGmail:
+    """A mailbox whose unlabelled backlog is `listed`; mail added later goes through `arrive`."""
+
+    def __init__(self, listed=()):
+        self.history_id = 100
+        self.listed = list(listed)
+        self.added = []
+        self.calls = []
+
+    def arrive(self, *message_ids):
+        self.added.extend(message_ids)
+
+    def users(self):
+        return self
+
+    def getProfile(self, userId):
+        self.calls.append('getProfile')
+        return FakeRequest({'historyId': str(self.history_id)})
+
+    def history(self):
+        return FakeResource(self._list_history)
+
+    def messages(self):
+        return FakeResource(self._list_messages)
+
+    def _list_history(self, params):
+        self.calls.append('history.list')
+        added, self.added = self.added, []
+        self.history_id += 1
+        return {
+            'history': [{'messagesAdded': [{'message': {'id': msg_id}} for msg_id in added]}],
+            'historyId': str(self.history_id)
+        }
+
+    def _list_messages(self, params):
+        self.calls.append('messages.list')
+        start = int(params.get('pageToken') or 0)
+        end = start + params['maxResults']
+        response = {'messages': [{'id': msg_id} for msg_id in self.listed[start:end]]}
+        if end < len(self.listed):
+            response['nextPageToken'] = str(end)
+        return response
+
+
+@pytest.fixture
+def cursors(monkeypatch):
+    saved = {}
+
+    class FakeSyncState:
+        @staticmethod
+        def get_cursor(user_id, stream):
+            return saved.get((user_id, stream), {})
+
+        @staticmethod
+        def save_cursor(user_id, stream, cursor):
+            saved[(user_id, stream)] = cursor
+
+    monkeypatch.setattr(gmail, 'SyncState', FakeSyncState)
+    return saved
+
+def sweep(service, failing=(), budget=100, page_size=2, max_attempts=gmail.EMAIL_FETCH_MAX_ATTEMPTS):
+    """Run one sweep the way process_user_emails does; returns the pages handed out."""
+    pages = []
+    failed_ids = []
+    for message_ids, checkpoint in iter_unprocessed_message_pages(service, USER, LABEL, budget, page_size):
+        pages.append(message_ids)
+        failed_ids.extend(msg_id for msg_id in message_ids if msg_id in failing)
+        gmail.SyncState.save_cursor(USER, 'processing', requeue_message_ids(checkpoint, failed_ids, max_attempts))
+    return pages
+
+def cursor_of(cursors):
+    return cursors[(USER, 'processing')]
+
+
+def test_full_resync_pages_through_backlog_then_switches_to_history(cursors):
+    service = FakeGmail(listed=['m1', 'm2', 'm3'])
+    assert sweep(service) == [['m1', 'm2'], ['m3']]
+    assert service.calls[0] == 'getProfile'
+    cursor = cursor_of(cursors)
+    assert 'backlog' not in cursor
+    assert cursor['history_id'] == '100'
+
+    service.calls.clear()
+    service.arrive('m4')
+    assert sweep(service) == [['m4']]
+    assert service.calls == ['history.list']
+    assert cursor_of(cursors)['history_id'] == '101'
+
+def test_budget_leaves_backlog_checkpoint_that_resumes(cursors):
+    service = FakeGmail(listed=['m1', 'm2', 'm3', 'm4', 'm5'])
+    assert sweep(service, budget=3) == [['m1', 'm2'], ['m3']]
+    backlog = cursor_of(cursors)['backlog']
+    assert backlog['pending_ids'] == ['m4']
+    assert not backlog['listing_done']
+
+    service.calls.clear()
+    assert sweep(service) == [['m4'], ['m5']]
+    assert 'getProfile' not in service.calls
+    assert 'backlog' not in cursor_of(cursors)
+
+def test_no_new_mail_still_saves_new_history_id(cursors):
+    cursors[(USER, 'processing')] = {'history_id': '100', 'synced_at': 0, 'queries': [f"-label:{LABEL}"]}
+    service = FakeGmail()
+    assert sweep(service) == [[]]
+    assert cursor_of(cursors)['history_id'] == '101'
+
+def test_requeue_keeps_history_checkpoint():
+    checkpoint = {'history_id': '7', 'synced_at': 0, 'queries': ['q'], 'retries': {}}
+    requeued = requeue_message_ids(checkpoint, ['m1', 'm1'])
+    assert requeued == dict(checkpoint, retries={'m1': 1})
+    assert checkpoint['retries'] == {}
+
+def test_requeue_counts_attempts_and_drops_after_max():
+    checkpoint = {'history_id': '7', 'retries': {'m1': 1, 'm2': 1}}
+    assert requeue_message_ids(checkpoint, ['m1'], max_attempts=3)['retries'] == {'m1': 2}
+    assert requeue_message_ids(dict(checkpoint, retries={'m1': 2}), ['m1'], max_attempts=3)['retries'] == {}
+
+def test_requeue_keeps_retries_not_handed_out_yet():
+    backlog = {'history_id': '7', 'pending_ids': ['m2', 'm3'], 'listing_done': True}
+    checkpoint = {'backlog': backlog, 'retries': {'m1': 1, 'm2': 2}}
+    assert requeue_message_ids(checkpoint, [])['retries'] == {'m2': 2}
+
+def test_failed_message_does_not_block_new_mail(cursors):
+    service = FakeGmail(listed=['bad'])
+    sweep(service, failing={'bad'})
+    assert cursor_of(cursors)['retries'] == {'bad': 1}
+
+    service.arrive('m1')
+    assert sweep(service, failing={'bad'}) == [['bad', 'm1']]
+    assert 'history.list' in service.calls
+    assert cursor_of(cursors)['retries'] == {'bad': 2}
+
+def test_failed_message_is_dropped_after_max_attempts(cursors):
+    service = FakeGmail(listed=['bad'])
+    for _ in range(3):
+        sweep(service, failing={'bad'}, max_attempts=3)
+    assert cursor_of(cursors)['retries'] == {}
+    assert sweep(service) == [[]]
+
+def test_retry_that_succeeds_is_cleared(cursors):
+    service = FakeGmail(listed=['flaky'])
+    sweep(service, failing={'flaky'})
+    assert sweep(service) == [['flaky']]
+    assert cursor_of(cursors)['retries'] == {}
+
+def test_changed_queries_restart_the_listing(cursors):
+    cursors[(USER, 'processing')] = {'backlog': {
+        'history_id': '90', 'synced_at': 0, 'queries': ['-label:Old hackathon'], 'query_index': 0,
+        'page_token': '40', 'pending_ids': ['m9'], 'listing_done': False
+    }}
+    service = FakeGmail(listed=['m1'])
+    assert sweep(service) == [['m9'], ['m1']]
+    assert 'getProfile' not in service.calls
+    assert cursor_of(cursors)['history_id'] == '90'
@@ -0,0 +1,114 @@
+# backend/tests/test_gmail_fetch.py
+from contextlib import contextmanager
+
+import pytest
+from googleapiclient.errors import HttpError
+
+import utils.gmail as gmail
+from utils.gmail import batch_get_messages_two_phase
+
+LABEL_ID = 'Label_1'
+
+
+def headers(subject):
+    return [{'name': 'Subject', 'value': subject}, {'name': 'From', 'value': 'sam@example.com'}]
+
+
+class NotFound(HttpError):
+    def __init__(self):
+        self.resp = type('Response', (), {'status': 404, 'reason': 'Not Found'})()
+        self.content = b''
+        self.uri = None
+        self.error_details = ''
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request, request_id))
+
+    def execute(self):
+        for request, request_id in self.requests:
+            self.service.fetched.append((request['format'], request['id']))
+            message = self.service.mailbox.get(request['id'])
+            if message is None:
+                self.callback(request_id, None, NotFound())
+            elif request['format'] == 'metadata':
+                metadata = {key: message[key] for key in ('id', 'labelIds', 'internalDate')}
+                self.callback(request_id, dict(metadata, payload={'headers': message['payload']['headers']}), None)
+            else:
+                self.callback(request_id, message, None)
+
+
+class FakeGmail:
+    def __init__(self, mailbox):
+        self.mailbox = mailbox
+        self.fetched = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **params):
+        return params
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+@pytest.fixture
+def service():
+    return FakeGmail({
+        'plain': {
+            'id': 'plain', 'labelIds': ['INBOX'], 'internalDate': '1000',
+            'payload': {'mimeType': 'text/plain', 'headers': headers('Lunch'), 'body': {'data': 'aGk='}}
+        },
+        # With the body/data fields mask a message without body data has no 'body' at all
+        'subject-only': {
+            'id': 'subject-only', 'labelIds': ['INBOX'], 'internalDate': '2000',
+            'payload': {'mimeType': 'text/plain', 'headers': headers('Standup moved to 10am')}
+        },
+        'labelled': {
+            'id': 'labelled', 'labelIds': ['INBOX', LABEL_ID], 'internalDate': '3000',
+            'payload': {'mimeType': 'text/plain', 'headers': headers('Done'), 'body': {'data': 'aGk='}}
+        },
+    })
+
+def not_labelled(message):
+    return LABEL_ID not in message.get('labelIds', [])
+
+
+def test_two_phase_fetches_only_survivors_in_full(service):
+    messages, full_ids = batch_get_messages_two_phase(service, ['plain', 'labelled', 'plain'], not_labelled)
+    assert full_ids == {'plain'}
+    assert ('full', 'labelled') not in service.fetched
+    assert service.fetched.count(('metadata', 'plain')) == 1
+    assert 'body' not in messages['labelled']['payload']
+
+def test_message_without_body_counts_as_fetched_in_full(service):
+    messages, full_ids = batch_get_messages_two_phase(service, ['subject-only'], not_labelled)
+    assert full_ids == {'subject-only'}
+    assert gmail.parse_email_details(messages['subject-only'])['content'] == "No content available"
+
+def test_missing_message_is_not_fetched_in_full(service):
+    messages, full_ids = batch_get_messages_two_phase(service, ['gone', 'plain'], not_labelled)
+    assert isinstance(messages['gone'], HttpError)
+    assert full_ids == {'plain'}
+
+def test_fetch_emails_keeps_messages_without_body(service, monkeypatch):
+    @contextmanager
+    def checkout(api, version, creds):
+        yield service
+
+    monkeypatch.setattr(gmail, 'load_credentials', lambda user_id: type('Creds', (), {'valid': True})())
+    monkeypatch.setattr(gmail.service_pool, 'checkout', checkout)
+    monkeypatch.setattr(gmail, 'sync_inbox_message_ids', lambda *args: (['plain', 'subject-only', 'labelled'], None))
+
+    emails = gmail.fetch_emails('alice', keep=lambda details: details['subject'] != 'Done')
+    assert [email['id'] for email in emails] == ['plain', 'subject-only']
@@ -0,0 +1,51 @@
+# backend/tests/test_gmail_query.py
+import re
+
+import pytest
+
+from utils.gmail_query import OR_SEPARATOR, build_interest_queries, quote_term
+
+BASE = "-label:AddedToCalendar"
+
+
+def terms_of(query):
+    return re.findall(r'"[^"]*"', query)
+
+
+def test_without_interests_only_the_base_query():
+    assert build_interest_queries([], base_query=BASE) == [BASE]
+    assert build_interest_queries(None, base_query=f"  {BASE} ") == [BASE]
+    assert build_interest_queries(['', '  ']) == ['']
+
+def test_interests_are_quoted_and_or_ed():
+    assert build_interest_queries(['ai'], base_query=BASE) == [f'{BASE} "ai"']
+    assert build_interest_queries(['ai', 'machine  learning', 'ai']) == ['("ai" OR "machine learning")']
+
+def test_subject_scope():
+    assert build_interest_queries(['ai', 'ml'], scope='subject') == ['(subject:"ai" OR subject:"ml")']
+
+def test_quote_term_drops_quotes():
+    assert quote_term(' say "hi" ') == '"say hi"'
+    assert quote_term('""') == ''
+
+@pytest.mark.parametrize('max_length', [40, 64, 100, 250])
+def test_long_expressions_are_split_below_max_length(max_length):
+    interests = [f"interest {number}" for number in range(30)]
+    queries = build_interest_queries(interests, base_query=BASE, max_length=max_length)
+
+    assert len(queries) > 1
+    assert all(len(query) <= max_length for query in queries)
+    assert all(query.startswith(f"{BASE} ") for query in queries)
+    # Every interest lands in exactly one query, in order
+    assert [term for query in queries for term in terms_of(query)] == [quote_term(interest) for interest in interests]
+
+def test_group_that_fits_exactly_is_not_split():
+    interests = ['aaaa', 'bbbb', 'cccc']
+    expression = f'({OR_SEPARATOR.join(quote_term(interest) for interest in interests)})'
+    exact = len(BASE) + 1 + len(expression)
+    assert build_interest_queries(interests, base_query=BASE, max_length=exact) == [f"{BASE} {expression}"]
+    assert len(build_interest_queries(interests, base_query=BASE, max_length=exact - 1)) == 2
+
+def test_single_term_longer_than_max_length_gets_its_own_query():
+    queries = build_interest_queries(['short', 'x' * 50, 'tiny'], max_length=30)
+    assert queries == ['"short"', '"' + 'x' * 50 + '"', '"tiny"']
@@ -0,0 +1,79 @@
+# backend/tests/test_interest_matcher.py
+import random
+
+import pytest
+
+from utils.interest_matcher import InterestMatcher, get_user_matcher
+
+
+def brute_force(interests, text):
+    """Every (interest, position) found by plain substring search."""
+    lowered = text.lower()
+    found = set()
+    for interest in interests:
+        pattern = interest.lower()
+        start = lowered.find(pattern)
+        while start != -1:
+            found.add((interest, start))
+            start = lowered.find(pattern, start + 1)
+    return found
+
+def found_by(matcher, text):
+    return {(match['interest'], match['position']) for match in matcher.find_all(text)}
+
+
+def test_failure_links_find_patterns_inside_other_patterns():
+    matcher = InterestMatcher(['he', 'she', 'his', 'hers'])
+    assert matcher.find_all('ushers') == [
+        {'interest': 'she', 'position': 1},
+        {'interest': 'he', 'position': 2},
+        {'interest': 'hers', 'position': 2},
+    ]
+
+def test_failure_after_partial_match_restarts_at_the_longest_suffix():
+    # "abcd" fails at "x" after "abc"; the "bc" suffix continues into "bcx"
+    matcher = InterestMatcher(['abcd', 'bcx'])
+    assert matcher.find_all('abcx') == [{'interest': 'bcx', 'position': 1}]
+
+def test_overlapping_and_repeated_matches():
+    matcher = InterestMatcher(['aa', 'aaa'])
+    assert found_by(matcher, 'aaaa') == {('aa', 0), ('aa', 1), ('aa', 2), ('aaa', 0), ('aaa', 1)}
+
+def test_matches_substrings_case_insensitively():
+    matcher = InterestMatcher(['Hack', 'AI'])
+    assert found_by(matcher, 'Spring HACKATHON with ai talks') == {('Hack', 7), ('AI', 22)}
+
+def test_positions_in_the_original_text_when_lowercasing_changes_length():
+    assert found_by(InterestMatcher(['AI']), 'İstanbul AI summit') == {('AI', 9)}
+    assert found_by(InterestMatcher(['İzmir']), 'Trip to İzmir') == {('İzmir', 8)}
+
+@pytest.mark.parametrize('seed', range(20))
+def test_agrees_with_brute_force(seed):
+    rnd = random.Random(seed)
+    interests = [''.join(rnd.choice('abc') for _ in range(rnd.randint(1, 4))) for _ in range(6)]
+    text = ''.join(rnd.choice('abcAB ') for _ in range(200))
+    matcher = InterestMatcher(interests)
+    assert found_by(matcher, text) == brute_force(matcher.interests, text)
+
+def test_blank_and_duplicate_interests_are_ignored():
+    matcher = InterestMatcher(['ml', '', '  ', 'ml', None])
+    assert matcher.interests == ['ml']
+    assert InterestMatcher(None).find_all('anything') == []
+    assert InterestMatcher(['ml']).find_all('') == []
+
+def test_first_match_is_the_first_to_end():
+    matcher = InterestMatcher(['hers', 'he', 'conference'])
+    assert matcher.first_match('ushers at the conference') == 'he'
+    assert matcher.first_match('nothing here at all') == 'he'
+    assert matcher.first_match('no match') is None
+
+def test_matched_interests_most_frequent_first():
+    matcher = InterestMatcher(['python', 'rust', 'go'])
+    assert matcher.matched_interests('rust, python, rust and rust; python') == ['rust', 'python']
+
+def test_user_matchers_are_cached_until_interests_change():
+    matcher = get_user_matcher('test-user', ['ai'])
+    assert get_user_matcher('test-user', ['ai']) is matcher
+    rebuilt = get_user_matcher('test-user', ['ai', 'ml'])
+    assert rebuilt is not matcher
+    assert rebuilt.interests == ['ai', 'ml']
@@ -0,0 +1,84 @@
+# backend/tests/test_job_queue.py
+import time
+
+import pytest
+
+from utils.job_queue import DEAD, DONE, PENDING, RUNNING, JobQueue
+
+LEASE = 0.2
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'), max_attempts=2, visibility_timeout=LEASE, retry_base_delay=0)
+
+def expire_lease():
+    time.sleep(LEASE + 0.05)
+
+
+def test_enqueue_ignores_duplicates(queue):
+    assert queue.enqueue('alice', ['m1', 'm2']) == 2
+    assert queue.enqueue('alice', ['m2', 'm3']) == 1
+    assert queue.enqueue('alice', []) == 0
+    assert queue.stats()[PENDING] == 3
+
+def test_claim_and_complete(queue):
+    queue.enqueue('alice', ['m1'])
+    job = queue.claim('worker-a')
+    assert (job['user_id'], job['message_id'], job['attempts']) == ('alice', 'm1', 1)
+    assert queue.claim('worker-b') is None
+
+    assert queue.complete(job['id'], 'worker-a')
+    assert queue.stats()[DONE] == 1
+    assert queue.claim('worker-b') is None
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.enqueue('alice', ['m1'])
+    job = queue.claim('worker-a')
+    expire_lease()
+
+    reclaimed = queue.claim('worker-b')
+    assert reclaimed['id'] == job['id']
+    assert reclaimed['attempts'] == 2
+
+    # The first worker lost its lease and can no longer finish or fail the job
+    assert queue.complete(job['id'], 'worker-a') is False
+    assert queue.fail(job['id'], 'worker-a', 'boom') is None
+    assert queue.stats()[RUNNING] == 1
+
+    assert queue.complete(job['id'], 'worker-b') is True
+    assert queue.stats()[DONE] == 1
+
+def test_complete_after_lease_expired(queue):
+    queue.enqueue('alice', ['m1'])
+    job = queue.claim('worker-a')
+    expire_lease()
+    assert queue.complete(job['id'], 'worker-a') is False
+    assert queue.stats()[RUNNING] == 1
+
+def test_fail_retries_then_dead_letters(queue):
+    queue.enqueue('alice', ['m1'])
+    job = queue.claim('worker-a')
+    assert queue.fail(job['id'], 'worker-a', 'first') is True
+    assert queue.stats()[PENDING] == 1
+
+    job = queue.claim('worker-a')
+    assert job['attempts'] == 2
+    assert queue.fail(job['id'], 'worker-a', 'second') is False
+
+    dead = queue.dead_letters()
+    assert [(entry['message_id'], entry['last_error']) for entry in dead] == [('m1', 'second')]
+    assert queue.claim('worker-a') is None
+
+    assert queue.requeue_dead() == 1
+    assert queue.claim('worker-a')['attempts'] == 1
+
+def test_timed_out_last_attempt_is_dead_lettered(queue):
+    queue.enqueue('alice', ['m1'])
+    queue.fail(queue.claim('worker-a')['id'], 'worker-a', 'first')
+    queue.claim('worker-a')
+    expire_lease()
+
+    assert queue.claim('worker-b') is None
+    assert queue.stats()[DEAD] == 1
+    assert queue.dead_letters()[0]['last_error'] == 'Visibility timeout expired'
@@ -0,0 +1,143 @@
+# backend/tests/test_llm_gateway.py
+import os
+import sys
+import asyncio
+import subprocess
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import utils.llm_gateway as llm_gateway
+from utils.llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailableError, TokenBucket
+
+
+class FakeModel:
+    """Stands in for a GenerativeModel; `answers` are returned or raised in order."""
+
+    model_name = 'models/fake'
+
+    def __init__(self, answers=(), chunks=()):
+        self.answers = list(answers)
+        self.chunks = list(chunks)
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return iter(self.chunks)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+
+        async def chunks():
+            for chunk in self.chunks:
+                await asyncio.sleep(0.01)
+                yield chunk
+        return chunks()
+
+
+def make_gateway(model, breaker=None):
+    gateway = LLMGateway()
+    gateway.model = model
+    gateway.bucket = TokenBucket(1000, 1000)
+    gateway.breaker = breaker or CircuitBreaker(5, 30)
+    return gateway
+
+def half_open_breaker():
+    """A breaker that has opened and whose reset timeout has already passed."""
+    breaker = CircuitBreaker(1, 0)
+    breaker.record_failure()
+    return breaker
+
+
+def test_import_with_api_key_configures_genai():
+    env = dict(os.environ, GOOGLE_API_KEY='dummy-key')
+    result = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', 'import utils.llm_gateway'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+
+def test_token_bucket_allows_burst_then_waits():
+    bucket = TokenBucket(rate=1, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+
+def test_breaker_opens_after_threshold_and_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.allow()
+
+def test_breaker_stays_open_until_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.is_open()
+    assert not breaker.allow()
+
+def test_generate_retries_retryable_errors(monkeypatch):
+    monkeypatch.setattr(llm_gateway, 'LLM_BACKOFF_BASE', 0)
+    model = FakeModel([google_exceptions.ResourceExhausted('quota'), 'answer'])
+    assert make_gateway(model).generate('prompt') == 'answer'
+    assert model.calls == 2
+
+def test_generate_does_not_retry_other_errors():
+    model = FakeModel([google_exceptions.InvalidArgument('bad'), 'answer'])
+    with pytest.raises(google_exceptions.InvalidArgument):
+        make_gateway(model).generate('prompt')
+    assert model.calls == 1
+
+def test_open_circuit_fails_fast():
+    breaker = CircuitBreaker(1, 60)
+    breaker.record_failure()
+    model = FakeModel(['answer'])
+    with pytest.raises(LLMUnavailableError):
+        make_gateway(model, breaker).generate('prompt')
+    assert model.calls == 0
+
+def test_closed_stream_releases_the_trial():
+    breaker = half_open_breaker()
+    stream = make_gateway(FakeModel(chunks=['a', 'b', 'c']), breaker).stream('prompt')
+    assert next(stream) == 'a'
+    stream.close()
+    assert not breaker.trial_running
+    assert breaker.allow()
+
+def test_cancelled_async_stream_releases_the_trial():
+    breaker = half_open_breaker()
+    gateway = make_gateway(FakeModel(chunks=['a', 'b', 'c']), breaker)
+
+    async def consume(started):
+        async for _ in gateway.stream_async('prompt'):
+            started.set()
+
+    async def main():
+        started = asyncio.Event()
+        task = asyncio.ensure_future(consume(started))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert not breaker.trial_running
+    assert breaker.allow()
+
+def test_concurrency_slot_is_released_after_a_closed_stream():
+    gateway = make_gateway(FakeModel(chunks=['a', 'b']))
+    for _ in range(llm_gateway.LLM_MAX_CONCURRENCY + 1):
+        stream = gateway.stream('prompt')
+        next(stream)
+        stream.close()
+    assert list(gateway.stream('prompt')) == ['a', 'b']
@@ -0,0 +1,133 @@
+# backend/tests/test_scheduling.py
+import time
+import random
+import statistics
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from utils.scheduling import IntervalIndex, find_slots, normalize_preference
+
+TZ = ZoneInfo('America/New_York')
+# A Monday
+DAY = datetime(2026, 5, 4, tzinfo=TZ)
+HOUR = timedelta(hours=1)
+HALF_HOUR = timedelta(minutes=30)
+
+
+def at(hour, minute=0, days=0):
+    return DAY + timedelta(days=days, hours=hour, minutes=minute)
+
+def starts(slots):
+    return [start for start, _ in slots]
+
+
+def test_index_merges_overlapping_and_adjacent_intervals():
+    index = IntervalIndex([(at(13), at(14)), (at(9), at(10)), (at(9, 30), at(11)), (at(11), at(12))])
+    assert len(index) == 2
+    assert index.overlapping(at(8), at(20)) == [(at(9), at(12)), (at(13), at(14))]
+    assert index.overlapping(at(12), at(13)) == []
+
+def test_index_intervals_are_half_open():
+    index = IntervalIndex([(at(10), at(11))])
+    assert index.is_free(at(9), at(10))
+    assert index.is_free(at(11), at(12))
+    assert not index.is_free(at(10, 59), at(11, 30))
+    assert not index.is_free(at(9), at(12))
+
+def test_next_free_start_with_buffer():
+    index = IntervalIndex([(at(10), at(11)), (at(11, 40), at(13))])
+    assert index.next_free_start(at(9), HALF_HOUR) == at(9)
+    assert index.next_free_start(at(9, 30), HALF_HOUR) == at(9, 30)
+    # [9:30 - 15m, 10:00 + 15m) touches the 10:00 meeting; 11:15 would end too close to 11:40
+    assert index.next_free_start(at(9, 30), HALF_HOUR, timedelta(minutes=15)) == at(13, 15)
+
+
+def test_first_slots_of_a_free_day():
+    slots = find_slots([], at(0), at(0, days=1), HOUR, TZ)
+    assert slots == [(at(9), at(10)), (at(10), at(11)), (at(11), at(12))]
+    assert all(start.tzinfo is not None for start in starts(slots))
+
+def test_buffer_keeps_distance_from_events():
+    busy = [(at(9), at(10)), (at(12), at(13))]
+    slots = find_slots(busy, at(0), at(0, days=1), HOUR, TZ, buffer=timedelta(minutes=15))
+    # 10:15 rounds up to 10:30; 10:30-11:30 still leaves 30 minutes before noon; after lunch 13:15 rounds to 13:30
+    assert starts(slots) == [at(10, 30), at(13, 30), at(14, 30)]
+
+def test_alignment_into_a_busy_interval_searches_again():
+    # The first free time is 9:40, which rounds up to 10:00, inside the second meeting
+    busy = [(at(9), at(9, 40)), (at(10), at(11))]
+    slots = find_slots(busy, at(0), at(0, days=1), HALF_HOUR, TZ, count=1)
+    assert slots == [(at(11), at(11, 30))]
+
+def test_slot_must_end_inside_working_hours():
+    busy = [(at(9), at(19, 30))]
+    assert find_slots(busy, at(0), at(0, days=1), HOUR, TZ) == []
+    assert find_slots(busy, at(0), at(0, days=1), HALF_HOUR, TZ) == [(at(19, 30), at(20))]
+
+@pytest.mark.parametrize('preference, first', [
+    ('morning', at(9)),
+    ('afternoon', at(12)),
+    ('lunch', at(12)),
+    ('PM', at(17)),
+    ('evening', at(17)),
+    ('whenever', at(9)),
+    (None, at(9)),
+])
+def test_preference_windows(preference, first):
+    slots = find_slots([], at(0), at(0, days=1), HOUR, TZ, count=1, preference=preference)
+    assert starts(slots) == [first]
+
+def test_preference_limits_slots_to_its_window():
+    slots = find_slots([], at(0), at(0, days=2), HOUR, TZ, count=4, preference='evening')
+    assert starts(slots) == [at(17), at(18), at(19), at(17, days=1)]
+
+def test_preference_outside_working_hours_finds_nothing():
+    slots = find_slots([], at(0), at(0, days=1), HOUR, TZ, preference='morning',
+                       working_hours=(at(13).time(), at(18).time()))
+    assert slots == []
+
+def test_normalize_preference():
+    assert normalize_preference(' Early ') == 'morning'
+    assert normalize_preference('') is None
+    assert normalize_preference('weekend') is None
+
+def test_search_continues_on_later_days():
+    busy = [(at(9), at(20)), (at(9, days=1), at(16, days=1))]
+    slots = find_slots(busy, at(0), at(0, days=14), HOUR, TZ)
+    assert starts(slots) == [at(16, days=1), at(17, days=1), at(18, days=1)]
+
+def test_search_starts_at_range_start_and_stops_at_range_end():
+    slots = find_slots([], at(15, 10), at(0, days=14), HOUR, TZ, count=2)
+    assert starts(slots) == [at(15, 30), at(16, 30)]
+    assert find_slots([], at(15, 10), at(16), HOUR, TZ) == []
+
+def test_slots_do_not_overlap_and_are_in_order():
+    busy = [(at(10, 15), at(10, 45)), (at(13), at(15))]
+    slots = find_slots(busy, at(0), at(0, days=3), timedelta(minutes=45), TZ, count=10)
+    assert len(slots) == 10
+    for (start, end), (next_start, _) in zip(slots, slots[1:]):
+        assert end <= next_start
+    index = IntervalIndex(busy)
+    assert all(index.is_free(start, end) for start, end in slots)
+
+
+def test_ninety_day_search_takes_under_a_millisecond():
+    # About nine meetings a day for 90 days
+    rnd = random.Random(7)
+    busy = []
+    for day in range(90):
+        for hour in range(9, 20):
+            if rnd.random() < 0.8:
+                start = at(hour, rnd.choice([0, 15, 30]), days=day)
+                busy.append((start, start + timedelta(minutes=rnd.choice([30, 45, 60]))))
+    index = IntervalIndex(busy)
+
+    timings = []
+    for _ in range(50):
+        started = time.perf_counter()
+        slots = find_slots(index, at(0), at(0, days=90), HOUR, TZ, buffer=timedelta(minutes=15), preference='evening')
+        timings.append(time.perf_counter() - started)
+    assert len(slots) == 3
+    assert statistics.median(timings) < 0.001
@@ -0,0 +1,179 @@
+# backend/tests/test_structured_output.py
+import json
+
+import pytest
+
+from utils.structured_output import (
+    Field, Schema, StructuredOutputError, generate_structured, generate_structured_items
+)
+
+SCHEMA = Schema([
+    Field('title'),
+    Field('when', format='datetime', nullable=True),
+    Field('priority', type=int, minimum=1, maximum=5, nullable=True),
+])
+KEY = Field('item_id')
+
+
+class Answer:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGateway:
+    """Stands in for an LLMGateway; `answers` (JSON values, or exceptions) are used in order."""
+
+    model_name = 'models/fake'
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = []
+
+    def generate(self, prompt, generation_config=None, **kwargs):
+        self.calls.append((prompt, generation_config))
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return Answer(answer if isinstance(answer, str) else json.dumps(answer))
+
+    def requested_fields(self, call):
+        schema = self.calls[call][1]['response_schema']
+        if schema['type'] == 'ARRAY':
+            schema = schema['items']
+        return list(schema['properties'])
+
+
+@pytest.mark.parametrize('field, value, expected', [
+    (Field('n', type=int), '3', 3),
+    (Field('n', type=int), 4.0, 4),
+    (Field('x', type=float), '2.5', 2.5),
+    (Field('b', type=bool), 'Yes', True),
+    (Field('b', type=bool), False, False),
+    (Field('s'), '  text ', 'text'),
+    (Field('d', format='datetime'), '2026-05-02 15:00', '2026-05-02 15:00'),
+    (Field('d', format='datetime'), '2026-05-02T15:00:00', '2026-05-02 15:00'),
+    (Field('e', enum=['low', 'high']), 'high', 'high'),
+    (Field('s', nullable=True), 'N/A', None),
+    (Field('s', nullable=True), None, None),
+])
+def test_field_accepts_and_converts(field, value, expected):
+    assert field.validate(value) == expected
+
+@pytest.mark.parametrize('field, value, message', [
+    (Field('n', type=int), '3.5', "whole number"),
+    (Field('n', type=int), True, "must be a number"),
+    (Field('n', type=int), 'three', "must be a number"),
+    (Field('n', type=int, minimum=1), 0, "at least 1"),
+    (Field('n', type=int, maximum=5), 6, "at most 5"),
+    (Field('b', type=bool), 'maybe', "true or false"),
+    (Field('s'), 12, "must be a string"),
+    (Field('d', format='datetime'), 'next Friday', "YYYY-MM-DD HH:MM"),
+    (Field('d', format='datetime'), 'May 2', "YYYY-MM-DD HH:MM"),
+    (Field('e', enum=['low', 'high']), 'urgent', "one of low, high"),
+    (Field('s'), 'none', "is required"),
+    (Field('s'), None, "is required"),
+])
+def test_field_rejects(field, value, message):
+    with pytest.raises(ValueError, match=message):
+        field.validate(value)
+
+def test_schema_validate_reports_missing_and_invalid_fields():
+    values, errors = SCHEMA.validate({'title': 'Lunch', 'when': 'soon'})
+    assert values == {'title': 'Lunch'}
+    assert set(errors) == {'when', 'priority'}
+    assert errors['priority'] == "is missing"
+
+def test_schema_validate_only_selected_fields():
+    assert SCHEMA.validate({'when': None}, names=['when']) == ({'when': None}, {})
+
+def test_schema_resolve():
+    # Failed nullable fields become None, a failed required field drops the object
+    assert SCHEMA.resolve({'title': 'Lunch'}, {'when': 'bad', 'priority': 'bad'}) == {
+        'title': 'Lunch', 'when': None, 'priority': None
+    }
+    assert SCHEMA.resolve({'when': None}, {'title': 'is required'}) is None
+
+def test_generation_config():
+    config = SCHEMA.generation_config(['when'], key=KEY)
+    assert config['response_mime_type'] == 'application/json'
+    item = config['response_schema']['items']
+    assert item['required'] == ['item_id', 'when']
+    assert item['properties']['when'] == {'type': 'STRING', 'nullable': True}
+
+
+def test_generate_structured_asks_again_for_invalid_fields_only():
+    llm = FakeGateway([
+        {'title': 'Lunch', 'when': 'tomorrow', 'priority': 2},
+        {'when': '2026-05-02 12:00'},
+    ])
+    data, errors = generate_structured(llm, "Extract", SCHEMA)
+    assert data == {'title': 'Lunch', 'when': '2026-05-02 12:00', 'priority': 2}
+    assert errors == {}
+    assert llm.requested_fields(1) == ['when']
+    assert "- when: must be an exact date" in llm.calls[1][0]
+
+def test_generate_structured_gives_up_after_repairs():
+    llm = FakeGateway([{'title': 'Lunch', 'when': 'soon', 'priority': 1}, {'when': 'later'}])
+    data, errors = generate_structured(llm, "Extract", SCHEMA, repairs=1)
+    assert data == {'title': 'Lunch', 'when': None, 'priority': 1}
+    assert 'later' in errors['when']
+
+def test_generate_structured_required_field_never_valid():
+    llm = FakeGateway(['not json', {'title': None}])
+    data, errors = generate_structured(llm, "Extract", SCHEMA, repairs=1)
+    assert data is None
+    assert errors['title'] == "is required"
+
+def test_generate_structured_keeps_values_when_repair_call_fails():
+    llm = FakeGateway([{'title': 'Lunch', 'when': 'soon', 'priority': 1}, RuntimeError('quota')])
+    assert generate_structured(llm, "Extract", SCHEMA)[0] == {'title': 'Lunch', 'when': None, 'priority': 1}
+
+def test_generate_structured_raises_first_call_errors():
+    with pytest.raises(RuntimeError):
+        generate_structured(FakeGateway([RuntimeError('quota')]), "Extract", SCHEMA)
+
+
+def build_prompt(keys):
+    return "Extract items " + ", ".join(keys)
+
+def test_items_repairs_are_merged_per_item_and_field():
+    llm = FakeGateway([
+        [
+            {'item_id': 'a', 'title': 'Lunch', 'when': 'soon', 'priority': 9},
+            {'item_id': 'b', 'title': 'Call', 'when': '2026-05-03 10:00', 'priority': 1},
+            {'item_id': 'c', 'title': 'Gym', 'when': None, 'priority': 'high'},
+        ],
+        [
+            # Only the fields that failed are asked for; a stray title must not replace the valid one
+            {'item_id': 'a', 'title': 'Changed', 'when': '2026-05-02 12:00', 'priority': 9},
+            {'item_id': 'c', 'when': '2026-05-04 18:00', 'priority': 3},
+            {'item_id': 'b', 'when': None, 'priority': None},
+        ],
+    ])
+    found = generate_structured_items(llm, build_prompt, SCHEMA, KEY, ['a', 'b', 'c'], repairs=1)
+
+    assert llm.requested_fields(1) == ['item_id', 'when', 'priority']
+    assert llm.calls[1][0].startswith("Extract items a, c")
+    assert found['a'] == ({'title': 'Lunch', 'when': '2026-05-02 12:00', 'priority': None}, {'priority': "must be at most 5, got 9"})
+    assert found['b'] == ({'title': 'Call', 'when': '2026-05-03 10:00', 'priority': 1}, {})
+    # "when" was valid for c in the first answer; the repair does not overwrite it
+    assert found['c'] == ({'title': 'Gym', 'when': None, 'priority': 3}, {})
+
+def test_items_missing_unknown_and_duplicate_keys():
+    llm = FakeGateway([{'results': [
+        {'item_id': 'a', 'title': 'First', 'when': None, 'priority': None},
+        {'item_id': 'a', 'title': 'Second', 'when': None, 'priority': None},
+        {'item_id': 'z', 'title': 'Unknown', 'when': None, 'priority': None},
+        'not an object',
+    ]}])
+    found = generate_structured_items(llm, build_prompt, SCHEMA, KEY, ['a', 'b'])
+    assert found == {'a': ({'title': 'First', 'when': None, 'priority': None}, {})}
+
+def test_items_first_answer_must_be_an_array():
+    with pytest.raises(StructuredOutputError):
+        generate_structured_items(FakeGateway(['"text"']), build_prompt, SCHEMA, KEY, ['a'])
+
+def test_items_repair_call_failure_keeps_first_answer():
+    llm = FakeGateway([[{'item_id': 'a', 'title': 'Lunch', 'when': 'soon', 'priority': None}], RuntimeError('quota')])
+    found = generate_structured_items(llm, build_prompt, SCHEMA, KEY, ['a'])
+    assert found['a'][0] == {'title': 'Lunch', 'when': None, 'priority': None}
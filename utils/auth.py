@@ -1,14 +1,19 @@
 # backend/utils/auth.py
 import os
 import json
+import time
+import threading
+from datetime import datetime
 from pathlib import Path
 from functools import wraps
 from flask import session, jsonify, request, redirect
 from cryptography.fernet import Fernet
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
 
-from config import TOKENS_DIR, KEY_FILE, SCOPES
+from config import TOKENS_DIR, KEY_FILE, SCOPES, CREDENTIALS_CACHE_TTL
+from utils.store import user_store
 
 # Ensure the tokens directory exists
 Path(TOKENS_DIR).mkdir(exist_ok=True)
@@ -24,6 +29,14 @@ else:
 
 cipher = Fernet(key)
 
+# Decrypted credentials per user: user_id -> (credentials, cached_at)
+_credentials_cache = {}
+_credentials_lock = threading.Lock()
+# One lock per user so that concurrent requests share a single token refresh
+_refresh_locks = {}
+# Last authenticated request per user, used by the background token refresher
+_last_active = {}
+
 def get_flow():
     """Create and return a Google OAuth flow instance."""
     # Try to get credentials from environment variable first
@@ -47,21 +60,38 @@ def get_flow():
         redirect_uri=os.environ.get('OAUTH_REDIRECT_URI', 'https://rundown-sx8n.onrender.com/oauth/callback')
     )
 
+def _cache_credentials(user_id, credentials):
+    with _credentials_lock:
+        _credentials_cache[user_id] = (credentials, time.time())
+
+def _cached_credentials(user_id):
+    with _credentials_lock:
+        cached = _credentials_cache.get(user_id)
+    if cached and time.time() - cached[1] < CREDENTIALS_CACHE_TTL:
+        return cached[0]
+    return None
+
+def invalidate_credentials(user_id):
+    """Drop a user's cached credentials so the next load reads the store again."""
+    with _credentials_lock:
+        _credentials_cache.pop(user_id, None)
+
 def save_credentials(user_id, credentials):
-    """Encrypt and save credentials to a file."""
-    token_path = os.path.join(TOKENS_DIR, f"{user_id}.json")
+    """Encrypt and save credentials to the user store."""
     creds_json = credentials.to_json()
     encrypted_creds = cipher.encrypt(creds_json.encode())
-    with open(token_path, 'wb') as f:
-        f.write(encrypted_creds)
+    user_store.save_token(user_id, encrypted_creds)
+    _cache_credentials(user_id, credentials)
 
 def load_credentials(user_id):
-    """Load and decrypt credentials from a file."""
-    token_path = os.path.join(TOKENS_DIR, f"{user_id}.json")
-    if not os.path.exists(token_path):
+    """Load and decrypt credentials, served from the in-memory cache when possible."""
+    cached = _cached_credentials(user_id)
+    if cached is not None:
+        return cached
+
+    encrypted_creds = user_store.load_token(user_id)
+    if encrypted_creds is None:
         return None
-    with open(token_path, 'rb') as f:
-        encrypted_creds = f.read()
     decrypted_creds = cipher.decrypt(encrypted_creds).decode()
     credentials = Credentials.from_authorized_user_info(json.loads(decrypted_creds))
     
@@ -72,12 +102,66 @@ def load_credentials(user_id):
             print(f"Stored: {credentials.scopes}")
             print(f"Required: {SCOPES}")
             # Force reauthorization by invalidating credentials
-            if os.path.exists(token_path):
-                os.remove(token_path)
+            user_store.delete_token(user_id)
+            invalidate_credentials(user_id)
             return None
             
+    _cache_credentials(user_id, credentials)
     return credentials
 
+def seconds_until_expiry(credentials):
+    """Return how long the access token stays valid, or None if its expiry is unknown."""
+    if credentials.expiry is None:
+        return None
+    # google-auth stores expiry as a naive UTC datetime
+    return (credentials.expiry - datetime.utcnow()).total_seconds()
+
+def _is_fresh(credentials, min_validity):
+    if not credentials.valid:
+        return False
+    remaining = seconds_until_expiry(credentials)
+    return remaining is None or remaining > min_validity
+
+def refresh_credentials(user_id, credentials, min_validity=0):
+    """
+    Refresh expired credentials and save them.
+    
+    Concurrent callers for the same user wait for a single refresh instead of
+    each calling the token endpoint and rewriting the stored token.
+    
+    Args:
+        user_id: Owner of the credentials
+        credentials: Credentials to refresh
+        min_validity: Also refresh valid tokens expiring within this many seconds
+    
+    Returns:
+        Valid credentials (possibly another object refreshed by a concurrent call)
+    Raises:
+        google.auth.exceptions.RefreshError if the refresh fails
+    """
+    with _credentials_lock:
+        lock = _refresh_locks.setdefault(user_id, threading.Lock())
+    with lock:
+        if _is_fresh(credentials, min_validity):
+            return credentials
+        # Another request may have refreshed the user's cached credentials meanwhile
+        cached = _cached_credentials(user_id)
+        if cached is not None and _is_fresh(cached, min_validity):
+            return cached
+        try:
+            credentials.refresh(Request())
+        except Exception:
+            invalidate_credentials(user_id)
+            raise
+        save_credentials(user_id, credentials)
+        return credentials
+
+def recently_active_users(window):
+    """Return the IDs of users who made an authenticated request in the last `window` seconds."""
+    cutoff = time.time() - window
+    with _credentials_lock:
+        return [user_id for user_id, last_active in _last_active.items() if last_active >= cutoff]
+
 def require_auth(view):
     """Decorator to require authentication for routes."""
     @wraps(view)
@@ -90,5 +174,7 @@ def require_auth(view):
             ):
                 return jsonify({"error": "Authentication required", "redirect": "/login"}), 401
             return redirect('/login')
+        with _credentials_lock:
+            _last_active[session['user_id']] = time.time()
         return view(*args, **kwargs)
     return wrapper
@@ -0,0 +1,140 @@
+# backend/utils/availability.py
+import time
+import threading
+from datetime import timedelta, timezone
+
+from dateutil import parser as date_parser
+
+from utils.service_pool import service_pool, user_key
+
+# freeBusy accepts at most 50 calendars per query
+FREEBUSY_MAX_CALENDARS = 50
+# Longer ranges are split into several freeBusy queries
+FREEBUSY_MAX_RANGE = timedelta(days=60)
+# Seconds the list of a user's calendars is reused before it is fetched again
+CALENDAR_LIST_TTL = 600
+
+# user key -> (calendar IDs, fetched_at)
+_calendar_ids = {}
+_calendar_ids_lock = threading.Lock()
+
+
+def list_busy_calendar_ids(creds):
+    """Return the IDs of the calendars whose events make the user busy (primary plus selected ones)."""
+    key = user_key(creds)
+    with _calendar_ids_lock:
+        cached = _calendar_ids.get(key)
+    if cached and time.time() - cached[1] < CALENDAR_LIST_TTL:
+        return cached[0]
+
+    calendar_ids = ['primary']
+    with service_pool.checkout('calendar', 'v3', creds) as service:
+        page_token = None
+        while True:
+            params = {'fields': 'nextPageToken,items(id,primary,selected,hidden)', 'minAccessRole': 'freeBusyReader'}
+            if page_token:
+                params['pageToken'] = page_token
+            response = service.calendarList().list(**params).execute()
+            for item in response.get('items', []):
+                if item.get('primary') or item.get('hidden') or not item.get('selected'):
+                    continue
+                calendar_ids.append(item['id'])
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+    with _calendar_ids_lock:
+        _calendar_ids[key] = (calendar_ids, time.time())
+    return calendar_ids
+
+def merge_intervals(intervals):
+    """Merge overlapping or touching (start, end) intervals into a sorted list of disjoint ones."""
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def free_intervals(busy, range_start, range_end, min_duration=None):
+    """
+    Return the gaps between merged busy intervals within [range_start, range_end).
+
+    Args:
+        busy: Sorted, disjoint busy intervals (see merge_intervals)
+        range_start, range_end: Aware datetimes bounding the search
+        min_duration: Optional timedelta; shorter gaps are left out
+    """
+    slots = []
+    current = range_start
+    for start, end in busy:
+        if end <= current:
+            continue
+        if start >= range_end:
+            break
+        if start > current:
+            slots.append((current, start))
+        current = max(current, end)
+    if current < range_end:
+        slots.append((current, range_end))
+    if min_duration:
+        slots = [(start, end) for start, end in slots if end - start >= min_duration]
+    return slots
+
+def _to_rfc3339(value):
+    return value.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+def query_busy_intervals(creds, range_start, range_end, calendar_ids=None):
+    """
+    Ask Calendar's freeBusy endpoint when the user is busy.
+
+    Args:
+        creds: Google API credentials
+        range_start, range_end: Aware datetimes
+        calendar_ids: Calendars to check; defaults to list_busy_calendar_ids()
+
+    Returns:
+        Sorted, merged list of (start, end) aware datetimes across all calendars
+    """
+    calendar_ids = calendar_ids or list_busy_calendar_ids(creds)
+    busy = []
+    with service_pool.checkout('calendar', 'v3', creds) as service:
+        window_start = range_start
+        while window_start < range_end:
+            window_end = min(window_start + FREEBUSY_MAX_RANGE, range_end)
+            for offset in range(0, len(calendar_ids), FREEBUSY_MAX_CALENDARS):
+                body = {
+                    'timeMin': _to_rfc3339(window_start),
+                    'timeMax': _to_rfc3339(window_end),
+                    'items': [{'id': calendar_id} for calendar_id in calendar_ids[offset:offset + FREEBUSY_MAX_CALENDARS]]
+                }
+                response = service.freebusy().query(body=body).execute()
+                for calendar_id, calendar in response.get('calendars', {}).items():
+                    if calendar.get('errors'):
+                        print(f"freeBusy could not read calendar {calendar_id}: {calendar['errors']}")
+                    for interval in calendar.get('busy', []):
+                        busy.append((date_parser.isoparse(interval['start']), date_parser.isoparse(interval['end'])))
+            window_start = window_end
+    return merge_intervals(busy)
+
+def get_availability(creds, range_start, range_end, min_duration=None):
+    """
+    Return the user's busy and free intervals between two aware datetimes.
+
+    Returns:
+        Dict with 'busy' (merged busy intervals across the user's calendars,
+        clipped to the range) and 'free' (the gaps between them)
+    """
+    busy = [
+        (max(start, range_start), min(end, range_end))
+        for start, end in query_busy_intervals(creds, range_start, range_end)
+        if end > range_start and start < range_end
+    ]
+    return {
+        'busy': busy,
+        'free': free_intervals(busy, range_start, range_end, min_duration)
+    }
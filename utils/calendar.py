@@ -1,16 +1,32 @@
 # backend/utils/calendar.py
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from datetime import datetime, timedelta
+import hashlib
 import traceback
 import pytz
 from tzlocal import get_localzone
 
-def create_calendar_event(creds, subject, sender, date_str, iso_date, end_date=None, description=None, set_reminder=False):
-    """Creates a calendar event based on email details.
+from utils.service_pool import service_pool
+from utils.calendar_mirror import calendar_mirror
+
+# Calendar accepts at most 50 calls per batch request
+BATCH_MAX_REQUESTS = 50
+# Deleting an event that is already gone answers 404, or 410 once it has been cancelled
+GONE_STATUSES = (404, 410)
+# Inserting an event whose ID is already taken answers 409
+DUPLICATE_STATUS = 409
+
+def event_id_for(source_id):
+    """Deterministic event ID for an event created from a source such as a Gmail message.
+
+    Hex digits are valid base32hex, so the digest can be used as a Calendar event ID.
+    """
+    return hashlib.sha1(source_id.encode('utf-8')).hexdigest()
+
+def build_event_body(subject, sender, date_str, iso_date, end_date=None, description=None, set_reminder=False):
+    """Builds the events.insert body for an event based on email details.
     
     Args:
-        creds: Google API credentials
         subject: Event subject/title
         sender: Email sender
         date_str: Original date string
@@ -19,8 +35,6 @@ def create_calendar_event(creds, subject, sender, date_str, iso_date, end_date=N
         description: Optional detailed description for the event
         set_reminder: Whether to set a reminder 24 hours before the event
     """
-    calendar_service = build('calendar', 'v3', credentials=creds)
-    
     # Debug incoming date information
     print(f"\n==== CALENDAR EVENT CREATION ====")
     print(f"Subject: {subject}")
@@ -98,69 +112,160 @@ def create_calendar_event(creds, subject, sender, date_str, iso_date, end_date=N
         reminders.append({'method': 'popup', 'minutes': 24 * 60})  # 24 hours before
     
     event_body['reminders']['overrides'] = reminders
+    return event_body
+
+def create_calendar_event(creds, subject, sender, date_str, iso_date, end_date=None, description=None,
+                          set_reminder=False, event_id=None):
+    """Creates a calendar event based on email details (see build_event_body for the arguments).
     
+    With an event_id (see event_id_for) the call is idempotent: if the event
+    already exists, it is returned instead of creating a duplicate.
+    """
+    event_body = build_event_body(subject, sender, date_str, iso_date, end_date, description, set_reminder)
+    if event_id:
+        event_body['id'] = event_id
     try:
-        event = calendar_service.events().insert(
-            calendarId='primary',
-            body=event_body
-        ).execute()
-        print(f"Created event: {event.get('htmlLink')} with {len(reminders)} reminder(s)")
+        with service_pool.checkout('calendar', 'v3', creds) as calendar_service:
+            try:
+                event = calendar_service.events().insert(
+                    calendarId='primary',
+                    body=event_body
+                ).execute()
+            except HttpError as error:
+                if not event_id or error.resp.status != DUPLICATE_STATUS:
+                    raise
+                # Created by an earlier attempt (or created and since deleted by the user)
+                existing = calendar_service.events().get(calendarId='primary', eventId=event_id).execute()
+                print(f"Event {event_id} already exists, not creating it again")
+                print(f"==== END CALENDAR EVENT CREATION ====\n")
+                return existing
+        calendar_mirror.apply_created(creds, event)
+        print(f"Created event: {event.get('htmlLink')} with {len(event_body['reminders']['overrides'])} reminder(s)")
         print(f"==== END CALENDAR EVENT CREATION ====\n")
         return event
     except Exception as e:
         print(f"Error creating calendar event: {e}")
         print(traceback.format_exc())
+        # The event may have been created anyway (e.g. on a timeout)
+        calendar_mirror.invalidate(creds)
+        raise
+
+def create_calendar_events(creds, event_bodies):
+    """
+    Creates several events with multipart batch requests instead of one call each.
+    
+    Args:
+        creds: Google API credentials
+        event_bodies: events.insert bodies, e.g. from build_event_body
+    
+    Returns:
+        List in the order of event_bodies holding the created event resource,
+        or the exception raised for that event
+    """
+    results = [None] * len(event_bodies)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = exception if exception is not None else response
+
+    try:
+        with service_pool.checkout('calendar', 'v3', creds) as calendar_service:
+            for start in range(0, len(event_bodies), BATCH_MAX_REQUESTS):
+                batch = calendar_service.new_batch_http_request(callback=callback)
+                for index in range(start, min(start + BATCH_MAX_REQUESTS, len(event_bodies))):
+                    batch.add(
+                        calendar_service.events().insert(calendarId='primary', body=event_bodies[index]),
+                        request_id=str(index)
+                    )
+                batch.execute()
+    except Exception:
+        # Earlier batches (or part of this one) may have gone through
+        calendar_mirror.invalidate(creds)
         raise
 
+    for result in results:
+        if isinstance(result, dict):
+            calendar_mirror.apply_created(creds, result)
+    if any(isinstance(result, Exception) for result in results):
+        calendar_mirror.invalidate(creds)
+    created = sum(1 for result in results if isinstance(result, dict))
+    print(f"Created {created} of {len(event_bodies)} events in a batch request")
+    return results
+
 def delete_calendar_event(creds, event_id):
-    """Deletes a calendar event by ID."""
+    """Deletes a calendar event by ID with a single API call.
+    
+    An event that no longer exists counts as deleted, so no events.get is
+    needed to check for it first.
+    """
     try:
         print(f"Attempting to delete calendar event with ID: {event_id}")
-        calendar_service = build('calendar', 'v3', credentials=creds)
-        
-        # First, try to get the event to confirm it exists
-        try:
-            event = calendar_service.events().get(
+        with service_pool.checkout('calendar', 'v3', creds) as calendar_service:
+            calendar_service.events().delete(
                 calendarId='primary',
                 eventId=event_id
             ).execute()
-            print(f"Found event to delete: {event.get('summary', 'No title')} ({event_id})")
-        except HttpError as e:
-            if e.resp.status == 404:
-                print(f"Event {event_id} not found - it may have been already deleted")
-                return {"status": "not_found", "message": "Event already deleted"}
-            else:
-                print(f"Error checking event existence: {str(e)}")
-                raise
-        
-        # If we got here, the event exists, so delete it
-        result = calendar_service.events().delete(
-            calendarId='primary',
-            eventId=event_id
-        ).execute()
+        calendar_mirror.apply_deleted(creds, event_id)
         print(f"Successfully deleted event with ID: {event_id}")
         return {"status": "deleted", "message": "Event deleted successfully"}
     except HttpError as e:
+        if e.resp.status in GONE_STATUSES:
+            print(f"Event {event_id} not found - it may have been already deleted")
+            calendar_mirror.apply_deleted(creds, event_id)
+            return {"status": "not_found", "message": "Event already deleted"}
         print(f"Google API error during deletion: {str(e)}")
         print(traceback.format_exc())
+        calendar_mirror.invalidate(creds)
         raise
     except Exception as e:
         print(f"Unexpected error during event deletion: {str(e)}")
         print(traceback.format_exc())
+        calendar_mirror.invalidate(creds)
         raise
 
-def fetch_calendar_events(creds):
-    """Fetch upcoming calendar events."""
-    service = build('calendar', 'v3', credentials=creds, cache_discovery=False)
-    now = datetime.utcnow().isoformat() + 'Z'
-    events_result = service.events().list(
-        calendarId='primary',
-        timeMin=now, 
-        maxResults=10,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-    items = events_result.get('items', [])
+def delete_calendar_events(creds, event_ids):
+    """
+    Deletes several calendar events with multipart batch requests.
+    
+    Returns:
+        Dict mapping each event ID to a result like delete_calendar_event's,
+        or to the exception raised for that event
+    """
+    results = {}
+
+    def callback(request_id, response, exception):
+        if exception is None:
+            results[request_id] = {"status": "deleted", "message": "Event deleted successfully"}
+        elif isinstance(exception, HttpError) and exception.resp.status in GONE_STATUSES:
+            results[request_id] = {"status": "not_found", "message": "Event already deleted"}
+        else:
+            results[request_id] = exception
+
+    unique_ids = list(dict.fromkeys(event_ids))
+    try:
+        with service_pool.checkout('calendar', 'v3', creds) as calendar_service:
+            for start in range(0, len(unique_ids), BATCH_MAX_REQUESTS):
+                batch = calendar_service.new_batch_http_request(callback=callback)
+                for event_id in unique_ids[start:start + BATCH_MAX_REQUESTS]:
+                    batch.add(
+                        calendar_service.events().delete(calendarId='primary', eventId=event_id),
+                        request_id=event_id
+                    )
+                batch.execute()
+    except Exception:
+        calendar_mirror.invalidate(creds)
+        raise
+
+    for event_id, result in results.items():
+        if isinstance(result, dict):
+            calendar_mirror.apply_deleted(creds, event_id)
+    if any(isinstance(result, Exception) for result in results.values()):
+        calendar_mirror.invalidate(creds)
+    print(f"Deleted {sum(1 for result in results.values() if isinstance(result, dict))} of {len(unique_ids)} events in a batch request")
+    return results
+
+def fetch_calendar_events(creds, max_results=10):
+    """Fetch upcoming calendar events from the in-memory calendar mirror."""
+    items = calendar_mirror.get_events(creds, max_results=max_results)
     formatted_events = []
     for event in items:
         formatted_event = {
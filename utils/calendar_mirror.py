@@ -0,0 +1,183 @@
+# backend/utils/calendar_mirror.py
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from dateutil import parser as date_parser
+from googleapiclient.errors import HttpError
+from tzlocal import get_localzone
+
+from config import CALENDAR_MIRROR_MAX_STALENESS, CALENDAR_MIRROR_LOOKBACK_DAYS, CALENDAR_MIRROR_MAX_USERS
+from utils.service_pool import service_pool, user_key
+
+# Only the event fields that are read back from the mirror
+EVENT_LIST_FIELDS = (
+    'nextPageToken,nextSyncToken,'
+    'items(id,status,summary,description,start,end,htmlLink,recurringEventId)'
+)
+# events.list accepts at most 2500 results per page
+EVENT_LIST_PAGE_SIZE = 2500
+
+
+def event_time(event_time_field):
+    """Turn an event 'start'/'end' field into an aware datetime (all-day events start at local midnight)."""
+    if not event_time_field:
+        return None
+    if 'dateTime' in event_time_field:
+        value = date_parser.isoparse(event_time_field['dateTime'])
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if 'date' in event_time_field:
+        day = datetime.strptime(event_time_field['date'], '%Y-%m-%d')
+        try:
+            return day.replace(tzinfo=get_localzone())
+        except Exception:
+            return day.replace(tzinfo=timezone.utc)
+    return None
+
+
+class _UserCalendar:
+    def __init__(self):
+        self.events = {}
+        self.sync_token = None
+        self.synced_at = 0
+        self.lock = threading.Lock()
+
+
+class CalendarMirror:
+    """In-memory mirror of each user's primary calendar.
+
+    The first read does a full events.list; later reads apply only the changes
+    since the stored nextSyncToken, and only when the mirror is older than
+    max_staleness seconds. Events created or deleted through this app are
+    applied to the mirror directly, so they show up without waiting for a sync;
+    after a failed write the next read syncs first (see invalidate).
+
+    Calendar rejects timeMin together with syncToken, so the full sync lists
+    events ending after CALENDAR_MIRROR_LOOKBACK_DAYS ago and incremental syncs
+    may add older events; reads filter by time range themselves.
+    """
+
+    def __init__(self, max_staleness=CALENDAR_MIRROR_MAX_STALENESS,
+                 lookback_days=CALENDAR_MIRROR_LOOKBACK_DAYS, max_users=CALENDAR_MIRROR_MAX_USERS):
+        self.max_staleness = max_staleness
+        self.lookback_days = lookback_days
+        self.max_users = max_users
+        self._calendars = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _calendar(self, creds):
+        key = user_key(creds)
+        with self._lock:
+            calendar = self._calendars.get(key)
+            if calendar is None:
+                calendar = self._calendars[key] = _UserCalendar()
+            self._calendars.move_to_end(key)
+            while len(self._calendars) > self.max_users:
+                self._calendars.popitem(last=False)
+            return calendar
+
+    def _sync(self, calendar, creds):
+        """Bring the mirror up to date; the caller holds calendar.lock."""
+        incremental = calendar.sync_token is not None
+        events = dict(calendar.events) if incremental else {}
+        params = {
+            'calendarId': 'primary',
+            'singleEvents': True,
+            'maxResults': EVENT_LIST_PAGE_SIZE,
+            'fields': EVENT_LIST_FIELDS
+        }
+        if incremental:
+            params['syncToken'] = calendar.sync_token
+        else:
+            time_min = datetime.now(timezone.utc) - timedelta(days=self.lookback_days)
+            params['timeMin'] = time_min.isoformat().replace('+00:00', 'Z')
+
+        started_at = time.time()
+        sync_token = None
+        try:
+            with service_pool.checkout('calendar', 'v3', creds) as service:
+                page_token = None
+                while True:
+                    if page_token:
+                        params['pageToken'] = page_token
+                    response = service.events().list(**params).execute()
+                    for event in response.get('items', []):
+                        if event.get('status') == 'cancelled':
+                            events.pop(event['id'], None)
+                        else:
+                            events[event['id']] = event
+                    page_token = response.get('nextPageToken')
+                    if not page_token:
+                        sync_token = response.get('nextSyncToken')
+                        break
+        except HttpError as error:
+            if incremental and error.resp.status == 410:
+                # Sync token expired: start over with a full sync
+                print("Calendar sync token expired, doing a full sync")
+                calendar.sync_token = None
+                return self._sync(calendar, creds)
+            raise
+
+        calendar.events = events
+        calendar.sync_token = sync_token
+        calendar.synced_at = started_at
+
+    def get_events(self, creds, time_min=None, time_max=None, max_results=None):
+        """
+        Return the user's events that end after time_min and start before time_max,
+        ordered by start time.
+
+        Args:
+            creds: Google API credentials of the user
+            time_min: Aware datetime; defaults to now
+            time_max: Optional aware datetime
+            max_results: Optional maximum number of events returned
+
+        Returns:
+            List of raw Calendar event resources
+        """
+        calendar = self._calendar(creds)
+        with calendar.lock:
+            if time.time() - calendar.synced_at >= self.max_staleness:
+                self._sync(calendar, creds)
+            events = list(calendar.events.values())
+
+        time_min = time_min or datetime.now(timezone.utc)
+        selected = []
+        for event in events:
+            start = event_time(event.get('start'))
+            end = event_time(event.get('end')) or start
+            if start is None or end <= time_min:
+                continue
+            if time_max is not None and start >= time_max:
+                continue
+            selected.append((start, event))
+        selected.sort(key=lambda item: item[0])
+        events = [event for _, event in selected]
+        return events[:max_results] if max_results is not None else events
+
+    def apply_created(self, creds, event):
+        """Add an event created through the API to the user's mirror."""
+        calendar = self._calendar(creds)
+        with calendar.lock:
+            if event and event.get('id') and calendar.synced_at:
+                calendar.events[event['id']] = event
+
+    def apply_deleted(self, creds, event_id):
+        """Remove an event deleted through the API from the user's mirror."""
+        calendar = self._calendar(creds)
+        with calendar.lock:
+            calendar.events.pop(event_id, None)
+
+    def invalidate(self, creds):
+        """Make the user's next read sync first, e.g. after a write whose outcome is unknown."""
+        with self._lock:
+            calendar = self._calendars.get(user_key(creds))
+        if calendar is not None:
+            with calendar.lock:
+                calendar.synced_at = 0
+
+
+# Shared process-wide mirror
+calendar_mirror = CalendarMirror()
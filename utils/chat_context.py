@@ -0,0 +1,89 @@
+# backend/utils/chat_context.py
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import CHAT_CONTEXT_WORKERS, CHAT_CALENDAR_TIMEOUT, CHAT_EMAIL_TIMEOUT
+from utils.calendar import fetch_calendar_events
+from utils.gmail import fetch_emails
+
+CALENDAR = 'calendar'
+EMAIL = 'email'
+
+# Words showing that a question is about the user's mail or schedule
+EMAIL_PATTERN = re.compile(
+    r'@email|\b(e-?mails?|inbox|mails?|messages?|sent me|wrote|replied|newsletters?)\b',
+    re.IGNORECASE
+)
+CALENDAR_PATTERN = re.compile(
+    r'\b(calendar|schedul\w*|events?|meetings?|appointments?|agenda|plans?|planned|busy|free|'
+    r'available|availability|upcoming|next|today|tonight|tomorrow|yesterday|week|weekend|month|'
+    r'morning|afternoon|evening|deadlines?|due|tasks?|to-?dos?|remind\w*|when|'
+    r'monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b',
+    re.IGNORECASE
+)
+
+# Shared by all requests so a burst of chats cannot start unbounded threads
+_executor = ThreadPoolExecutor(max_workers=max(1, CHAT_CONTEXT_WORKERS), thread_name_prefix='chat-context')
+
+
+def select_sources(message):
+    """
+    Decide which data sources a chat message needs.
+
+    '@email' or mail vocabulary selects the inbox; schedule vocabulary selects
+    the calendar. Small talk and general questions need neither, so they are
+    answered with a single LLM call.
+    """
+    sources = []
+    if EMAIL_PATTERN.search(message):
+        sources.append(EMAIL)
+    if CALENDAR_PATTERN.search(message):
+        sources.append(CALENDAR)
+    return sources
+
+def gather_context(user_id, creds, sources):
+    """
+    Fetch the selected sources concurrently, each within its own time limit.
+
+    Args:
+        user_id: The user whose data is fetched
+        creds: Google API credentials of the user
+        sources: Source names from select_sources
+
+    Returns:
+        Tuple (context, unavailable): context maps each source that answered in
+        time to its data; unavailable lists the sources that failed or timed out
+    """
+    fetchers = {
+        CALENDAR: (lambda: fetch_calendar_events(creds), CHAT_CALENDAR_TIMEOUT),
+        EMAIL: (lambda: fetch_emails(user_id), CHAT_EMAIL_TIMEOUT),
+    }
+    started = time.monotonic()
+    futures = {source: _executor.submit(fetchers[source][0]) for source in sources if source in fetchers}
+
+    context = {}
+    unavailable = []
+    # Wait for the sources in order of their time limit so each one gets exactly its own budget
+    for source in sorted(futures, key=lambda name: fetchers[name][1]):
+        future = futures[source]
+        remaining = fetchers[source][1] - (time.monotonic() - started)
+        done, _ = wait([future], timeout=max(0, remaining))
+        if not done:
+            # The fetch keeps running in the background; its result is simply not used
+            print(f"Chat context source '{source}' timed out after {fetchers[source][1]}s")
+            unavailable.append(source)
+            continue
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Chat context source '{source}' failed: {e}")
+            unavailable.append(source)
+            continue
+        if result is None or (isinstance(result, dict) and 'error' in result):
+            # fetch_emails reports failures as {'error': ...} instead of raising
+            print(f"Chat context source '{source}' failed: {result.get('error') if result else 'no data'}")
+            unavailable.append(source)
+        else:
+            context[source] = result
+    return context, unavailable
@@ -0,0 +1,303 @@
+# backend/utils/dateparse.py
+import re
+from datetime import datetime, timedelta, time, date
+
+from config import LOCAL_DATE_CONFIDENCE
+
+MONTHS = {
+    'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3,
+    'apr': 4, 'april': 4, 'may': 5, 'jun': 6, 'june': 6, 'jul': 7, 'july': 7,
+    'aug': 8, 'august': 8, 'sep': 9, 'sept': 9, 'september': 9, 'oct': 10, 'october': 10,
+    'nov': 11, 'november': 11, 'dec': 12, 'december': 12
+}
+
+# Short forms like "mon", "sat" and "sun" are left out because they collide with ordinary words
+WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'tue': 1, 'tues': 1, 'wednesday': 2, 'wed': 2,
+    'thursday': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'friday': 4, 'fri': 4,
+    'saturday': 5, 'sunday': 6
+}
+
+_MONTH = r'(?P<month>' + '|'.join(sorted(MONTHS, key=len, reverse=True)) + r')\.?'
+_WEEKDAY = r'(?P<weekday>' + '|'.join(sorted(WEEKDAYS, key=len, reverse=True)) + r')'
+_DAY_PREFIX = r'(?:(?P<day_name>' + '|'.join(sorted(WEEKDAYS, key=len, reverse=True)) + r'),?\s+)?'
+_ORDINAL = r'(?:st|nd|rd|th)?'
+_AMPM = r'(?:a\.?m\.?|p\.?m\.?)'
+
+# (pattern, kind) pairs, tried in order; spans already claimed by an earlier pattern are skipped
+DATE_PATTERNS = [
+    (re.compile(r'\b(?P<year>\d{4})[-/](?P<month_num>\d{1,2})[-/](?P<day>\d{1,2})\b'), 'iso'),
+    (re.compile(_DAY_PREFIX + r'\b' + _MONTH + r'\s+(?P<day>\d{1,2})' + _ORDINAL + r'\b(?:,?\s+(?P<year>\d{4})\b)?'), 'month_day'),
+    (re.compile(_DAY_PREFIX + r'\b(?P<day>\d{1,2})' + _ORDINAL + r'\s+(?:of\s+)?' + _MONTH + r'(?:,?\s+(?P<year>\d{4})\b)?'), 'day_month'),
+    (re.compile(r'\b(?P<first>\d{1,2})/(?P<second>\d{1,2})(?:/(?P<year>\d{2}|\d{4}))?\b'), 'numeric'),
+    (re.compile(r'\b(?P<word>day after tomorrow|today|tonight|tomorrow|tmrw|tmr)\b'), 'relative'),
+    (re.compile(r'\bin\s+(?P<count>\d{1,3}|a|one|two|three)\s+(?P<unit>days?|weeks?)\b'), 'offset'),
+    (re.compile(r'\b(?:(?P<modifier>next|this|coming|on)\s+)?' + _WEEKDAY + r'\b'), 'weekday'),
+]
+
+TIME_RANGE_PATTERN = re.compile(
+    r'\b(?P<h1>\d{1,2})(?::(?P<m1>\d{2}))?\s*(?P<ap1>' + _AMPM + r')?\s*(?:-|–|to|until|till)\s*'
+    r'(?P<h2>\d{1,2})(?::(?P<m2>\d{2}))?\s*(?P<ap2>' + _AMPM + r')?(?!\w)'
+)
+TIME_PATTERN = re.compile(
+    r'\b(?:(?P<hour>\d{1,2}):(?P<minute>\d{2})\s*(?P<ampm>' + _AMPM + r')?(?!\w)'
+    r'|(?P<hour_only>\d{1,2})\s*(?P<ampm_only>' + _AMPM + r')(?!\w)'
+    r'|(?P<named>noon|midday|midnight))'
+)
+
+# Temporal words the parser does not understand; left over after parsing they lower the confidence
+UNSUPPORTED_HINTS = re.compile(
+    r'\b(week|weeks|weekend|month|months|year|fortnight|after|before|end of|start of|'
+    r'beginning of|last|past|ago|within|between|sometime|later|soon|asap|eod|eow)\b'
+)
+
+CONFIDENCE = {
+    'iso': 0.98,
+    'month_day': 0.92,
+    'day_month': 0.92,
+    'numeric': 0.75,
+    'relative': 0.95,
+    'offset': 0.9,
+    'weekday': 0.9,
+}
+
+NUMBER_WORDS = {'a': 1, 'one': 1, 'two': 2, 'three': 3}
+
+# Month names that are also ordinary words ("I may 5 times"); next to a day number they
+# only count as a date with a weekday, a year or a leading "on", and otherwise stay below
+# the LOCAL_DATE_CONFIDENCE threshold
+AMBIGUOUS_MONTHS = {'may'}
+AMBIGUOUS_MONTH_CONFIDENCE = 0.5
+_LEADING_ON = re.compile(r'\bon\s+$')
+# Time zone abbreviations that follow a time, e.g. "3pm ET"
+TIMEZONE_SUFFIX = re.compile(r'\x00\s*(?:[ECMP][SD]?T|UTC|GMT)\b')
+# Prepositions and separators leading into a removed date or time, e.g. "Meeting on <date> at <time>"
+LEADING_PREPOSITION = re.compile(r'\b(?:on|at|from|by|until|till)\s*,?\s*\x00', re.IGNORECASE)
+
+
+def _with_year(year, month, day, today, explicit_year):
+    """Build a date, rolling dates without an explicit year that already passed into next year."""
+    result = date(year, month, day)
+    if not explicit_year and result < today:
+        result = date(year + 1, month, day)
+    return result
+
+def _resolve_date(match, kind, today):
+    """Turn a date match into (date, confidence); raises ValueError for impossible dates."""
+    groups = match.groupdict()
+    confidence = CONFIDENCE[kind]
+    if kind == 'iso':
+        return date(int(groups['year']), int(groups['month_num']), int(groups['day'])), confidence
+    if kind in ('month_day', 'day_month'):
+        month = MONTHS[groups['month']]
+        day = int(groups['day'])
+        if groups['month'] in AMBIGUOUS_MONTHS and not (
+                groups.get('year') or groups.get('day_name') or _LEADING_ON.search(match.string[:match.start()])):
+            confidence = AMBIGUOUS_MONTH_CONFIDENCE
+        if groups.get('year'):
+            return date(int(groups['year']), month, day), confidence + 0.03
+        return _with_year(today.year, month, day, today, False), confidence
+    if kind == 'numeric':
+        first, second = int(groups['first']), int(groups['second'])
+        if first > 12 and second <= 12:
+            # Unambiguous day/month
+            month, day = second, first
+            confidence = 0.9
+        else:
+            month, day = first, second
+            if second > 12:
+                confidence = 0.9
+        year = groups.get('year')
+        if year:
+            year = int(year) + (2000 if len(year) == 2 else 0)
+            return date(year, month, day), confidence
+        return _with_year(today.year, month, day, today, False), confidence
+    if kind == 'relative':
+        word = groups['word']
+        if word == 'day after tomorrow':
+            return today + timedelta(days=2), confidence
+        if word in ('tomorrow', 'tmrw', 'tmr'):
+            return today + timedelta(days=1), confidence
+        return today, confidence
+    if kind == 'offset':
+        count = groups['count']
+        count = NUMBER_WORDS[count] if count in NUMBER_WORDS else int(count)
+        days = count * 7 if groups['unit'].startswith('week') else count
+        return today + timedelta(days=days), confidence
+    if kind == 'weekday':
+        target = WEEKDAYS[groups['weekday']]
+        days_ahead = (target - today.weekday()) % 7
+        modifier = groups.get('modifier')
+        if modifier == 'next':
+            # "next Friday" is ambiguous between this coming Friday and the one after
+            if days_ahead == 0:
+                days_ahead = 7
+            confidence = 0.7
+        elif modifier == 'coming' and days_ahead == 0:
+            days_ahead = 7
+        return today + timedelta(days=days_ahead), confidence
+    raise ValueError(f"Unknown date kind: {kind}")
+
+def _to_time(hour, minute, ampm):
+    hour = int(hour)
+    minute = int(minute or 0)
+    if ampm:
+        ampm = ampm.replace('.', '')
+        if hour < 1 or hour > 12:
+            raise ValueError("Invalid 12-hour time")
+        if ampm == 'pm' and hour != 12:
+            hour += 12
+        elif ampm == 'am' and hour == 12:
+            hour = 0
+    return time(hour, minute)
+
+def _overlaps(span, spans):
+    return any(span[0] < end and start < span[1] for start, end in spans)
+
+def find_date_mentions(text, now=None):
+    """
+    Find every date mentioned in a piece of text.
+
+    Returns:
+        List of dicts with 'date', 'kind', 'confidence' and 'span', in text order
+    """
+    today = (now or datetime.now()).date()
+    lowered = text.lower()
+    mentions = []
+    claimed = []
+    for pattern, kind in DATE_PATTERNS:
+        for match in pattern.finditer(lowered):
+            span = match.span()
+            if _overlaps(span, claimed):
+                continue
+            try:
+                resolved, confidence = _resolve_date(match, kind, today)
+            except (ValueError, KeyError):
+                continue
+            claimed.append(span)
+            mentions.append({'date': resolved, 'kind': kind, 'confidence': confidence, 'span': span})
+    mentions.sort(key=lambda mention: mention['span'][0])
+    return mentions
+
+def find_time_mentions(text, skip_spans=()):
+    """
+    Find times and time ranges in a piece of text, ignoring the given spans.
+
+    Returns:
+        List of dicts with 'start', 'end' (None for a single time) and 'span'
+    """
+    lowered = text.lower()
+    mentions = []
+    claimed = list(skip_spans)
+    for match in TIME_RANGE_PATTERN.finditer(lowered):
+        if _overlaps(match.span(), claimed):
+            continue
+        groups = match.groupdict()
+        end_ampm = groups['ap2']
+        start_ampm = groups['ap1'] or end_ampm
+        # Ranges need an am/pm marker or colons to be told apart from other numbers
+        if not end_ampm and not (groups['m1'] and groups['m2']):
+            continue
+        try:
+            start = _to_time(groups['h1'], groups['m1'], start_ampm)
+            end = _to_time(groups['h2'], groups['m2'], end_ampm)
+        except ValueError:
+            continue
+        if start_ampm and not groups['ap1'] and start > end:
+            # "11-1pm": the start is in the morning
+            try:
+                start = _to_time(groups['h1'], groups['m1'], 'am')
+            except ValueError:
+                continue
+        claimed.append(match.span())
+        mentions.append({'start': start, 'end': end, 'span': match.span()})
+    for match in TIME_PATTERN.finditer(lowered):
+        if _overlaps(match.span(), claimed):
+            continue
+        groups = match.groupdict()
+        try:
+            if groups['named']:
+                start = time(0, 0) if groups['named'] == 'midnight' else time(12, 0)
+            elif groups['hour_only']:
+                start = _to_time(groups['hour_only'], None, groups['ampm_only'])
+            else:
+                start = _to_time(groups['hour'], groups['minute'], groups['ampm'])
+        except ValueError:
+            continue
+        claimed.append(match.span())
+        mentions.append({'start': start, 'end': None, 'span': match.span()})
+    mentions.sort(key=lambda mention: mention['span'][0])
+    return mentions
+
+def parse_date_text(text, now=None):
+    """
+    Parse dates and times from text without calling the LLM.
+
+    Handles relative days ("today", "tomorrow", "in 3 days"), weekdays
+    ("Friday", "next Monday"), explicit dates ("2024-05-03", "May 3rd",
+    "3 May 2024", "5/3"), times ("3pm", "15:30", "noon") and time ranges
+    ("3-5pm", "10:00 to 11:30").
+
+    Args:
+        text: Free text such as a chat command or an email body
+        now: Reference datetime for relative dates (defaults to now; use the
+            email's send time when parsing emails)
+
+    Returns:
+        Dict with 'date', 'start_time', 'end_time' (each None if not found),
+        'confidence' between 0 and 1 for the date, and 'spans' covering the
+        parsed text
+    """
+    date_mentions = find_date_mentions(text, now)
+    time_mentions = find_time_mentions(text, [mention['span'] for mention in date_mentions])
+    spans = [mention['span'] for mention in date_mentions + time_mentions]
+
+    result = {'date': None, 'start_time': None, 'end_time': None, 'confidence': 0.0, 'spans': spans}
+    if time_mentions:
+        result['start_time'] = time_mentions[0]['start']
+        result['end_time'] = time_mentions[0]['end']
+    if not date_mentions:
+        return result
+
+    result['date'] = date_mentions[0]['date']
+    confidence = min(mention['confidence'] for mention in date_mentions)
+    if len({mention['date'] for mention in date_mentions}) > 1:
+        # Several different dates: let the LLM work out which one is meant
+        confidence = min(confidence, 0.4)
+    if len({(mention['start'], mention['end']) for mention in time_mentions}) > 1:
+        confidence = min(confidence, 0.6)
+
+    residual = text.lower()
+    for start, end in sorted(spans, reverse=True):
+        residual = residual[:start] + ' ' + residual[end:]
+    if UNSUPPORTED_HINTS.search(residual):
+        confidence = min(confidence, 0.5)
+
+    result['confidence'] = round(confidence, 2)
+    return result
+
+def is_confident(result, threshold=LOCAL_DATE_CONFIDENCE):
+    """Check whether a parse_date_text result can be used without asking the LLM."""
+    return result['date'] is not None and result['confidence'] >= threshold
+
+def strip_date_phrases(text, result):
+    """Remove the parsed date/time phrases (and dangling prepositions) from text, e.g. to get an event title."""
+    # Mark the removed phrases first so the words around them can be recognized
+    stripped = text
+    for start, end in sorted(result['spans'], reverse=True):
+        stripped = stripped[:start] + '\x00' + stripped[end:]
+    stripped = TIMEZONE_SUFFIX.sub('\x00', stripped)
+    while True:
+        trimmed = LEADING_PREPOSITION.sub('\x00', stripped)
+        if trimmed == stripped:
+            break
+        stripped = trimmed
+    stripped = re.sub(r'\s+', ' ', stripped.replace('\x00', ' ')).strip(' ,.-:')
+    # Drop prepositions left dangling at either end, e.g. "Meeting with John at"
+    while True:
+        trimmed = re.sub(r'(^|\s+)(on|at|from|by|for|in|this|next)$', '', stripped, flags=re.IGNORECASE)
+        trimmed = re.sub(r'^(on|at|from|by|for|in)(\s+|$)', '', trimmed, flags=re.IGNORECASE).strip(' ,.-')
+        if trimmed == stripped:
+            break
+        stripped = trimmed
+    return stripped
@@ -0,0 +1,454 @@
+# backend/utils/email_processor.py
+import time
+import traceback
+from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from googleapiclient.errors import HttpError
+
+from config import (
+    LABEL_NAME, EMAIL_SWEEP_WORKERS, EMAIL_PROCESS_BUDGET, EMAIL_PROCESS_INTERVAL, EVENT_EXTRACTION_MODEL
+)
+from utils.auth import load_credentials, refresh_credentials
+from utils.gmail import (
+    ensure_label_exists, extract_email_body, iter_unprocessed_message_pages,
+    batch_get_messages_two_phase, batch_add_label, requeue_message_ids,
+    METADATA_HEADERS, METADATA_FIELDS, FULL_MESSAGE_FIELDS
+)
+from utils.calendar import create_calendar_event, event_id_for
+from utils.models import UserPreferences, SyncState
+from utils.store import user_store
+from utils.job_queue import JobQueue
+from utils.extraction import extract_batch
+from utils.structured_output import Schema, Field
+from utils.llm_gateway import LLMGateway, LLMDeadlineExceeded, LLMUnavailableError
+from utils.dateparse import parse_date_text, is_confident
+from utils.interest_matcher import get_user_matcher
+from utils.service_pool import service_pool
+
+# Bump whenever the event extraction prompt changes so cached results are not reused
+EVENT_EXTRACTION_PROMPT_VERSION = "event-extraction-v3"
+EVENT_EXTRACTION_INSTRUCTIONS = """
+Extract the following information from each email:
+1. The SPECIFIC date and time of the event mentioned (EXACT DATE AND TIME, not relative dates)
+2. The location of the event (if mentioned)
+3. A brief description of what this event is about
+
+IMPORTANT: For the event_date, you must provide the EXACT date and time in YYYY-MM-DD HH:MM format.
+Do not use "tomorrow", "next week", or any other relative dates. Convert them to actual calendar dates.
+"""
+EVENT_EXTRACTION_SCHEMA = Schema([
+    Field('event_date', format='datetime', nullable=True,
+          description="exact date and time of the event in YYYY-MM-DD HH:MM format, null if not found"),
+    Field('location', nullable=True, description="location of the event, null if not found"),
+    Field('description', nullable=True, description="brief description of the event"),
+])
+
+# Messages carrying any of these labels are never turned into events
+SKIPPED_SYSTEM_LABELS = {'SPAM', 'TRASH', 'DRAFT'}
+
+
+def get_valid_credentials(user_id):
+    """Load credentials for a user, refreshing them if they have expired."""
+    creds = load_credentials(user_id)
+    if creds and creds.valid:
+        return creds
+    if creds and creds.expired and creds.refresh_token:
+        try:
+            return refresh_credentials(user_id, creds)
+        except Exception as e:
+            print(f"Failed to refresh credentials for {user_id}: {e}")
+    return None
+
+@contextmanager
+def load_user_context(user_id):
+    """Load everything needed to process a user's mail.
+
+    The Gmail client is borrowed from the service pool for the duration of the
+    with block.
+
+    Yields:
+        Tuple of (creds, interest_matcher, gmail_service, label_id), or None if the
+        user has no valid credentials or has disabled email processing.
+    """
+    creds = get_valid_credentials(user_id)
+    if not creds:
+        yield None
+        return
+
+    # Load user preferences
+    user_preferences = UserPreferences.load_preferences(user_id)
+    if not user_preferences.get('enabled', True):
+        print(f"Email processing disabled for user {user_id}")
+        yield None
+        return
+
+    # Compiled matcher for the user's interests (cached until the preferences change)
+    interest_matcher = get_user_matcher(user_id, user_preferences.get('interests', []))
+
+    with service_pool.checkout('gmail', 'v1', creds) as gmail_service:
+        label_id = ensure_label_exists(gmail_service, LABEL_NAME)
+        yield (creds, interest_matcher, gmail_service, label_id) if label_id else None
+
+def process_user_emails(user_id):
+    """Process unlabelled emails for a single user and create calendar events.
+
+    Returns:
+        Number of messages processed, or None if the user was skipped.
+    """
+    with load_user_context(user_id) as context:
+        if not context:
+            return None
+        creds, interest_matcher, gmail_service, label_id = context
+
+        # Stream pages of new mail (or of the unlabelled backlog) matching the user's interests, up to the per-run budget
+        processed_count = 0
+        failed_ids = []
+        pages = iter_unprocessed_message_pages(
+            gmail_service, user_id, LABEL_NAME, EMAIL_PROCESS_BUDGET, interests=interest_matcher.interests
+        )
+        for message_ids, checkpoint in pages:
+            # Headers and labels first; full messages only for those still to be processed
+            messages, full_ids = batch_get_messages_two_phase(
+                gmail_service, message_ids, lambda message: needs_processing(message, label_id)
+            )
+            processed_ids = []
+            try:
+                candidates = []
+                for msg_id in message_ids:
+                    message = messages.get(msg_id)
+                    if isinstance(message, HttpError) and message.resp.status == 404:
+                        # Deleted since it showed up in the history
+                        continue
+                    if isinstance(message, Exception) or message is None:
+                        print(f"Failed to fetch message {msg_id} for {user_id}: {message}")
+                        failed_ids.append(msg_id)
+                        continue
+
+                    if msg_id not in full_ids:
+                        # Already labelled or a system message
+                        continue
+                    candidates.append(message)
+
+                process_messages(creds, candidates, interest_matcher, processed_ids)
+            finally:
+                # Mark everything handled on this page as processed in a single call
+                if processed_ids:
+                    batch_add_label(gmail_service, processed_ids, label_id)
+            processed_count += len(processed_ids)
+
+            # Messages that could not be fetched are retried on the next runs, alongside the new mail
+            SyncState.save_cursor(user_id, 'processing', requeue_message_ids(checkpoint, failed_ids))
+
+        return processed_count
+
+def needs_processing(message, label_id):
+    """Check from its labels whether a message still has to be turned into an event."""
+    labels = set(message.get('labelIds', []))
+    return label_id not in labels and not labels & SKIPPED_SYSTEM_LABELS
+
+def parse_message(message):
+    """Extract the fields used for event creation from a full Gmail message."""
+    headers = message.get('payload', {}).get('headers', [])
+    return {
+        'id': message.get('id'),
+        'subject': next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject'),
+        'sender': next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown Sender'),
+        'date_str': next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date'),
+        'content': extract_email_body(message.get('payload', {})),
+        'timestamp': message_timestamp(message)
+    }
+
+def matches_interests(email, interest_matcher):
+    """Check whether an email mentions any of the user's interests (always True without interests)."""
+    if not interest_matcher.interests:
+        return True
+    interest = interest_matcher.first_match(f"{email['subject']} {email['content']}")
+    if interest is None:
+        print(f"Email doesn't match user interests: {email['subject']}")
+        return False
+    print(f"Email matched interest: {interest}")
+    return True
+
+def extract_event_details(emails):
+    """
+    Use AI to extract the event date, location and description of several emails.
+
+    The emails are packed into as few Gemini calls as the token budget allows
+    and cached results are reused. Emails the AI could not extract fall back to
+    a confident local parse of their date (without location or description).
+
+    Returns:
+        Dict mapping email ID to the extracted data; emails whose extraction
+        failed are missing.
+    Raises:
+        LLMUnavailableError or LLMDeadlineExceeded when the gateway did not
+        let the call through, so the emails stay unlabelled and are retried
+        on a later sweep (or by the job queue) instead of falling back
+    """
+    results = {}
+    try:
+        results.update(extract_batch(
+            LLMGateway(EVENT_EXTRACTION_MODEL),
+            emails,
+            EVENT_EXTRACTION_INSTRUCTIONS,
+            EVENT_EXTRACTION_SCHEMA,
+            EVENT_EXTRACTION_PROMPT_VERSION,
+            raise_unavailable=True
+        ))
+    except (LLMUnavailableError, LLMDeadlineExceeded):
+        raise
+    except Exception as ai_error:
+        print(f"Error using AI to extract dates: {ai_error}")
+
+    for email in emails:
+        if email['id'] in results:
+            continue
+        # Better than the email's own date: a single, unambiguous date and time in the text
+        local_result = parse_date_text(f"{email['subject']}\n{email['content']}", now=email['timestamp'])
+        if is_confident(local_result) and local_result['start_time']:
+            event_dt = datetime.combine(local_result['date'], local_result['start_time'])
+            print(f"Parsed event date locally for: {email['subject']} -> {event_dt}")
+            results[email['id']] = {
+                'event_date': event_dt.strftime("%Y-%m-%d %H:%M"),
+                'location': None,
+                'description': None
+            }
+    return results
+
+def create_event_from_email(creds, email, extracted_data):
+    """Create the calendar event for an email, falling back to the email date if extraction failed."""
+    subject = email['subject']
+    sender = email['sender']
+    date_str = email['date_str']
+    # One event per message, even if the message is processed again after a failure
+    event_id = event_id_for(f"gmail:{email['id']}")
+
+    if not extracted_data:
+        # Fallback to email date if AI extraction fails
+        print(f"Error using AI to extract date for: {subject}, using email date")
+        iso_date = email['timestamp'].isoformat()
+        return create_calendar_event(creds, subject, sender, date_str, iso_date, event_id=event_id)
+
+    # Get the event date from the extraction or use email date as fallback
+    event_date = extracted_data.get('event_date', 'none')
+    location = extracted_data.get('location', 'none')
+    event_description = extracted_data.get('description', '')
+
+    if event_date and event_date.lower() != 'none':
+        # Parse the event date
+        try:
+            # Try with standard format first
+            event_dt = datetime.strptime(event_date, "%Y-%m-%d %H:%M")
+            print(f"Successfully parsed event date using standard format: {event_date}")
+        except Exception as date_error:
+            try:
+                # Try with dateutil parser which is more flexible
+                from dateutil import parser
+                event_dt = parser.parse(event_date)
+                print(f"Successfully parsed event date using dateutil: {event_date} -> {event_dt}")
+            except Exception as parser_error:
+                print(f"Error parsing event date with both methods: {date_error} and {parser_error}")
+                # Fallback to email date
+                event_dt = email['timestamp']
+                print(f"Using fallback email timestamp: {event_dt}")
+
+        # Create ISO format date - without the Z suffix to avoid UTC designation
+        iso_date = event_dt.isoformat()
+        print(f"Extracted event date: {event_date} -> ISO format: {iso_date}")
+    else:
+        # Use email date if no event date found
+        print(f"No event date found in: {subject}, using email date")
+        iso_date = email['timestamp'].isoformat()
+
+    # Enhanced event description with location
+    full_description = f"From: {sender}\nDate: {date_str}\nSubject: {subject}"
+    if event_description:
+        full_description += f"\n\nDetails: {event_description}"
+    if location and location.lower() != 'none':
+        full_description += f"\n\nLocation: {location}"
+
+    # Create calendar event with the extracted date and enhanced description
+    return create_calendar_event(
+        creds,
+        subject,
+        sender,
+        date_str,
+        iso_date,
+        description=full_description,
+        set_reminder=True,
+        event_id=event_id
+    )
+
+def process_messages(creds, messages, interest_matcher, processed_ids):
+    """
+    Create calendar events for the messages that match the user's interests.
+
+    All matching messages are extracted together in batched Gemini calls. The ID
+    of every handled message (including filtered-out ones, which are marked as
+    processed without creating an event) is appended to processed_ids as soon
+    as it is done, so the caller can label them even if a later message fails.
+    """
+    matched = []
+    for message in messages:
+        email = parse_message(message)
+        if matches_interests(email, interest_matcher):
+            matched.append(email)
+        else:
+            # Mark as processed without creating an event
+            processed_ids.append(email['id'])
+
+    extracted = extract_event_details(matched)
+    for email in matched:
+        create_event_from_email(creds, email, extracted.get(email['id']))
+        processed_ids.append(email['id'])
+
+def process_message(creds, message, interest_matcher):
+    """Create a calendar event for a single Gmail message if it matches the user's interests.
+
+    Returns:
+        True if an event was created, False if the message was filtered out.
+    """
+    email = parse_message(message)
+    if not matches_interests(email, interest_matcher):
+        return False
+    extracted = extract_event_details([email])
+    create_event_from_email(creds, email, extracted.get(email['id']))
+    return True
+
+def enqueue_user_emails(user_id, queue):
+    """Enqueue one extraction job per new message instead of processing it inline.
+
+    Returns:
+        Number of jobs created, or None if the user was skipped.
+    """
+    with load_user_context(user_id) as context:
+        if not context:
+            return None
+        interest_matcher, gmail_service = context[1], context[2]
+
+        queued = 0
+        pages = iter_unprocessed_message_pages(
+            gmail_service, user_id, LABEL_NAME, EMAIL_PROCESS_BUDGET, interests=interest_matcher.interests
+        )
+        for message_ids, checkpoint in pages:
+            queued += queue.enqueue(user_id, message_ids)
+            # Retried messages are now queued, the job queue retries them from here
+            SyncState.save_cursor(user_id, 'processing', requeue_message_ids(checkpoint, []))
+        return queued
+
+def process_job(job):
+    """Process the message referenced by a queued extraction job.
+
+    Returns:
+        True if the message was processed and labelled, False if there was nothing to do.
+    Raises:
+        Any error that should be retried by the job queue.
+    """
+    with load_user_context(job['user_id']) as context:
+        if not context:
+            return False
+        creds, interest_matcher, gmail_service, label_id = context
+
+        try:
+            # Check the labels on the metadata before downloading the whole message
+            metadata = gmail_service.users().messages().get(
+                userId='me',
+                id=job['message_id'],
+                format='metadata',
+                metadataHeaders=METADATA_HEADERS,
+                fields=METADATA_FIELDS
+            ).execute()
+            if not needs_processing(metadata, label_id):
+                return False
+            message = gmail_service.users().messages().get(
+                userId='me',
+                id=job['message_id'],
+                format='full',
+                fields=FULL_MESSAGE_FIELDS
+            ).execute()
+        except HttpError as error:
+            if error.resp.status == 404:
+                # Message was deleted before the job ran
+                return False
+            raise
+
+        process_message(creds, message, interest_matcher)
+        gmail_service.users().messages().modify(
+            userId='me',
+            id=job['message_id'],
+            body={'addLabelIds': [label_id]}
+        ).execute()
+        return True
+
+def message_timestamp(message):
+    """Return the Gmail internal date of a message as a naive UTC datetime."""
+    internal_date = int(message.get('internalDate', 0))
+    return datetime.utcfromtimestamp(internal_date / 1000)
+
+def _process_user_safely(handler, user_id):
+    """Run a per-user handler, isolating any failure to this user."""
+    try:
+        return user_id, handler(user_id), None
+    except Exception as e:
+        print(f"Error processing emails for {user_id}: {e}")
+        print(traceback.format_exc())
+        return user_id, None, e
+
+def process_all_users(max_workers=EMAIL_SWEEP_WORKERS, handler=process_user_emails):
+    """Process every user's emails concurrently using a bounded worker pool.
+
+    Args:
+        max_workers: Maximum number of users handled at the same time
+        handler: Per-user function returning a message count, or None to skip the user
+
+    Only users due for processing are handled. Each is then scheduled
+    EMAIL_PROCESS_INTERVAL seconds later, or for the next sweep if it failed or
+    still has a backlog.
+
+    Returns:
+        Dict with per-run statistics (users, processed, skipped, failed, messages, elapsed).
+    """
+    started = time.monotonic()
+    sweep_started_at = time.time()
+    # Indexed query instead of a scan of the tokens directory
+    user_ids = user_store.users_due_for_processing(sweep_started_at)
+    stats = {'users': len(user_ids), 'processed': 0, 'skipped': 0, 'failed': 0, 'messages': 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='email-sweep') as executor:
+        futures = [executor.submit(_process_user_safely, handler, user_id) for user_id in user_ids]
+        for future in as_completed(futures):
+            user_id, count, error = future.result()
+            if error is not None:
+                stats['failed'] += 1
+                next_process_at = sweep_started_at
+            elif count is None:
+                stats['skipped'] += 1
+                next_process_at = sweep_started_at + EMAIL_PROCESS_INTERVAL
+            else:
+                stats['processed'] += 1
+                stats['messages'] += count
+                # A user who used up the budget still has a backlog and stays due
+                next_process_at = sweep_started_at if count >= EMAIL_PROCESS_BUDGET else sweep_started_at + EMAIL_PROCESS_INTERVAL
+            user_store.schedule_processing(user_id, next_process_at, processed_at=sweep_started_at)
+
+    elapsed = time.monotonic() - started
+    stats['elapsed'] = elapsed
+    rate = stats['users'] / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Email sweep finished: {stats['users']} users ({stats['processed']} processed, "
+        f"{stats['skipped']} skipped, {stats['failed']} failed), {stats['messages']} messages "
+        f"in {elapsed:.1f}s ({rate:.2f} users/s, {max_workers} workers)"
+    )
+    return stats
+
+def enqueue_all_users(max_workers=EMAIL_SWEEP_WORKERS):
+    """Fill the job queue with every user's new messages for the worker processes."""
+    queue = JobQueue()
+    stats = process_all_users(
+        max_workers=max_workers,
+        handler=lambda user_id: enqueue_user_emails(user_id, queue)
+    )
+    queue.purge_done()
+    print(f"Job queue after sweep: {queue.stats()}")
+    return stats
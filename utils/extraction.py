@@ -0,0 +1,148 @@
+# backend/utils/extraction.py
+from config import EXTRACTION_BATCH_TOKEN_BUDGET, EXTRACTION_BATCH_MAX_EMAILS
+from utils.extraction_cache import extraction_cache, make_cache_key
+from utils.structured_output import Field, StructuredOutputError, generate_structured_items
+from utils.llm_gateway import LLMDeadlineExceeded, LLMUnavailableError
+
+# Rough characters-per-token ratio used to keep prompts inside the token budget
+CHARS_PER_TOKEN = 4
+# Tokens reserved for the instructions and the JSON answer of each email
+PROMPT_OVERHEAD_TOKENS = 400
+PER_EMAIL_OUTPUT_TOKENS = 120
+# Field identifying each email in a batch answer
+EMAIL_ID_FIELD = Field('email_id', description="the Email ID of the email")
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _email_block(email, max_chars):
+    content = email.get('content', '') or ''
+    if len(content) > max_chars:
+        content = content[:max_chars] + "\n[truncated]"
+    return (
+        f"### Email ID: {email['id']}\n"
+        f"Email Subject: {email.get('subject', 'No Subject')}\n"
+        f"Email Content: {content}\n"
+    )
+
+def pack_batches(emails, token_budget=EXTRACTION_BATCH_TOKEN_BUDGET, max_emails=EXTRACTION_BATCH_MAX_EMAILS):
+    """
+    Group emails into batches whose prompt stays inside the token budget.
+
+    Returns:
+        List of batches, each a list of (email, email_block) tuples
+    """
+    # Leave room for the instructions; a single oversized email is truncated to fit on its own
+    available_tokens = max(token_budget - PROMPT_OVERHEAD_TOKENS, PER_EMAIL_OUTPUT_TOKENS * 2)
+    max_chars = (available_tokens - PER_EMAIL_OUTPUT_TOKENS) * CHARS_PER_TOKEN
+    batches = []
+    current = []
+    current_tokens = 0
+    for email in emails:
+        block = _email_block(email, max_chars)
+        cost = estimate_tokens(block) + PER_EMAIL_OUTPUT_TOKENS
+        if current and (current_tokens + cost > available_tokens or len(current) >= max_emails):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((email, block))
+        current_tokens += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def _run_batch(llm, instructions, schema, batch, results, raise_unavailable=False):
+    """Extract one batch, splitting it and retrying the halves whose output is malformed."""
+    blocks = {email['id']: block for email, block in batch}
+
+    def build_prompt(email_ids):
+        return (
+            f"{instructions}\n\n"
+            f"Process each of the {len(email_ids)} emails below independently and answer with "
+            f"one object per email, identified by its Email ID.\n\n"
+            + "\n".join(blocks[email_id] for email_id in email_ids)
+        )
+
+    try:
+        parsed = generate_structured_items(llm, build_prompt, schema, EMAIL_ID_FIELD, list(blocks))
+    except StructuredOutputError as e:
+        print(f"Malformed batch extraction output for {len(batch)} emails: {e}")
+        parsed = {}
+    except (LLMUnavailableError, LLMDeadlineExceeded) as e:
+        # The model was never asked (circuit open, rate limit or deadline), so nothing is wrong with the emails
+        if raise_unavailable:
+            raise
+        print(f"LLM unavailable for {len(batch)} emails: {e}")
+        return
+    except Exception as e:
+        # API errors are not fixed by splitting the batch; the callers fall back per email
+        print(f"Batch extraction call failed for {len(batch)} emails: {e}")
+        return
+
+    for email_id, (data, errors) in parsed.items():
+        if data is None:
+            print(f"Could not extract required fields of email {email_id}: {errors}")
+        else:
+            results[email_id] = (data, not errors)
+    missing = [(email, block) for email, block in batch if email['id'] not in parsed]
+    if not missing:
+        return
+    if len(batch) == 1:
+        print(f"Could not extract email {batch[0][0]['id']}")
+        return
+    if len(missing) == len(batch):
+        # Nothing usable came back, retry each half separately
+        middle = len(batch) // 2
+        _run_batch(llm, instructions, schema, batch[:middle], results, raise_unavailable)
+        _run_batch(llm, instructions, schema, batch[middle:], results, raise_unavailable)
+    else:
+        _run_batch(llm, instructions, schema, missing, results, raise_unavailable)
+
+def extract_batch(llm, emails, instructions, schema, prompt_version,
+                  token_budget=EXTRACTION_BATCH_TOKEN_BUDGET, max_emails=EXTRACTION_BATCH_MAX_EMAILS,
+                  raise_unavailable=False):
+    """
+    Extract structured data from several emails with as few LLM calls as possible.
+
+    Args:
+        llm: LLMGateway used for the extraction
+        emails: List of dicts with 'id', 'subject' and 'content'
+        instructions: What to extract from each email
+        schema: Schema of the object extracted from each email; Gemini is asked
+            for JSON matching it and invalid fields are asked for again
+        prompt_version: Prompt template version used in the extraction cache key
+        token_budget: Maximum estimated prompt tokens per batch
+        max_emails: Maximum number of emails per batch
+        raise_unavailable: Raise LLMUnavailableError and LLMDeadlineExceeded
+            instead of leaving the emails of the batch out, for callers that
+            can retry later; results extracted so far are still cached
+
+    Returns:
+        Dict mapping email ID to the validated dict. Emails that could not be
+        extracted are missing from the result; optional fields that stayed
+        invalid are None and such results are not cached.
+    """
+    results = {}
+    pending = []
+    cache_keys = {}
+    for email in emails:
+        cache_key = make_cache_key(prompt_version, llm.model_name, f"{email.get('subject', '')}\n{email.get('content', '')}")
+        cached = extraction_cache.get(cache_key)
+        if cached is not None:
+            results[email['id']] = cached
+        else:
+            cache_keys[email['id']] = cache_key
+            pending.append(email)
+
+    extracted = {}
+    try:
+        for batch in pack_batches(pending, token_budget, max_emails):
+            _run_batch(llm, instructions, schema, batch, extracted, raise_unavailable)
+    finally:
+        for email_id, (data, complete) in extracted.items():
+            if complete:
+                extraction_cache.set(cache_keys[email_id], data)
+            results[email_id] = data
+    return results
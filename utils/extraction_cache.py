@@ -0,0 +1,123 @@
+# backend/utils/extraction_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+from config import EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_TTL, EXTRACTION_CACHE_MEMORY_SIZE
+
+
+def make_cache_key(template_version, model_name, content):
+    """Build a content-addressed key from the prompt template version, model and email content."""
+    digest = hashlib.sha256()
+    for part in (template_version, model_name, content):
+        digest.update(str(part).encode('utf-8', errors='replace'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Two-tier cache for parsed LLM extraction results.
+
+    Results live in a bounded in-memory LRU and in an on-disk SQLite table, so
+    they survive restarts and are shared with the worker processes. Entries in
+    both tiers expire after a TTL.
+    """
+
+    def __init__(self, path=EXTRACTION_CACHE_PATH, ttl=EXTRACTION_CACHE_TTL, memory_size=EXTRACTION_CACHE_MEMORY_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_ready = False
+
+    def _connect(self):
+        if not self._disk_ready:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        if not self._disk_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS extractions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_created ON extractions (created_at)")
+            self._disk_ready = True
+        return conn
+
+    def _remember(self, key, value, created_at):
+        with self._lock:
+            self._memory[key] = (value, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached result for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT value, created_at FROM extractions WHERE key = ?", (key,)
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Extraction cache read failed: {e}")
+            return None
+        if row is None or now - row[1] >= self.ttl:
+            return None
+        value = json.loads(row[0])
+        self._remember(key, value, row[1])
+        return value
+
+    def set(self, key, value):
+        """Store a JSON-serialisable result in both tiers."""
+        now = time.time()
+        self._remember(key, value, now)
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO extractions (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now)
+                )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Extraction cache write failed: {e}")
+
+    def evict_expired(self):
+        """Remove expired entries from both tiers; returns the number of disk rows deleted."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for key in [k for k, (_, created_at) in self._memory.items() if created_at < cutoff]:
+                del self._memory[key]
+        try:
+            conn = self._connect()
+            try:
+                return conn.execute("DELETE FROM extractions WHERE created_at < ?", (cutoff,)).rowcount
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Extraction cache eviction failed: {e}")
+            return 0
+
+
+# Shared process-wide cache
+extraction_cache = ExtractionCache()
@@ -1,10 +1,29 @@
 # backend/utils/gmail.py
 import os
+import time
 import base64
 from googleapiclient.errors import HttpError
-from googleapiclient.discovery import build
-from utils.auth import get_flow, save_credentials, load_credentials
-from google.auth.transport.requests import Request
+from utils.auth import get_flow, load_credentials, refresh_credentials
+from utils.models import SyncState
+from utils.gmail_query import build_interest_queries
+from utils.service_pool import service_pool
+from config import GMAIL_PAGE_SIZE, GMAIL_INTEREST_SEARCH, EMAIL_FETCH_MAX_ATTEMPTS
+
+# Number of inbox emails returned by fetch_emails
+INBOX_MAX_RESULTS = 10
+# users.messages.list accepts at most 500 results per page
+LIST_MAX_PAGE_SIZE = 500
+# Gmail recommends at most 50 calls per batch request
+BATCH_MAX_REQUESTS = 50
+# users.messages.batchModify accepts at most 1000 IDs per call
+BATCH_MODIFY_MAX_IDS = 1000
+# Seconds subtracted from the last sync time when filtering new mail with after:
+HISTORY_FILTER_SLACK = 3600
+# Headers requested by the metadata phase of a two-phase fetch
+METADATA_HEADERS = ['Subject', 'From', 'Date']
+# Partial response masks: only the parts of a message resource that are actually read
+METADATA_FIELDS = 'id,threadId,labelIds,internalDate,payload/headers'
+FULL_MESSAGE_FIELDS = 'id,threadId,labelIds,internalDate,payload(mimeType,headers,body/data,parts)'
 
 
 def ensure_label_exists(service, label_name):
@@ -30,20 +49,117 @@ def ensure_label_exists(service, label_name):
 def get_email_details(service, email_id):
     """Fetch email details including subject, sender, and content."""
     try:
-        message = service.users().messages().get(userId='me', id=email_id, format='full').execute()
-        headers = message.get('payload', {}).get('headers', [])
-        subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject')
-        sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown Sender')
-        email_body = extract_email_body(message.get('payload', {}))
-        return {
-            'id': email_id,
-            'subject': subject,
-            'sender': sender,
-            'content': email_body
-        }
+        message = service.users().messages().get(
+            userId='me', id=email_id, format='full', fields=FULL_MESSAGE_FIELDS
+        ).execute()
+        return parse_email_details(message)
     except Exception as e:
         return {'error': str(e)}
 
+def parse_email_details(message):
+    """Build the email details dict from a full Gmail message resource."""
+    headers = message.get('payload', {}).get('headers', [])
+    subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject')
+    sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown Sender')
+    email_body = extract_email_body(message.get('payload', {}))
+    return {
+        'id': message.get('id'),
+        'subject': subject,
+        'sender': sender,
+        'content': email_body
+    }
+
+def parse_email_headers(message):
+    """Build the header-only details dict from a metadata (or full) Gmail message resource."""
+    headers = message.get('payload', {}).get('headers', [])
+    return {
+        'id': message.get('id'),
+        'subject': next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject'),
+        'sender': next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown Sender'),
+        'date_str': next((h['value'] for h in headers if h['name'].lower() == 'date'), 'Unknown Date')
+    }
+
+def batch_get_messages(service, message_ids, format='full', metadata_headers=None, fields=None):
+    """
+    Fetch several messages with multipart batch requests instead of one call each.
+    
+    Args:
+        service: Gmail API service
+        message_ids: IDs of the messages to fetch
+        format: Gmail message format ('full', 'metadata', 'minimal', ...)
+        metadata_headers: Headers to return with format='metadata'
+        fields: Partial response mask; defaults to only what the format needs
+    
+    Returns:
+        Dict mapping each message ID to its message resource, or to the
+        exception raised for that message (e.g. HttpError 404)
+    """
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = exception if exception is not None else response
+
+    params = {'userId': 'me', 'format': format}
+    if format == 'metadata':
+        params['metadataHeaders'] = metadata_headers or METADATA_HEADERS
+    if fields is None:
+        fields = {'metadata': METADATA_FIELDS, 'full': FULL_MESSAGE_FIELDS}.get(format)
+    if fields:
+        params['fields'] = fields
+
+    unique_ids = list(dict.fromkeys(message_ids))
+    for start in range(0, len(unique_ids), BATCH_MAX_REQUESTS):
+        batch = service.new_batch_http_request(callback=callback)
+        for msg_id in unique_ids[start:start + BATCH_MAX_REQUESTS]:
+            batch.add(
+                service.users().messages().get(id=msg_id, **params),
+                request_id=msg_id
+            )
+        batch.execute()
+    return results
+
+def batch_get_messages_two_phase(service, message_ids, keep):
+    """
+    Fetch messages in two phases: headers first, full content only for survivors.
+    
+    The metadata phase downloads just the labels, internal date and the
+    METADATA_HEADERS of each message. Only messages for which keep() returns
+    True are then fetched with format='full', so large MIME trees are never
+    downloaded for messages that are filtered out or deduplicated.
+    
+    Args:
+        service: Gmail API service
+        message_ids: IDs of the messages to fetch
+        keep: Callable taking a metadata message resource and returning whether
+            the full message is needed
+    
+    Returns:
+        Tuple of (messages, full_ids): messages is a dict like
+        batch_get_messages, in which filtered-out messages map to their
+        metadata resource, and full_ids is the set of IDs fetched with
+        format='full' (their entry may still be an exception)
+    """
+    results = batch_get_messages(service, message_ids, format='metadata')
+    survivors = [
+        msg_id for msg_id in dict.fromkeys(message_ids)
+        if isinstance(results.get(msg_id), dict) and keep(results[msg_id])
+    ]
+    if survivors:
+        results.update(batch_get_messages(service, survivors))
+    return results, set(survivors)
+
+def batch_add_label(service, message_ids, label_id):
+    """Add a label to many messages using users.messages.batchModify."""
+    unique_ids = list(dict.fromkeys(message_ids))
+    for start in range(0, len(unique_ids), BATCH_MODIFY_MAX_IDS):
+        service.users().messages().batchModify(
+            userId='me',
+            body={
+                'ids': unique_ids[start:start + BATCH_MODIFY_MAX_IDS],
+                'addLabelIds': [label_id]
+            }
+        ).execute()
+
 def extract_email_body(payload):
     """Extract the email body from the payload."""
     if 'parts' in payload:
@@ -64,13 +180,347 @@ def decode_base64(encoded_str):
         return "Error decoding content"
 
 
-def fetch_emails(user_id, days=7):
+def get_current_history_id(service):
+    """Return the mailbox's current historyId."""
+    return service.users().getProfile(userId='me').execute().get('historyId')
+
+def list_history_changes(service, start_history_id, label_id=None):
+    """
+    List message changes since a stored historyId using users.history.list.
+    
+    Args:
+        service: Gmail API service
+        start_history_id: historyId saved by the previous sync
+        label_id: Optional label to restrict the history to (e.g. 'INBOX')
+    
+    Returns:
+        Tuple of (added_ids, removed_ids, latest_history_id), or None if the
+        cursor has expired and a full resync is required
+    """
+    added_ids = []
+    removed_ids = set()
+    latest_history_id = start_history_id
+    history_types = ['messageAdded', 'messageDeleted']
+    if label_id:
+        history_types.append('labelRemoved')
+    page_token = None
+    try:
+        while True:
+            params = {
+                'userId': 'me',
+                'startHistoryId': start_history_id,
+                'historyTypes': history_types
+            }
+            if label_id:
+                params['labelId'] = label_id
+            if page_token:
+                params['pageToken'] = page_token
+            response = service.users().history().list(**params).execute()
+            for record in response.get('history', []):
+                for item in record.get('messagesAdded', []):
+                    added_ids.append(item['message']['id'])
+                for item in record.get('messagesDeleted', []):
+                    removed_ids.add(item['message']['id'])
+                for item in record.get('labelsRemoved', []):
+                    if label_id in item.get('labelIds', []):
+                        removed_ids.add(item['message']['id'])
+            latest_history_id = response.get('historyId', latest_history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+    except HttpError as error:
+        if error.resp.status == 404:
+            print(f"History cursor {start_history_id} has expired, falling back to full resync")
+            return None
+        raise
+
+    # Keep the order in which messages arrived, without duplicates or deleted messages
+    seen = set()
+    new_ids = []
+    for msg_id in added_ids:
+        if msg_id not in seen and msg_id not in removed_ids:
+            seen.add(msg_id)
+            new_ids.append(msg_id)
+    return new_ids, removed_ids, latest_history_id
+
+def list_matching_message_ids(service, queries, max_results=None, label_ids=None):
+    """
+    List the IDs of messages matching any of several search queries.
+    
+    Args:
+        service: Gmail API service
+        queries: Queries from build_interest_queries, OR-ed together
+        max_results: Maximum number of IDs to return (None for all matches)
+        label_ids: Optional labels the messages must carry
+    
+    Returns:
+        List of message IDs without duplicates. Each query lists newest first
+        and the results are interleaved, so the most recent matches of every
+        query come first.
+    """
+    per_query = []
+    for query in queries:
+        ids = []
+        page_token = None
+        while max_results is None or len(ids) < max_results:
+            params = {
+                'userId': 'me',
+                'maxResults': LIST_MAX_PAGE_SIZE if max_results is None else min(max_results - len(ids), LIST_MAX_PAGE_SIZE)
+            }
+            if query:
+                params['q'] = query
+            if label_ids:
+                params['labelIds'] = label_ids
+            if page_token:
+                params['pageToken'] = page_token
+            response = service.users().messages().list(**params).execute()
+            ids.extend(msg['id'] for msg in response.get('messages', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        per_query.append(ids)
+
+    merged = []
+    seen = set()
+    for position in range(max((len(ids) for ids in per_query), default=0)):
+        for ids in per_query:
+            if position < len(ids) and ids[position] not in seen:
+                seen.add(ids[position])
+                merged.append(ids[position])
+    return merged if max_results is None else merged[:max_results]
+
+def iter_unprocessed_message_pages(service, user_id, label_name, budget, page_size=GMAIL_PAGE_SIZE, interests=None):
+    """
+    Stream candidate message IDs for background processing, one page at a time.
+    
+    Work comes from the user's 'processing' cursor: a saved checkpoint is resumed
+    first, then mail added since the stored historyId is listed, and without a
+    usable historyId the "-label:<label_name>" backlog is paged through with
+    nextPageToken. Messages that failed on an earlier run (the cursor's
+    'retries', see requeue_message_ids) come first, ahead of the new mail.
+    
+    Args:
+        service: Gmail API service
+        user_id: The user whose cursor is used
+        label_name: Label that marks processed messages
+        budget: Maximum number of message IDs to yield during this run
+        page_size: Maximum number of IDs per yielded page
+        interests: Optional user interests; with GMAIL_INTEREST_SEARCH only
+            messages matching at least one of them as a whole word are listed
+            (see build_interest_queries), otherwise they are ignored here
+    
+    Yields:
+        Tuples of (message_ids, checkpoint). Once a page has been processed and
+        labelled the caller saves checkpoint with SyncState.save_cursor (through
+        requeue_message_ids if some messages failed), so an interrupted run
+        resumes after the last completed page.
+    """
+    interests = interests if GMAIL_INTEREST_SEARCH else None
+    queries = build_interest_queries(interests, base_query=f"-label:{label_name}")
+    synced_at = int(time.time())
+    cursor = SyncState.get_cursor(user_id, 'processing')
+    backlog = cursor.get('backlog')
+    retries = cursor.get('retries') or {}
+
+    if backlog and backlog.get('queries', [f"-label:{label_name}"]) != queries:
+        # The interests changed while a backlog was being listed: list it again with the new filters
+        backlog = dict(backlog, queries=queries, query_index=0, page_token=None, listing_done=False)
+
+    if not backlog and cursor.get('history_id'):
+        changes = list_history_changes(service, cursor['history_id'])
+        if changes is not None:
+            added_ids, _, latest_history_id = changes
+            if added_ids and interests and cursor.get('synced_at'):
+                # Keep only the new mail that the interest queries also match
+                since = f"after:{int(cursor['synced_at']) - HISTORY_FILTER_SLACK}"
+                matching = set(list_matching_message_ids(service, [f"{query} {since}" for query in queries]))
+                added_ids = [msg_id for msg_id in added_ids if msg_id in matching]
+            backlog = {
+                'history_id': latest_history_id,
+                'synced_at': synced_at,
+                'queries': queries,
+                'query_index': len(queries),
+                'page_token': None,
+                'pending_ids': added_ids,
+                'listing_done': True
+            }
+
+    if not backlog:
+        # Full resync: capture the historyId first so nothing arriving during the listing is missed
+        backlog = {
+            'history_id': get_current_history_id(service),
+            'synced_at': synced_at,
+            'queries': queries,
+            'query_index': 0,
+            'page_token': None,
+            'pending_ids': [],
+            'listing_done': False
+        }
+
+    if retries:
+        retried = [msg_id for msg_id in retries if msg_id not in backlog['pending_ids']]
+        backlog = dict(backlog, pending_ids=retried + backlog['pending_ids'])
+
+    remaining = budget
+    yielded = False
+    while remaining > 0:
+        if not backlog['pending_ids']:
+            if backlog['listing_done']:
+                if not yielded:
+                    # Nothing to process, but the new historyId still needs saving
+                    yield [], {'history_id': backlog['history_id'], 'synced_at': backlog.get('synced_at'), 'queries': queries,
+                               'retries': retries}
+                break
+            # Each interest query is paged through in turn
+            query_index = backlog.get('query_index', 0)
+            params = {
+                'userId': 'me',
+                'q': queries[query_index],
+                'maxResults': page_size
+            }
+            if backlog['page_token']:
+                params['pageToken'] = backlog['page_token']
+            response = service.users().messages().list(**params).execute()
+            next_page_token = response.get('nextPageToken')
+            if not next_page_token:
+                query_index += 1
+            backlog = dict(
+                backlog,
+                queries=queries,
+                query_index=query_index,
+                pending_ids=[msg['id'] for msg in response.get('messages', [])],
+                page_token=next_page_token,
+                listing_done=query_index >= len(queries)
+            )
+            continue
+
+        page_ids = backlog['pending_ids'][:min(page_size, remaining)]
+        remaining -= len(page_ids)
+        backlog = dict(backlog, pending_ids=backlog['pending_ids'][len(page_ids):])
+        if backlog['listing_done'] and not backlog['pending_ids']:
+            # Backlog drained, switch to incremental sync
+            checkpoint = {'history_id': backlog['history_id'], 'synced_at': backlog.get('synced_at'), 'queries': queries,
+                          'retries': retries}
+        else:
+            checkpoint = {'backlog': backlog, 'retries': retries}
+        yielded = True
+        yield page_ids, checkpoint
+
+def requeue_message_ids(checkpoint, message_ids, max_attempts=EMAIL_FETCH_MAX_ATTEMPTS):
+    """
+    Return a copy of a checkpoint from iter_unprocessed_message_pages that
+    retries message_ids on the next run.
+    
+    The failed IDs are kept in the checkpoint's 'retries' with the number of
+    runs they have failed on, so the historyId and backlog position are
+    unchanged and new mail is still listed. An ID that has failed
+    max_attempts times is dropped.
+    
+    Args:
+        checkpoint: Checkpoint yielded with the last page of this run
+        message_ids: IDs that failed during this run
+        max_attempts: Number of failed runs before an ID is given up on
+    """
+    retries = checkpoint.get('retries') or {}
+    pending = set(checkpoint['backlog']['pending_ids']) if 'backlog' in checkpoint else set()
+    # Retries already handed out on this run and not failing again have succeeded
+    updated = {msg_id: attempts for msg_id, attempts in retries.items() if msg_id in pending}
+    for msg_id in dict.fromkeys(message_ids):
+        attempts = retries.get(msg_id, 0) + 1
+        if attempts >= max_attempts:
+            print(f"Giving up on message {msg_id} after {attempts} failed attempts")
+            updated.pop(msg_id, None)
+        else:
+            updated[msg_id] = attempts
+    return dict(checkpoint, retries=updated)
+
+def sync_inbox_message_ids(service, user_id, days, max_results=INBOX_MAX_RESULTS):
+    """
+    Return the IDs of the most recent inbox emails from the last `days` days.
+    
+    The 'inbox' cursor keeps the known inbox message IDs with their internal dates
+    and is brought up to date with users.history.list. A full listing only happens
+    on the first call, when the cursor has expired, or when a wider window is requested.
+    
+    Returns:
+        Tuple of (message_ids, cursor). Message IDs whose internal date is unknown
+        are stored as None in cursor['messages'] and filled in by the caller.
+    """
+    from datetime import datetime, timedelta
+    now = datetime.now()
+    cutoff_ms = int((now - timedelta(days=days)).timestamp() * 1000)
+    cursor = SyncState.get_cursor(user_id, 'inbox')
+
+    changes = None
+    if (cursor.get('history_id') and cursor.get('window_days', 0) >= days
+            and cursor.get('max_results', INBOX_MAX_RESULTS) >= max_results):
+        changes = list_history_changes(service, cursor['history_id'], label_id='INBOX')
+
+    if changes is not None:
+        added_ids, removed_ids, latest_history_id = changes
+        window_days = cursor['window_days']
+        known = {msg_id: internal_date for msg_id, internal_date in cursor.get('messages', {}).items()
+                 if msg_id not in removed_ids}
+        # New mail is newer than anything already known, most recent first
+        new_ids = [msg_id for msg_id in reversed(added_ids) if msg_id not in known]
+    else:
+        window_days = days
+        latest_history_id = get_current_history_id(service)
+        date_from = (now - timedelta(days=days)).strftime('%Y/%m/%d')
+        known = {}
+        new_ids = []
+        page_token = None
+        while len(new_ids) < max_results:
+            params = {
+                'userId': 'me',
+                'maxResults': min(max_results - len(new_ids), LIST_MAX_PAGE_SIZE),
+                'labelIds': ['INBOX'],
+                'q': f'after:{date_from}'
+            }
+            if page_token:
+                params['pageToken'] = page_token
+            response = service.users().messages().list(**params).execute()
+            new_ids.extend(msg['id'] for msg in response.get('messages', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+    # Drop messages that have aged out of the synced window
+    window_cutoff_ms = int((now - timedelta(days=window_days)).timestamp() * 1000)
+    known = {msg_id: internal_date for msg_id, internal_date in known.items()
+             if internal_date is None or internal_date >= window_cutoff_ms}
+
+    recent_known = sorted(
+        (msg_id for msg_id, internal_date in known.items() if internal_date is None or internal_date >= cutoff_ms),
+        key=lambda msg_id: known[msg_id] or 0,
+        reverse=True
+    )
+    message_ids = (new_ids + recent_known)[:max_results]
+    for msg_id in new_ids:
+        if msg_id in message_ids:
+            known[msg_id] = None
+
+    return message_ids, {
+        'history_id': latest_history_id,
+        'window_days': window_days,
+        'max_results': cursor.get('max_results', INBOX_MAX_RESULTS) if changes is not None else max_results,
+        'messages': known
+    }
+
+def fetch_emails(user_id, days=7, max_results=INBOX_MAX_RESULTS, interests=None, keep=None):
     """
     Fetch emails from Gmail inbox
     
     Args:
         user_id: The user ID to fetch emails for
         days: Number of days to look back for emails (default: 7)
+        max_results: Maximum number of emails to return (default: 10)
+        interests: Optional user interests; with GMAIL_INTEREST_SEARCH only the
+            most recent emails matching at least one of them as a whole word are
+            fetched, otherwise they are ignored and the caller filters locally
+        keep: Optional callable taking the header details of an email (id, subject,
+            sender, date_str) and returning whether it is needed. Headers are then
+            fetched first and the full content only for the emails that are kept.
     
     Returns:
         List of email objects with id, subject, content, and date
@@ -78,29 +528,48 @@ def fetch_emails(user_id, days=7):
     creds = load_credentials(user_id)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            save_credentials(user_id, creds)
+            creds = refresh_credentials(user_id, creds)
         else:
             return None  # Handle this case properly in your application
 
     try:
-        service = build('gmail', 'v1', credentials=creds)
-        
-        # Calculate the date range based on the days parameter
-        from datetime import datetime, timedelta
-        date_from = (datetime.now() - timedelta(days=days)).strftime('%Y/%m/%d')
+        with service_pool.checkout('gmail', 'v1', creds) as service:
+            if interests and GMAIL_INTEREST_SEARCH:
+                # Let Gmail do the interest filtering so only likely matches are downloaded
+                from datetime import datetime, timedelta
+                date_from = (datetime.now() - timedelta(days=days)).strftime('%Y/%m/%d')
+                queries = build_interest_queries(interests, base_query=f"after:{date_from}")
+                message_ids = list_matching_message_ids(service, queries, max_results, label_ids=['INBOX'])
+                cursor = None
+            else:
+                # Only new inbox mail since the last call is listed; see sync_inbox_message_ids
+                message_ids, cursor = sync_inbox_message_ids(service, user_id, days, max_results)
         
-        # Create query to get emails from the specified time period
-        query = f'after:{date_from}'
-        
-        messages = service.users().messages().list(
-            userId='me',
-            maxResults=10,  # Increased to get more emails for filtering
-            labelIds=['INBOX'],
-            q=query
-        ).execute().get('messages', [])
+            emails = []
+            if keep:
+                messages, full_ids = batch_get_messages_two_phase(
+                    service, message_ids, lambda message: keep(parse_email_headers(message))
+                )
+            else:
+                messages = batch_get_messages(service, message_ids)
+                full_ids = set(message_ids)
+            for msg_id in message_ids:
+                message = messages.get(msg_id)
+                if isinstance(message, HttpError) and message.resp.status == 404:
+                    if cursor:
+                        cursor['messages'].pop(msg_id, None)
+                    continue
+                if isinstance(message, Exception) or message is None:
+                    emails.append({'error': str(message)})
+                    continue
+                if cursor:
+                    cursor['messages'][msg_id] = int(message.get('internalDate', 0))
+                if msg_id in full_ids:
+                    emails.append(parse_email_details(message))
         
-        return [get_email_details(service, msg['id']) for msg in messages]
+            if cursor:
+                SyncState.save_cursor(user_id, 'inbox', cursor)
+            return emails
     except Exception as e:
         print(f"Error fetching emails: {str(e)}")
         return {'error': str(e)}
\ No newline at end of file
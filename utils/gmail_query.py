@@ -0,0 +1,77 @@
+# backend/utils/gmail_query.py
+
+# Gmail does not document a hard limit on the length of the q parameter, but long
+# expressions are rejected or silently truncated; keep each query well below that
+MAX_QUERY_LENGTH = 1024
+OR_SEPARATOR = " OR "
+
+
+def quote_term(term):
+    """Quote a user-supplied term so Gmail treats it as a single phrase."""
+    # Gmail search has no escape for double quotes inside a phrase
+    cleaned = " ".join(term.replace('"', ' ').split())
+    return f'"{cleaned}"' if cleaned else ''
+
+def interest_term(interest, scope='any'):
+    """
+    Build the search term for one interest.
+
+    Args:
+        interest: The interest keyword or phrase
+        scope: 'subject' to match the subject only, 'any' to match the subject
+            or the body (Gmail's default full-text search covers both)
+    """
+    term = quote_term(interest)
+    if term and scope == 'subject':
+        return f"subject:{term}"
+    return term
+
+def build_interest_queries(interests, base_query='', scope='any', max_length=MAX_QUERY_LENGTH):
+    """
+    Turn a user's interests into one or more Gmail search queries.
+
+    The interests are OR-ed together and every query also carries base_query.
+    When the expression would be longer than max_length the interests are split
+    across several queries; the caller lists each query and merges the message
+    IDs (see gmail.list_matching_message_ids).
+
+    Note that Gmail matches whole words, while the local interest matcher matches
+    substrings, so the query only narrows down the candidates and the local
+    matcher still has the final word.
+
+    Args:
+        interests: Keywords or phrases of which at least one must appear
+        base_query: Extra criteria added to every query (e.g. "-label:Foo after:2024/01/01")
+        scope: 'any' (subject or body) or 'subject'
+        max_length: Maximum length of a single query
+
+    Returns:
+        List of query strings. Without interests it contains just the base query.
+    """
+    fixed = (base_query or '').strip()
+
+    terms = [term for term in (interest_term(interest, scope) for interest in dict.fromkeys(interests or [])) if term]
+    if not terms:
+        return [fixed]
+
+    # Room left for the OR group: a separating space and the parentheses
+    available = max_length - len(fixed) - (3 if fixed else 2)
+    groups = []
+    current = []
+    current_length = 0
+    for term in terms:
+        added_length = len(term) + (len(OR_SEPARATOR) if current else 0)
+        if current and current_length + added_length > available:
+            groups.append(current)
+            current = []
+            current_length = 0
+            added_length = len(term)
+        current.append(term)
+        current_length += added_length
+    groups.append(current)
+
+    queries = []
+    for group in groups:
+        expression = group[0] if len(group) == 1 else f"({OR_SEPARATOR.join(group)})"
+        queries.append(f"{fixed} {expression}" if fixed else expression)
+    return queries
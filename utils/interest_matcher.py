@@ -0,0 +1,118 @@
+# backend/utils/interest_matcher.py
+import threading
+from collections import deque
+
+
+class InterestMatcher:
+    """Case-insensitive multi-pattern matcher (Aho-Corasick) for a user's interests.
+
+    The automaton is built once per set of interests and finds every interest in
+    a single pass over the text, instead of one substring search per interest.
+    """
+
+    def __init__(self, interests):
+        self.interests = [interest for interest in dict.fromkeys(interests or []) if interest and interest.strip()]
+        # Trie transitions, failure links and the interests ending at each node
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        # Length of each lowercased interest, which is what the automaton matches
+        self._lengths = [len(interest.lower()) for interest in self.interests]
+        for index, interest in enumerate(self.interests):
+            self._add_pattern(interest.lower(), index)
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern, index):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(index)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text):
+        """
+        Find every occurrence of every interest in the text.
+
+        Returns:
+            List of dicts with the matched 'interest' and its start 'position'
+            in the text, in the order the matches end
+        """
+        matches = []
+        if not self.interests or not text:
+            return matches
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        lengths = self._lengths
+        lowered = text.lower()
+        # A few characters (e.g. "İ") lowercase to more than one, shifting the positions
+        origins = None if len(lowered) == len(text) else [
+            position for position, char in enumerate(text) for _ in char.lower()
+        ]
+        node = 0
+        for position, char in enumerate(lowered):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                start = position - lengths[index] + 1
+                matches.append({'interest': self.interests[index], 'position': origins[start] if origins else start})
+        return matches
+
+    def first_match(self, text):
+        """Return the first interest found in the text, or None."""
+        if not self.interests or not text:
+            return None
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                return self.interests[output[node][0]]
+        return None
+
+    def matched_interests(self, text):
+        """Return the distinct interests found in the text, most frequent first."""
+        counts = {}
+        for match in self.find_all(text):
+            counts[match['interest']] = counts.get(match['interest'], 0) + 1
+        return sorted(counts, key=counts.get, reverse=True)
+
+
+# Compiled matchers per user, rebuilt when the user's interests change
+_user_matchers = {}
+_user_matchers_lock = threading.Lock()
+
+def get_user_matcher(user_id, interests):
+    """Return the cached matcher for a user, rebuilding it if the interests changed."""
+    key = tuple(interests or [])
+    with _user_matchers_lock:
+        cached = _user_matchers.get(user_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    matcher = InterestMatcher(key)
+    with _user_matchers_lock:
+        _user_matchers[user_id] = (key, matcher)
+    return matcher
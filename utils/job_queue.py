@@ -0,0 +1,208 @@
+# backend/utils/job_queue.py
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from config import JOB_QUEUE_PATH, JOB_MAX_ATTEMPTS, JOB_VISIBILITY_TIMEOUT, JOB_RETRY_BASE_DELAY
+
+# Job states
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+
+class JobQueue:
+    """Durable SQLite-backed queue of per-message email extraction jobs.
+
+    The scheduler enqueues one job per Gmail message and worker processes claim
+    them. A claimed job is leased for a visibility timeout; if the worker dies
+    before completing it, the lease expires and another worker picks it up.
+    Failed jobs are retried with exponential backoff and moved to the dead-letter
+    state once they reach the maximum number of attempts.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH, max_attempts=JOB_MAX_ATTEMPTS,
+                 visibility_timeout=JOB_VISIBILITY_TIMEOUT, retry_base_delay=JOB_RETRY_BASE_DELAY):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self.retry_base_delay = retry_base_delay
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    message_id TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    locked_until REAL,
+                    worker_id TEXT,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (user_id, message_id)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_available ON jobs (status, available_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, user_id, message_ids):
+        """Add one job per message; messages that already have a job are ignored.
+
+        Returns:
+            Number of new jobs created.
+        """
+        now = time.time()
+        rows = [(user_id, msg_id, now, now, now) for msg_id in message_ids]
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (user_id, message_id, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            created = conn.total_changes - before
+            conn.execute("COMMIT")
+        return created
+
+    def claim(self, worker_id):
+        """Lease the next available job, or return None if there is nothing to do.
+
+        Returns:
+            Dict with the job's id, user_id, message_id and attempts.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Jobs whose last allowed attempt timed out are dead-lettered instead of reclaimed
+            conn.execute(
+                "UPDATE jobs SET status = ?, locked_until = NULL, last_error = ?, updated_at = ? "
+                "WHERE status = ? AND locked_until <= ? AND attempts >= ?",
+                (DEAD, 'Visibility timeout expired', now, RUNNING, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT id, user_id, message_id, attempts FROM jobs "
+                "WHERE (status = ? AND available_at <= ?) OR (status = ? AND locked_until <= ?) "
+                "ORDER BY available_at LIMIT 1",
+                (PENDING, now, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            job_id, user_id, message_id, attempts = row
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, locked_until = ?, worker_id = ?, updated_at = ? "
+                "WHERE id = ?",
+                (RUNNING, attempts + 1, now + self.visibility_timeout, worker_id, now, job_id)
+            )
+            conn.execute("COMMIT")
+        return {'id': job_id, 'user_id': user_id, 'message_id': message_id, 'attempts': attempts + 1}
+
+    def complete(self, job_id, worker_id):
+        """Mark a job as done if the worker still holds its lease.
+
+        Returns:
+            True if the job was marked done, False if the lease had expired
+            (the job may have been reclaimed by another worker).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, locked_until = NULL, last_error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND worker_id = ? AND locked_until >= ?",
+                (DONE, now, job_id, RUNNING, worker_id, now)
+            ).rowcount
+        return updated > 0
+
+    def fail(self, job_id, worker_id, error):
+        """Record a failed attempt and schedule a retry, or dead-letter the job.
+
+        Returns:
+            True if the job will be retried, False if it was dead-lettered, or
+            None if the worker no longer held the lease and nothing was changed.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND status = ? AND worker_id = ? AND locked_until >= ?",
+                (job_id, RUNNING, worker_id, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            attempts = row[0]
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, locked_until = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+                    (DEAD, str(error), now, job_id)
+                )
+                retry = False
+            else:
+                delay = self.retry_base_delay * (2 ** (attempts - 1))
+                conn.execute(
+                    "UPDATE jobs SET status = ?, available_at = ?, locked_until = NULL, last_error = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (PENDING, now + delay, str(error), now, job_id)
+                )
+                retry = True
+            conn.execute("COMMIT")
+        return retry
+
+    def dead_letters(self, limit=100):
+        """Return the most recently dead-lettered jobs."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, user_id, message_id, attempts, last_error, updated_at FROM jobs "
+                "WHERE status = ? ORDER BY updated_at DESC LIMIT ?",
+                (DEAD, limit)
+            ).fetchall()
+        return [
+            {'id': r[0], 'user_id': r[1], 'message_id': r[2], 'attempts': r[3], 'last_error': r[4], 'updated_at': r[5]}
+            for r in rows
+        ]
+
+    def requeue_dead(self, job_id=None):
+        """Move dead-lettered jobs (or a single one) back to the pending state."""
+        now = time.time()
+        query = "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE status = ?"
+        params = [PENDING, now, now, DEAD]
+        if job_id is not None:
+            query += " AND id = ?"
+            params.append(job_id)
+        with self._connect() as conn:
+            return conn.execute(query, params).rowcount
+
+    def purge_done(self, older_than_seconds=7 * 24 * 3600):
+        """Delete completed jobs older than the given age."""
+        cutoff = time.time() - older_than_seconds
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status = ? AND updated_at < ?", (DONE, cutoff)
+            ).rowcount
+
+    def stats(self):
+        """Return the number of jobs in each state."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, DEAD: 0}
+        counts.update(dict(rows))
+        return counts
@@ -0,0 +1,372 @@
+# backend/utils/llm_gateway.py
+import time
+import random
+import asyncio
+import hashlib
+import threading
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from config import (
+    GOOGLE_API_KEY, GEMINI_MODEL, LLM_RATE_PER_MINUTE, LLM_BURST, LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_CIRCUIT_FAILURES, LLM_CIRCUIT_RESET, LLM_DEADLINE
+)
+
+# Errors worth retrying: quota (429), overload and timeouts. Anything else
+# (bad request, blocked prompt, ...) fails the same way on every attempt.
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+)
+# How often a waiting coroutine checks the shared limits again
+ASYNC_POLL_INTERVAL = 0.05
+
+
+class LLMUnavailableError(Exception):
+    """Raised without calling the model while the circuit breaker is open."""
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when a call cannot complete before its deadline."""
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token if one is available; otherwise return the seconds until one is."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class CircuitBreaker:
+    """Stops calls after `failure_threshold` consecutive failures for `reset_timeout` seconds.
+
+    Once the timeout has passed a single trial call is let through; its success
+    closes the circuit again and its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        with self.lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def release_trial(self):
+        """Give the trial slot back without an outcome, e.g. when the trial call was cancelled."""
+        with self.lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"LLM circuit breaker opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+# Limits shared by every gateway in the process: one rate limiter and circuit
+# breaker per API key, and one cap on calls in flight
+_buckets = {}
+_breakers = {}
+_models = {}
+_shared_lock = threading.Lock()
+_configured = False
+_concurrency = threading.BoundedSemaphore(max(1, LLM_MAX_CONCURRENCY))
+
+
+def _key_id(api_key):
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()
+
+
+class LLMGateway:
+    """Single entry point for Gemini calls.
+
+    Reuses one GenerativeModel per model name, and puts every call through a
+    per-API-key token bucket, a process-wide concurrency limit and a per-key
+    circuit breaker. Quota and overload errors are retried with jittered
+    exponential backoff, and no call runs past its deadline (seconds from the
+    start of the call, LLM_DEADLINE by default).
+    """
+
+    def __init__(self, model_name=GEMINI_MODEL, api_key=GOOGLE_API_KEY):
+        self.api_key = api_key
+        key_id = _key_id(api_key)
+        global _configured
+        with _shared_lock:
+            if api_key and not _configured:
+                genai.configure(api_key=api_key)
+                _configured = True
+            if key_id not in _buckets:
+                _buckets[key_id] = TokenBucket(LLM_RATE_PER_MINUTE / 60.0, max(1, LLM_BURST))
+                _breakers[key_id] = CircuitBreaker(LLM_CIRCUIT_FAILURES, LLM_CIRCUIT_RESET)
+            if model_name not in _models:
+                _models[model_name] = genai.GenerativeModel(model_name)
+            self.bucket = _buckets[key_id]
+            self.breaker = _breakers[key_id]
+            self.model = _models[model_name]
+
+    @property
+    def model_name(self):
+        return self.model.model_name
+
+    @staticmethod
+    def _deadline(deadline):
+        return time.monotonic() + (LLM_DEADLINE if deadline is None else deadline)
+
+    @staticmethod
+    def _remaining(expires_at):
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded("LLM call deadline exceeded")
+        return remaining
+
+    def _backoff(self, attempt, expires_at, error):
+        """Return the delay before the next attempt, or re-raise when there is no time or attempt left."""
+        if attempt >= LLM_MAX_RETRIES:
+            raise error
+        delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+        if time.monotonic() + delay >= expires_at:
+            raise error
+        print(f"LLM call failed ({type(error).__name__}), retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+        return delay
+
+    def _check_circuit(self):
+        if self.breaker.is_open():
+            raise LLMUnavailableError("LLM temporarily unavailable after repeated failures")
+
+    def _enter(self):
+        """Claim the circuit breaker's go-ahead once a concurrency slot is held."""
+        if not self.breaker.allow():
+            _concurrency.release()
+            raise LLMUnavailableError("LLM temporarily unavailable after repeated failures")
+
+    def _admit(self, expires_at):
+        """Wait for the rate limiter and a concurrency slot; the caller releases _concurrency."""
+        self._check_circuit()
+        while True:
+            wait = self.bucket.try_acquire()
+            if not wait:
+                break
+            if time.monotonic() + wait >= expires_at:
+                raise LLMDeadlineExceeded("LLM rate limit wait would exceed the deadline")
+            time.sleep(wait)
+        if not _concurrency.acquire(timeout=self._remaining(expires_at)):
+            raise LLMDeadlineExceeded("No LLM concurrency slot before the deadline")
+        self._enter()
+
+    async def _admit_async(self, expires_at):
+        self._check_circuit()
+        while True:
+            wait = self.bucket.try_acquire()
+            if not wait:
+                break
+            if time.monotonic() + wait >= expires_at:
+                raise LLMDeadlineExceeded("LLM rate limit wait would exceed the deadline")
+            await asyncio.sleep(wait)
+        # The semaphore is shared with threads, so it is polled instead of awaited
+        while not _concurrency.acquire(blocking=False):
+            self._remaining(expires_at)
+            await asyncio.sleep(ASYNC_POLL_INTERVAL)
+        self._enter()
+
+    def generate(self, prompt, deadline=None, **kwargs):
+        """
+        Generate content, retrying quota and overload errors.
+
+        Args:
+            prompt: Prompt (or contents) passed to generate_content
+            deadline: Seconds the whole call may take, retries included
+            **kwargs: Extra generate_content arguments (e.g. generation_config)
+
+        Returns:
+            The GenerateContentResponse
+        """
+        expires_at = self._deadline(deadline)
+        attempt = 0
+        while True:
+            self._admit(expires_at)
+            try:
+                response = self.model.generate_content(
+                    prompt, request_options={'timeout': self._remaining(expires_at)}, **kwargs
+                )
+                self.breaker.record_success()
+                return response
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                error = e
+            except Exception:
+                # The model answered (e.g. rejected the prompt), so the service itself is healthy
+                self.breaker.record_success()
+                raise
+            except BaseException:
+                # Cancelled or closed before an outcome (e.g. client disconnect): free the trial slot
+                self.breaker.release_trial()
+                raise
+            finally:
+                _concurrency.release()
+            time.sleep(self._backoff(attempt, expires_at, error))
+            attempt += 1
+
+    async def generate_async(self, prompt, deadline=None, **kwargs):
+        """Async version of generate()."""
+        expires_at = self._deadline(deadline)
+        attempt = 0
+        while True:
+            await self._admit_async(expires_at)
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, **kwargs), self._remaining(expires_at)
+                )
+                self.breaker.record_success()
+                return response
+            except LLMDeadlineExceeded:
+                self.breaker.record_success()
+                raise
+            except asyncio.TimeoutError:
+                self.breaker.record_failure()
+                raise LLMDeadlineExceeded("LLM call deadline exceeded")
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                error = e
+            except Exception:
+                self.breaker.record_success()
+                raise
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            finally:
+                _concurrency.release()
+            await asyncio.sleep(self._backoff(attempt, expires_at, error))
+            attempt += 1
+
+    def stream(self, prompt, deadline=None, **kwargs):
+        """
+        Generate content as a stream of chunks.
+
+        The deadline and retries cover the call up to the first chunk; once
+        text has been produced the stream is never restarted. The concurrency
+        slot is held until the stream ends, and closing the generator early
+        (e.g. on client disconnect) cancels the underlying request.
+        """
+        expires_at = self._deadline(deadline)
+        attempt = 0
+        while True:
+            self._admit(expires_at)
+            response = None
+            started = completed = False
+            try:
+                response = self.model.generate_content(
+                    prompt, stream=True, request_options={'timeout': self._remaining(expires_at)}, **kwargs
+                )
+                for chunk in response:
+                    started = True
+                    yield chunk
+                completed = True
+                self.breaker.record_success()
+                return
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                if started:
+                    raise
+                error = e
+            except Exception:
+                self.breaker.record_success()
+                raise
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            finally:
+                _concurrency.release()
+                if not completed and response is not None:
+                    # The SDK keeps the underlying stream in a private attribute (a gRPC call or a plain generator)
+                    iterator = getattr(response, '_iterator', None)
+                    for stop in ('cancel', 'close'):
+                        if callable(getattr(iterator, stop, None)):
+                            getattr(iterator, stop)()
+                            break
+            time.sleep(self._backoff(attempt, expires_at, error))
+            attempt += 1
+
+    async def stream_async(self, prompt, deadline=None, **kwargs):
+        """Async version of stream(); cancelling the consuming task cancels the request."""
+        expires_at = self._deadline(deadline)
+        attempt = 0
+        while True:
+            await self._admit_async(expires_at)
+            started = False
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, stream=True, **kwargs), self._remaining(expires_at)
+                )
+                async for chunk in response:
+                    started = True
+                    yield chunk
+                self.breaker.record_success()
+                return
+            except LLMDeadlineExceeded:
+                self.breaker.record_success()
+                raise
+            except asyncio.TimeoutError:
+                self.breaker.record_failure()
+                raise LLMDeadlineExceeded("LLM call deadline exceeded")
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                if started:
+                    raise
+                error = e
+            except Exception:
+                self.breaker.record_success()
+                raise
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            finally:
+                _concurrency.release()
+            await asyncio.sleep(self._backoff(attempt, expires_at, error))
+            attempt += 1
+
+
+# Shared gateway for the default model
+llm_gateway = LLMGateway()
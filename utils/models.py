@@ -1,35 +1,28 @@
 from flask import session
-import os
-import json
-from config import TOKENS_DIR
+from utils.store import user_store
+from utils.interest_matcher import get_user_matcher
 
 class UserPreferences:
     """Manages user preferences for email filtering and task suggestions."""
     
-    @staticmethod
-    def get_preferences_path(user_id):
-        """Get the path to the user's preferences file."""
-        return os.path.join(TOKENS_DIR, f"{user_id}_preferences.json")
-    
     @staticmethod
     def save_preferences(user_id, preferences):
-        """Save user preferences to a file."""
-        preferences_path = UserPreferences.get_preferences_path(user_id)
-        with open(preferences_path, 'w') as f:
-            json.dump(preferences, f)
+        """Save user preferences (a single atomic upsert)."""
+        user_store.save_preferences(user_id, preferences)
+        # Rebuild the compiled interest matcher for the new preferences
+        get_user_matcher(user_id, preferences.get('interests', []))
     
     @staticmethod
     def load_preferences(user_id):
-        """Load user preferences from a file."""
-        preferences_path = UserPreferences.get_preferences_path(user_id)
-        if not os.path.exists(preferences_path):
+        """Load user preferences."""
+        preferences = user_store.load_preferences(user_id)
+        if preferences is None:
             # Default preferences
             return {
                 "interests": [],
                 "enabled": True
             }
-        with open(preferences_path, 'r') as f:
-            return json.load(f)
+        return preferences
     
     @staticmethod
     def update_preferences(user_id, new_preferences):
@@ -37,4 +30,17 @@ class UserPreferences:
         current_preferences = UserPreferences.load_preferences(user_id)
         current_preferences.update(new_preferences)
         UserPreferences.save_preferences(user_id, current_preferences)
-        return current_preferences 
\ No newline at end of file
+        return current_preferences 
+
+class SyncState:
+    """Stores per-user Gmail sync cursors (last seen historyId and related state)."""
+
+    @staticmethod
+    def get_cursor(user_id, stream):
+        """Return the sync state of one stream (e.g. 'processing' or 'inbox')."""
+        return user_store.get_cursor(user_id, stream)
+
+    @staticmethod
+    def save_cursor(user_id, stream, cursor):
+        """Replace the sync state of one stream; an empty cursor forces a full resync."""
+        user_store.save_cursor(user_id, stream, cursor)
@@ -0,0 +1,132 @@
+# backend/utils/scheduling.py
+import math
+from bisect import bisect_right
+from datetime import datetime, timedelta, time
+
+from utils.availability import merge_intervals
+
+# Default working day (9 AM to 8 PM)
+DEFAULT_WORKING_HOURS = (time(9, 0), time(20, 0))
+# Part of the day covered by each time preference
+PREFERENCE_WINDOWS = {
+    'morning': (time(9, 0), time(12, 0)),
+    'afternoon': (time(12, 0), time(17, 0)),
+    'evening': (time(17, 0), time(20, 0)),
+}
+PREFERENCE_ALIASES = {
+    'am': 'morning', 'early': 'morning',
+    'noon': 'afternoon', 'lunch': 'afternoon',
+    'pm': 'evening', 'night': 'evening', 'late': 'evening',
+}
+
+
+def normalize_preference(preference):
+    """Map a free-text time preference ('morning', 'lunch', 'PM', ...) to a PREFERENCE_WINDOWS key, or None."""
+    if not preference:
+        return None
+    preference = str(preference).strip().lower()
+    preference = PREFERENCE_ALIASES.get(preference, preference)
+    return preference if preference in PREFERENCE_WINDOWS else None
+
+def _localize(tz, value):
+    # pytz time zones need localize(); zoneinfo ones take tzinfo directly
+    return tz.localize(value) if hasattr(tz, 'localize') else value.replace(tzinfo=tz)
+
+
+class IntervalIndex:
+    """Index of busy intervals answering overlap and next-free-time queries in O(log n).
+
+    Intervals are merged into a sorted list of disjoint ones, so a binary search
+    on their end times finds the only interval that can contain a given instant.
+    """
+
+    def __init__(self, intervals):
+        merged = merge_intervals(intervals)
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlapping(self, start, end):
+        """Return the busy intervals overlapping [start, end)."""
+        result = []
+        index = bisect_right(self.ends, start)
+        while index < len(self.starts) and self.starts[index] < end:
+            result.append((self.starts[index], self.ends[index]))
+            index += 1
+        return result
+
+    def is_free(self, start, end):
+        """Return True if no busy interval overlaps [start, end)."""
+        index = bisect_right(self.ends, start)
+        return index == len(self.starts) or self.starts[index] >= end
+
+    def next_free_start(self, start, duration, buffer=timedelta(0)):
+        """Return the earliest t >= start such that [t - buffer, t + duration + buffer) is free."""
+        candidate = start
+        while True:
+            index = bisect_right(self.ends, candidate - buffer)
+            if index == len(self.starts) or self.starts[index] >= candidate + duration + buffer:
+                return candidate
+            candidate = self.ends[index] + buffer
+
+
+def _align(value, step, tz):
+    """Round an aware datetime up to the next multiple of step after local midnight."""
+    local = value.astimezone(tz)
+    midnight = _localize(tz, datetime.combine(local.date(), time(0, 0)))
+    steps = math.ceil((local - midnight) / step)
+    return midnight + steps * step
+
+def find_slots(busy, range_start, range_end, duration, tz, count=3,
+               working_hours=DEFAULT_WORKING_HOURS, buffer=timedelta(0),
+               preference=None, step=timedelta(minutes=30)):
+    """
+    Find the first `count` free slots of `duration` within [range_start, range_end).
+
+    Args:
+        busy: Busy (start, end) intervals or an IntervalIndex
+        range_start, range_end: Aware datetimes bounding the search, possibly weeks apart
+        duration: timedelta of the event
+        tz: Time zone in which working hours and preferences apply
+        count: Number of slots to return
+        working_hours: (start, end) times of day within which slots must fall
+        buffer: Free time required before and after each slot
+        preference: Optional 'morning', 'afternoon' or 'evening' (or an alias);
+            slots are then restricted to that part of the working day
+        step: Slot starts are aligned to this granularity
+
+    Returns:
+        List of up to `count` non-overlapping (start, end) tuples in time order,
+        localized to tz
+    """
+    index = busy if isinstance(busy, IntervalIndex) else IntervalIndex(busy)
+    day_start_time, day_end_time = working_hours
+    preference = normalize_preference(preference)
+    if preference:
+        preferred_start, preferred_end = PREFERENCE_WINDOWS[preference]
+        day_start_time = max(day_start_time, preferred_start)
+        day_end_time = min(day_end_time, preferred_end)
+    if day_start_time >= day_end_time:
+        return []
+
+    slots = []
+    day = range_start.astimezone(tz).date()
+    last_day = range_end.astimezone(tz).date()
+    while day <= last_day and len(slots) < count:
+        window_start = max(_localize(tz, datetime.combine(day, day_start_time)), range_start)
+        window_end = min(_localize(tz, datetime.combine(day, day_end_time)), range_end)
+        cursor = _align(window_start, step, tz)
+        while len(slots) < count and cursor + duration <= window_end:
+            candidate = _align(index.next_free_start(cursor, duration, buffer), step, tz)
+            if candidate + duration > window_end:
+                break
+            if index.next_free_start(candidate, duration, buffer) != candidate:
+                # Rounding up landed inside the next busy interval, search again from there
+                cursor = candidate
+                continue
+            slots.append((candidate, candidate + duration))
+            cursor = candidate + duration
+        day += timedelta(days=1)
+    return slots
@@ -0,0 +1,149 @@
+# backend/utils/service_pool.py
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import google_auth_httplib2
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
+
+from config import SERVICE_POOL_MAX_SIZE, SERVICE_POOL_IDLE_TTL
+
+# Parsed discovery documents, shared by every client of the same API
+_discovery_documents = {}
+_discovery_lock = threading.Lock()
+
+
+def get_discovery_document(api, version):
+    """Return the parsed discovery document bundled with google-api-python-client, or None."""
+    key = (api, version)
+    with _discovery_lock:
+        if key not in _discovery_documents:
+            document = get_static_doc(api, version)
+            _discovery_documents[key] = json.loads(document) if document else None
+        return _discovery_documents[key]
+
+def user_key(creds):
+    """Identify the user behind a set of credentials without keeping the token itself as a key."""
+    identity = getattr(creds, 'refresh_token', None) or getattr(creds, 'token', None) or str(id(creds))
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+def build_service(api, version, creds, http=None):
+    """Build an API client from the pre-parsed discovery document, reusing an HTTP connection if given."""
+    authorized_http = google_auth_httplib2.AuthorizedHttp(creds, http=http or build_http())
+    document = get_discovery_document(api, version)
+    if document is None:
+        # Not bundled with the client library: fall back to regular discovery
+        return build(api, version, http=authorized_http, cache_discovery=False)
+    return build_from_document(document, http=authorized_http)
+
+
+class ServicePool:
+    """Pool of Google API clients keyed by user and API.
+
+    Building a client parses the discovery document and opens a new HTTP
+    connection, so clients are kept and reused across calls. A client is handed
+    to one thread at a time (httplib2 is not thread-safe): checkout() takes an
+    idle client or builds a new one, and returns it to the pool afterwards.
+    Idle clients are dropped after idle_ttl seconds, and the least recently
+    used ones once more than max_size are idle.
+    """
+
+    def __init__(self, max_size=SERVICE_POOL_MAX_SIZE, idle_ttl=SERVICE_POOL_IDLE_TTL):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        # (user key, api, version) -> list of idle entries, least recently used key first
+        self._idle = OrderedDict()
+        self._idle_count = 0
+        self._lock = threading.Lock()
+
+    def _take(self, key):
+        with self._lock:
+            self._evict_expired(time.time())
+            entries = self._idle.get(key)
+            if not entries:
+                return None
+            entry = entries.pop()
+            self._idle_count -= 1
+            if not entries:
+                del self._idle[key]
+            return entry
+
+    def _give_back(self, key, entry):
+        now = time.time()
+        entry['last_used'] = now
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append(entry)
+            self._idle.move_to_end(key)
+            self._idle_count += 1
+            evicted.extend(self._evict_expired(now))
+            while self._idle_count > self.max_size:
+                oldest_key = next(iter(self._idle))
+                evicted.append(self._idle[oldest_key].pop(0))
+                self._idle_count -= 1
+                if not self._idle[oldest_key]:
+                    del self._idle[oldest_key]
+        for old_entry in evicted:
+            self._close(old_entry)
+
+    def _evict_expired(self, now):
+        """Drop idle entries past their TTL; the caller holds the lock and closes them."""
+        expired = []
+        for key in list(self._idle):
+            entries = self._idle[key]
+            fresh = [entry for entry in entries if now - entry['last_used'] < self.idle_ttl]
+            expired.extend(entry for entry in entries if now - entry['last_used'] >= self.idle_ttl)
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+        self._idle_count -= len(expired)
+        return expired
+
+    @staticmethod
+    def _close(entry):
+        close = getattr(entry['http'], 'close', None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def checkout(self, api, version, creds):
+        """
+        Borrow a client for the user owning creds.
+
+        Usage:
+            with service_pool.checkout('gmail', 'v1', creds) as service:
+                service.users().messages().list(userId='me').execute()
+        """
+        key = (user_key(creds), api, version)
+        entry = self._take(key)
+        if entry is None:
+            http = build_http()
+            entry = {'http': http, 'creds': creds, 'service': build_service(api, version, creds, http)}
+        elif entry['creds'] is not creds:
+            # Same user with a different credentials object: keep the connection, swap the auth
+            entry = dict(entry, creds=creds, service=build_service(api, version, creds, entry['http']))
+        try:
+            yield entry['service']
+        except HttpError:
+            # API errors (404, 403, ...) leave the connection usable
+            self._give_back(key, entry)
+            raise
+        except Exception:
+            # The connection may be in a bad state; let it be garbage collected
+            self._close(entry)
+            raise
+        self._give_back(key, entry)
+
+
+# Shared process-wide pool
+service_pool = ServicePool()
@@ -0,0 +1,261 @@
+# backend/utils/store.py
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from config import STORE_PATH, TOKENS_DIR
+
+
+class UserStore:
+    """Single-file SQLite (WAL) store for users, OAuth tokens, preferences and sync state.
+
+    Replaces the per-user files in TOKENS_DIR. Every write is a single atomic
+    upsert, and the users table is indexed on the time each user is next due
+    for email processing, so sweeps never have to scan a directory. Files left
+    by earlier versions are imported once, the first time the store is opened.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self):
+        # One connection per thread (and per process, connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        if not self._initialized:
+            self._initialize()
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _initialize(self):
+        with self._init_lock:
+            if self._initialized:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS users (
+                        user_id TEXT PRIMARY KEY,
+                        processing_enabled INTEGER NOT NULL DEFAULT 1,
+                        next_process_at REAL NOT NULL DEFAULT 0,
+                        last_processed_at REAL,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_users_due ON users (processing_enabled, next_process_at);
+                    CREATE TABLE IF NOT EXISTS tokens (
+                        user_id TEXT PRIMARY KEY REFERENCES users (user_id),
+                        encrypted BLOB NOT NULL,
+                        updated_at REAL NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS preferences (
+                        user_id TEXT PRIMARY KEY REFERENCES users (user_id),
+                        data TEXT NOT NULL,
+                        updated_at REAL NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS sync_state (
+                        user_id TEXT NOT NULL,
+                        stream TEXT NOT NULL,
+                        cursor TEXT NOT NULL,
+                        updated_at REAL NOT NULL,
+                        PRIMARY KEY (user_id, stream)
+                    );
+                    CREATE TABLE IF NOT EXISTS meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    );
+                """)
+                if conn.execute("SELECT 1 FROM meta WHERE key = 'files_imported'").fetchone() is None:
+                    self._import_files(conn)
+            finally:
+                conn.close()
+            self._initialized = True
+
+    @staticmethod
+    def _upsert_user(conn, user_id, now):
+        conn.execute(
+            "INSERT INTO users (user_id, created_at, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (user_id, now, now)
+        )
+
+    def _import_files(self, conn):
+        """One-time import of tokens/<id>.json, <id>_preferences.json and <id>_sync.json."""
+        imported = 0
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if os.path.isdir(TOKENS_DIR):
+                for name in os.listdir(TOKENS_DIR):
+                    if not name.endswith('.json'):
+                        continue
+                    path = os.path.join(TOKENS_DIR, name)
+                    try:
+                        if name.endswith('_preferences.json'):
+                            user_id = name[:-len('_preferences.json')]
+                            with open(path, 'r') as f:
+                                preferences = json.load(f)
+                            self._upsert_user(conn, user_id, now)
+                            conn.execute(
+                                "INSERT OR REPLACE INTO preferences (user_id, data, updated_at) VALUES (?, ?, ?)",
+                                (user_id, json.dumps(preferences), now)
+                            )
+                            conn.execute(
+                                "UPDATE users SET processing_enabled = ? WHERE user_id = ?",
+                                (1 if preferences.get('enabled', True) else 0, user_id)
+                            )
+                        elif name.endswith('_sync.json'):
+                            user_id = name[:-len('_sync.json')]
+                            with open(path, 'r') as f:
+                                state = json.load(f)
+                            for stream, cursor in state.items():
+                                conn.execute(
+                                    "INSERT OR REPLACE INTO sync_state (user_id, stream, cursor, updated_at) "
+                                    "VALUES (?, ?, ?, ?)",
+                                    (user_id, stream, json.dumps(cursor), now)
+                                )
+                        else:
+                            user_id = name[:-len('.json')]
+                            with open(path, 'rb') as f:
+                                encrypted = f.read()
+                            self._upsert_user(conn, user_id, now)
+                            conn.execute(
+                                "INSERT OR REPLACE INTO tokens (user_id, encrypted, updated_at) VALUES (?, ?, ?)",
+                                (user_id, encrypted, now)
+                            )
+                        imported += 1
+                    except (OSError, ValueError) as e:
+                        print(f"Skipping unreadable file {path} during import: {e}")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('files_imported', ?)", (str(now),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if imported:
+            print(f"Imported {imported} user files from {TOKENS_DIR} into {self.path}")
+
+    # Tokens
+
+    def save_token(self, user_id, encrypted):
+        """Insert or replace a user's encrypted credentials."""
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._upsert_user(conn, user_id, now)
+            conn.execute(
+                "INSERT INTO tokens (user_id, encrypted, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET encrypted = excluded.encrypted, updated_at = excluded.updated_at",
+                (user_id, encrypted, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load_token(self, user_id):
+        """Return a user's encrypted credentials, or None."""
+        row = self._connection().execute(
+            "SELECT encrypted FROM tokens WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def delete_token(self, user_id):
+        """Remove a user's credentials, forcing them to log in again."""
+        self._connection().execute("DELETE FROM tokens WHERE user_id = ?", (user_id,))
+
+    # Preferences
+
+    def save_preferences(self, user_id, preferences):
+        """Insert or replace a user's preferences."""
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._upsert_user(conn, user_id, now)
+            conn.execute(
+                "INSERT INTO preferences (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (user_id, json.dumps(preferences), now)
+            )
+            conn.execute(
+                "UPDATE users SET processing_enabled = ? WHERE user_id = ?",
+                (1 if preferences.get('enabled', True) else 0, user_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load_preferences(self, user_id):
+        """Return a user's preferences, or None if they have never been saved."""
+        row = self._connection().execute(
+            "SELECT data FROM preferences WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # Sync state
+
+    def get_cursor(self, user_id, stream):
+        """Return one sync cursor, or an empty dict."""
+        row = self._connection().execute(
+            "SELECT cursor FROM sync_state WHERE user_id = ? AND stream = ?", (user_id, stream)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save_cursor(self, user_id, stream, cursor):
+        """Replace one sync cursor; an empty cursor deletes it."""
+        conn = self._connection()
+        if cursor:
+            conn.execute(
+                "INSERT INTO sync_state (user_id, stream, cursor, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, stream) DO UPDATE SET cursor = excluded.cursor, updated_at = excluded.updated_at",
+                (user_id, stream, json.dumps(cursor), time.time())
+            )
+        else:
+            conn.execute("DELETE FROM sync_state WHERE user_id = ? AND stream = ?", (user_id, stream))
+
+    # Processing schedule
+
+    def users_due_for_processing(self, now=None, limit=None):
+        """
+        Return the IDs of users with credentials and processing enabled whose next
+        email sweep is due, most overdue first.
+        """
+        now = time.time() if now is None else now
+        query = (
+            "SELECT users.user_id FROM users JOIN tokens ON tokens.user_id = users.user_id "
+            "WHERE users.processing_enabled = 1 AND users.next_process_at <= ? "
+            "ORDER BY users.next_process_at"
+        )
+        params = [now]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [row[0] for row in self._connection().execute(query, params).fetchall()]
+
+    def schedule_processing(self, user_id, next_process_at, processed_at=None):
+        """Record when a user was last processed and when they are next due."""
+        self._connection().execute(
+            "UPDATE users SET next_process_at = ?, last_processed_at = COALESCE(?, last_processed_at) "
+            "WHERE user_id = ?",
+            (next_process_at, processed_at, user_id)
+        )
+
+
+# Shared process-wide store
+user_store = UserStore()
@@ -0,0 +1,307 @@
+# backend/utils/structured_output.py
+import json
+from datetime import datetime
+
+from config import STRUCTURED_OUTPUT_REPAIRS
+
+# Gemini schema type of each supported field type
+SCHEMA_TYPES = {str: 'STRING', int: 'INTEGER', float: 'NUMBER', bool: 'BOOLEAN'}
+# Format of every date and time the extraction prompts ask for
+DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+# Answers models still give for "not found" although the schema allows null
+NULL_STRINGS = {'', 'none', 'null', 'n/a', 'unknown', 'not found', 'not specified', 'not mentioned'}
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a model answer is not JSON of the expected shape."""
+
+
+class Field:
+    """One typed field of an extraction schema.
+
+    `format='datetime'` requires a YYYY-MM-DD HH:MM string; ISO 8601 answers
+    are normalized to that format. Nullable fields accept null and the usual
+    "none" spellings, which become None.
+    """
+
+    def __init__(self, name, type=str, description='', nullable=False, format=None, enum=None,
+                 minimum=None, maximum=None):
+        self.name = name
+        self.type = type
+        self.description = description
+        self.nullable = nullable
+        self.format = format
+        self.enum = enum
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def to_schema(self):
+        """Return the field as a Gemini response_schema property."""
+        schema = {'type': SCHEMA_TYPES[self.type]}
+        if self.description:
+            schema['description'] = self.description
+        if self.nullable:
+            schema['nullable'] = True
+        if self.enum:
+            schema['enum'] = list(self.enum)
+        return schema
+
+    def validate(self, value):
+        """Return the value converted to the field type; raises ValueError saying what is wrong."""
+        if value is None or (isinstance(value, str) and value.strip().lower() in NULL_STRINGS
+                             and self.type is not bool):
+            if self.nullable:
+                return None
+            raise ValueError("is required")
+
+        if self.type is bool:
+            if isinstance(value, str) and value.strip().lower() in ('true', 'yes'):
+                return True
+            if isinstance(value, str) and value.strip().lower() in ('false', 'no'):
+                return False
+            if not isinstance(value, bool):
+                raise ValueError(f"must be true or false, got {value!r}")
+            return value
+
+        if self.type in (int, float):
+            if isinstance(value, bool):
+                raise ValueError(f"must be a number, got {value!r}")
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"must be a number, got {value!r}")
+            if self.type is int:
+                if not number.is_integer():
+                    raise ValueError(f"must be a whole number, got {value!r}")
+                number = int(number)
+            if self.minimum is not None and number < self.minimum:
+                raise ValueError(f"must be at least {self.minimum}, got {value!r}")
+            if self.maximum is not None and number > self.maximum:
+                raise ValueError(f"must be at most {self.maximum}, got {value!r}")
+            return number
+
+        if not isinstance(value, str):
+            raise ValueError(f"must be a string, got {value!r}")
+        value = value.strip()
+        if self.format == 'datetime':
+            try:
+                return datetime.strptime(value, DATETIME_FORMAT).strftime(DATETIME_FORMAT)
+            except ValueError:
+                pass
+            try:
+                return datetime.fromisoformat(value).strftime(DATETIME_FORMAT)
+            except ValueError:
+                raise ValueError(f"must be an exact date and time in YYYY-MM-DD HH:MM format, got {value!r}")
+        if self.enum and value not in self.enum:
+            raise ValueError(f"must be one of {', '.join(self.enum)}, got {value!r}")
+        return value
+
+
+class Schema:
+    """Typed fields expected in each extracted object."""
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+
+    @property
+    def names(self):
+        return [field.name for field in self.fields]
+
+    def _selected(self, names):
+        return [field for field in self.fields if names is None or field.name in names]
+
+    def object_schema(self, names=None, key=None):
+        """Gemini response_schema of one object, optionally limited to some fields and led by a key field."""
+        fields = ([key] if key else []) + self._selected(names)
+        return {
+            'type': 'OBJECT',
+            'properties': {field.name: field.to_schema() for field in fields},
+            # Nullable fields are required too, so a missing value is always an explicit null
+            'required': [field.name for field in fields],
+        }
+
+    def generation_config(self, names=None, key=None):
+        """
+        Generation config asking Gemini for JSON matching the schema.
+
+        Args:
+            names: Only ask for these fields (all fields by default)
+            key: Field identifying each item; when given the answer is an array of objects
+        """
+        schema = self.object_schema(names, key)
+        if key:
+            schema = {'type': 'ARRAY', 'items': schema}
+        return {'response_mime_type': 'application/json', 'response_schema': schema}
+
+    def validate(self, data, names=None):
+        """
+        Validate an answer object field by field.
+
+        Returns:
+            Tuple (values, errors): values maps each valid field to its converted
+            value; errors maps each missing or invalid field to what is wrong
+        """
+        values = {}
+        errors = {}
+        for field in self._selected(names):
+            if field.name not in data:
+                errors[field.name] = "is missing"
+                continue
+            try:
+                values[field.name] = field.validate(data[field.name])
+            except ValueError as e:
+                errors[field.name] = str(e)
+        return values, errors
+
+    def resolve(self, values, errors):
+        """Return the final data once repairs are over: failed nullable fields become None, failed required ones drop it."""
+        if any(not field.nullable for field in self.fields if field.name in errors):
+            return None
+        data = dict(values)
+        for name in errors:
+            data[name] = None
+        return data
+
+
+def parse_json(response):
+    """Parse the JSON answer of a response; raises StructuredOutputError if there is none."""
+    try:
+        return json.loads(response.text)
+    except (AttributeError, ValueError) as e:
+        # response.text raises ValueError when the answer was blocked or has no text
+        raise StructuredOutputError(f"Answer is not valid JSON: {e}")
+
+def repair_prompt(prompt, errors):
+    """Append the previous answer's field errors to a prompt so only those fields are answered again."""
+    lines = [f"- {name}: {message}" for name, message in errors.items()]
+    return (
+        f"{prompt}\n\n"
+        f"Some values in your previous answer were invalid:\n" + "\n".join(lines) + "\n"
+        f"Answer again with corrected values for these fields only."
+    )
+
+def generate_structured(llm, prompt, schema, repairs=STRUCTURED_OUTPUT_REPAIRS, **kwargs):
+    """
+    Extract one object with schema-constrained JSON output.
+
+    Fields that are missing or invalid are asked for again, on their own, up
+    to `repairs` times; valid fields are never requested twice.
+
+    Args:
+        llm: LLMGateway used for the calls
+        prompt: Extraction prompt
+        schema: Schema of the answer
+        repairs: Maximum number of follow-up calls for invalid fields
+        **kwargs: Extra LLMGateway.generate arguments (e.g. deadline)
+
+    Returns:
+        Tuple (data, errors): data is the validated dict (failed nullable fields
+        are None), or None when a required field could not be extracted; errors
+        maps the fields that never validated to what was wrong
+    """
+    values = {}
+    errors = {}
+    names = None
+    for attempt in range(repairs + 1):
+        call_prompt = repair_prompt(prompt, errors) if errors else prompt
+        try:
+            response = llm.generate(call_prompt, generation_config=schema.generation_config(names), **kwargs)
+        except Exception as e:
+            if attempt == 0:
+                raise
+            print(f"Structured output repair call failed: {e}")
+            break
+        try:
+            answer = parse_json(response)
+            if not isinstance(answer, dict):
+                raise StructuredOutputError("Expected a JSON object")
+            new_values, errors = schema.validate(answer, names)
+        except StructuredOutputError as e:
+            print(f"Malformed structured output: {e}")
+            errors = {name: "is missing" for name in (names or schema.names)}
+            new_values = {}
+        values.update(new_values)
+        if not errors:
+            break
+        names = list(errors)
+        print(f"Invalid structured output fields: {errors}")
+    return schema.resolve(values, errors), errors
+
+def generate_structured_items(llm, build_prompt, schema, key, keys, repairs=STRUCTURED_OUTPUT_REPAIRS, **kwargs):
+    """
+    Extract one object per item with a single schema-constrained call.
+
+    Items with missing or invalid fields are asked for again, up to `repairs`
+    times, with a prompt covering only those items and a schema holding only
+    the fields that failed.
+
+    Args:
+        llm: LLMGateway used for the calls
+        build_prompt: Function returning the prompt for a list of item keys
+        schema: Schema of each item
+        key: Field identifying the item in the answer (e.g. the email ID)
+        keys: Keys of the items to extract
+        repairs: Maximum number of follow-up calls for invalid fields
+        **kwargs: Extra LLMGateway.generate arguments (e.g. deadline)
+
+    Returns:
+        Dict mapping the key of each item found in the answer to a tuple
+        (data, errors) as returned by generate_structured. Items missing from
+        the answer are left out. Raises StructuredOutputError when the first
+        answer is not a JSON array, and any error of the first call.
+    """
+    found = {}
+    pending = list(keys)
+    errors_by_key = {}
+    for attempt in range(repairs + 1):
+        names = None
+        prompt = build_prompt(pending)
+        if errors_by_key:
+            names = [name for name in schema.names if any(name in errors for errors in errors_by_key.values())]
+            prompt = repair_prompt(prompt, {
+                f"{key.name} {item_key}, {name}": message
+                for item_key, errors in errors_by_key.items()
+                for name, message in errors.items()
+            })
+        try:
+            answer = parse_json(llm.generate(prompt, generation_config=schema.generation_config(names, key), **kwargs))
+            if isinstance(answer, dict):
+                answer = answer.get('results', [answer])
+            if not isinstance(answer, list):
+                raise StructuredOutputError("Expected a JSON array")
+        except Exception as e:
+            if attempt == 0:
+                raise
+            print(f"Structured output repair call failed for {len(pending)} items: {e}")
+            break
+
+        answered = set()
+        for item in answer:
+            if not isinstance(item, dict):
+                continue
+            try:
+                item_key = key.validate(item.get(key.name))
+            except ValueError:
+                continue
+            if item_key not in pending or item_key in answered:
+                continue
+            answered.add(item_key)
+            new_values, new_errors = schema.validate(item, names)
+            if attempt == 0:
+                found[item_key] = (new_values, new_errors)
+                continue
+            # Only the fields that failed before were asked for; keep the rest as they were
+            values, errors = found[item_key]
+            for name in list(errors):
+                if name in new_values:
+                    values[name] = new_values[name]
+                    del errors[name]
+                elif name in new_errors:
+                    errors[name] = new_errors[name]
+
+        errors_by_key = {item_key: found[item_key][1] for item_key in pending if item_key in found and found[item_key][1]}
+        if not errors_by_key:
+            break
+        pending = list(errors_by_key)
+        print(f"Invalid structured output fields for {len(pending)} items, asking again")
+    return {item_key: (schema.resolve(values, errors), errors) for item_key, (values, errors) in found.items()}
@@ -0,0 +1,95 @@
+# backend/utils/token_refresher.py
+import time
+import random
+import threading
+from collections import deque
+
+from utils.auth import load_credentials, refresh_credentials, recently_active_users, seconds_until_expiry
+from config import (
+    TOKEN_REFRESH_MARGIN, TOKEN_REFRESH_JITTER, TOKEN_REFRESH_MAX_PER_MINUTE, TOKEN_REFRESH_ACTIVE_WINDOW
+)
+
+
+class TokenRefresher:
+    """Refreshes the access tokens of active users shortly before they expire.
+
+    Run periodically from the scheduler so that request handlers almost always
+    find a valid token instead of paying for an OAuth round trip. Each user's
+    refresh is planned `margin` seconds before expiry minus a random jitter, so
+    tokens issued at the same time are not all refreshed in the same run, and no
+    more than max_per_minute refreshes are made.
+    """
+
+    def __init__(self, margin=TOKEN_REFRESH_MARGIN, jitter=TOKEN_REFRESH_JITTER,
+                 max_per_minute=TOKEN_REFRESH_MAX_PER_MINUTE, active_window=TOKEN_REFRESH_ACTIVE_WINDOW):
+        self.margin = margin
+        self.jitter = jitter
+        self.max_per_minute = max_per_minute
+        self.active_window = active_window
+        # user_id -> (token expiry it was planned for, planned refresh time)
+        self._planned = {}
+        # Times of the refreshes made in the last minute
+        self._recent_refreshes = deque()
+        self._lock = threading.Lock()
+
+    def _planned_refresh_time(self, user_id, expiry, expires_at):
+        planned = self._planned.get(user_id)
+        if planned is None or planned[0] != expiry:
+            planned = (expiry, expires_at - self.margin - random.uniform(0, self.jitter))
+            self._planned[user_id] = planned
+        return planned[1]
+
+    def _allow_refresh(self, now):
+        while self._recent_refreshes and now - self._recent_refreshes[0] >= 60:
+            self._recent_refreshes.popleft()
+        if len(self._recent_refreshes) >= self.max_per_minute:
+            return False
+        self._recent_refreshes.append(now)
+        return True
+
+    def run_once(self):
+        """Refresh the tokens that are due; returns the number of refreshes made."""
+        # Runs are skipped rather than queued if the previous one is still going
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.time()
+            active_users = recently_active_users(self.active_window)
+            # Forget users who are no longer active
+            for user_id in set(self._planned) - set(active_users):
+                del self._planned[user_id]
+
+            due = []
+            for user_id in active_users:
+                try:
+                    creds = load_credentials(user_id)
+                except Exception as e:
+                    print(f"Could not load credentials for {user_id}: {e}")
+                    continue
+                if not creds or not creds.refresh_token:
+                    continue
+                remaining = seconds_until_expiry(creds)
+                if remaining is None:
+                    continue
+                planned_at = self._planned_refresh_time(user_id, creds.expiry, now + remaining)
+                if now >= planned_at:
+                    due.append((planned_at, user_id, creds))
+
+            refreshed = 0
+            for _, user_id, creds in sorted(due, key=lambda item: item[0]):
+                if not self._allow_refresh(time.time()):
+                    print(f"Token refresh rate limit reached, {len(due) - refreshed} refreshes postponed")
+                    break
+                try:
+                    refresh_credentials(user_id, creds, min_validity=self.margin + self.jitter)
+                    refreshed += 1
+                except Exception as e:
+                    print(f"Background token refresh failed for {user_id}: {e}")
+                    self._planned.pop(user_id, None)
+            return refreshed
+        finally:
+            self._lock.release()
+
+
+# Shared process-wide refresher
+token_refresher = TokenRefresher()
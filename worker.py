@@ -0,0 +1,71 @@
+# backend/worker.py
+"""
+Worker processes that drain the email extraction job queue.
+
+Run alongside the web app with EMAIL_JOB_QUEUE=true so email ingestion scales
+independently of the Flask workers:
+
+    python worker.py --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+
+from config import EMAIL_WORKER_PROCESSES
+
+# Seconds to wait before polling an empty queue again
+POLL_INTERVAL = 5
+
+
+def run_worker(worker_index):
+    """Claim and process jobs until the process is terminated."""
+    # Imported here so each process sets up its own clients after forking
+    from utils.job_queue import JobQueue
+    from utils.email_processor import process_job
+
+    queue = JobQueue()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{worker_index}"
+    print(f"Email worker {worker_id} started")
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        try:
+            process_job(job)
+            if not queue.complete(job['id'], worker_id):
+                print(f"Lease on job {job['id']} expired before it completed; it will be handled again")
+        except Exception as e:
+            retry = queue.fail(job['id'], worker_id, e)
+            outcome = 'lease expired' if retry is None else 'will retry' if retry else 'dead-lettered'
+            print(f"Job {job['id']} for {job['user_id']}/{job['message_id']} failed "
+                  f"(attempt {job['attempts']}, {outcome}): {e}")
+            print(traceback.format_exc())
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued email-to-calendar extraction jobs.")
+    parser.add_argument('--processes', type=int, default=EMAIL_WORKER_PROCESSES,
+                        help="Number of worker processes (default: %(default)s)")
+    args = parser.parse_args()
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(index,), name=f"email-worker-{index}")
+        for index in range(max(1, args.processes))
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("Stopping email workers...")
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+if __name__ == "__main__":
+    main()